@@ -0,0 +1,243 @@
+"""Admission control: per-client token buckets and caps on requests in flight.
+
+Rate limits apply per client address and route, to the routes listed in
+``RATE_LIMITS`` (``route=count/seconds``, comma separated), e.g.
+``/api/login=10/60`` lets each address burst 10 logins and then one every
+6 seconds. Over the limit a request gets 429 with Retry-After.
+
+Buckets live in a pluggable store chosen by ``RATE_LIMIT_STORE``:
+
+* ``memory``: per process. Each worker enforces the limit on its own, so a
+  client can get up to ``workers`` times the configured rate.
+* ``mongo``: one document per bucket in the ``RateLimits`` collection,
+  refilled and drawn from in a single atomic update, so every worker and
+  host shares it. Costs one round trip per limited request.
+
+Independently of the rate, ``MAX_CONCURRENT_REQUESTS`` caps requests in
+flight per process and ``MAX_CONCURRENT_PUBLIC_REQUESTS`` caps the
+rate-limited routes among them, so a burst on public routes leaves capacity
+for signed-in users. The ASGI app, whose requests don't each hold a thread,
+takes its public cap from ``ASYNC_MAX_CONCURRENT_PUBLIC_REQUESTS`` instead. A request that cannot get a slot within
+``ADMISSION_TIMEOUT`` seconds is shed with 503 and Retry-After.
+"""
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_COLLECTION = 'RateLimits'
+
+Limit = namedtuple('Limit', ['rate', 'burst'])  # tokens per second, bucket size
+Decision = namedtuple('Decision', ['allowed', 'retry_after'])
+Rejection = namedtuple('Rejection', ['status', 'reason', 'retry_after'])
+
+
+def parse_limits(spec):
+    """'/api/login=10/60,/api/reviews=120/60' -> {'/api/login': Limit(rate=10/60, burst=10), ...}"""
+    limits = {}
+    for item in (spec or '').split(','):
+        if not item.strip():
+            continue
+        route, _, value = item.rpartition('=')
+        count, _, seconds = value.partition('/')
+        try:
+            count, seconds = int(count), float(seconds or 1)
+        except ValueError:
+            raise ValueError(f"Invalid rate limit: {item!r}")
+        if not route.strip() or count < 1 or seconds <= 0:
+            raise ValueError(f"Invalid rate limit: {item!r}")
+        limits[route.strip()] = Limit(rate=count / seconds, burst=count)
+    return limits
+
+
+def client_address(access_route, remote_addr, trusted_proxies=0):
+    """The client's address, skipping the X-Forwarded-For hops added by our own proxies"""
+    # access_route is the X-Forwarded-For list, without remote_addr. Each of our proxies
+    # appends the address it was reached from, so the client is trusted_proxies entries
+    # from the end; anything before that came from the client and can't be trusted.
+    if trusted_proxies and len(access_route) >= trusted_proxies:
+        return access_route[-trusted_proxies]
+    return remote_addr or 'unknown'
+
+
+def _decision(tokens, limit):
+    if tokens is None:
+        return Decision(True, 0)
+    allowed = tokens >= 0
+    return Decision(allowed, 0 if allowed else (-tokens) / limit.rate)
+
+
+class MemoryStore:
+    """Token buckets in this process, evicting the least recently used beyond maxsize"""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, limit):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (limit.burst, now))
+            tokens = min(limit.burst, tokens + (now - updated) * limit.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+            else:
+                self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                # An evicted bucket starts full again, which only errs on the lenient side
+                self._buckets.popitem(last=False)
+        return _decision(tokens - 1, limit)
+
+    async def atake(self, key, limit):
+        return self.take(key, limit)
+
+
+def bucket_update(limit):
+    """Pipeline update that refills a bucket by the server clock and takes one token"""
+    now_ms = {'$toLong': '$$NOW'}
+    elapsed = {'$divide': [{'$subtract': [now_ms, {'$ifNull': ['$updated_ms', now_ms]}]}, 1000]}
+    refilled = {'$min': [limit.burst, {'$add': [{'$ifNull': ['$tokens', limit.burst]},
+                                                {'$multiply': [elapsed, limit.rate]}]}]}
+    # Full again after burst / rate seconds idle, so the TTL index may drop it then
+    idle_ms = math.ceil(limit.burst / limit.rate * 1000)
+    return [
+        {'$set': {'tokens': refilled, 'updated_ms': now_ms}},
+        # taken is what remains after drawing one; negative means refused
+        {'$set': {'taken': {'$subtract': ['$tokens', 1]},
+                  'expires_at': {'$add': ['$$NOW', idle_ms]}}},
+        {'$set': {'tokens': {'$cond': [{'$gte': ['$taken', 0]}, '$taken', '$tokens']}}}
+    ]
+
+
+class MongoStore:
+    """Token buckets shared by every worker through one collection.
+
+    ``get_collection`` is called per check so each forked worker uses its
+    own client. Errors admit the request: losing the limiter must not take
+    the routes down with it.
+    """
+
+    def __init__(self, get_collection):
+        self.get_collection = get_collection
+
+    def take(self, key, limit):
+        try:
+            bucket = self.get_collection().find_one_and_update(
+                {'_id': key}, bucket_update(limit), projection={'taken': 1},
+                upsert=True, return_document=ReturnDocument.AFTER
+            )
+            return _decision(bucket['taken'], limit)
+        except Exception as e:
+            logger.warning(f"Rate limit store unavailable: {str(e)}")
+            return _decision(None, limit)
+
+    async def atake(self, key, limit):
+        try:
+            bucket = await self.get_collection().find_one_and_update(
+                {'_id': key}, bucket_update(limit), projection={'taken': 1},
+                upsert=True, return_document=ReturnDocument.AFTER
+            )
+            return _decision(bucket['taken'], limit)
+        except Exception as e:
+            logger.warning(f"Rate limit store unavailable: {str(e)}")
+            return _decision(None, limit)
+
+
+class ConcurrencyLimiter:
+    """Caps requests in flight; acquire() waits up to ``timeout`` seconds for a slot"""
+
+    def __init__(self, limit, timeout):
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(limit)
+
+    def acquire(self):
+        return self._slots.acquire(timeout=self.timeout)
+
+    def release(self):
+        self._slots.release()
+
+
+class AsyncConcurrencyLimiter:
+    """ConcurrencyLimiter for coroutines running on one event loop"""
+
+    def __init__(self, limit, timeout):
+        self.timeout = timeout
+        self._slots = asyncio.BoundedSemaphore(limit)
+
+    async def acquire(self):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def release(self):
+        self._slots.release()
+
+
+class AdmissionControl:
+    """Decides whether a request runs; admitted requests hold slots until release()"""
+
+    limiter_class = ConcurrencyLimiter
+    public_cap_setting = 'MAX_CONCURRENT_PUBLIC_REQUESTS'
+
+    def __init__(self, limits, store, max_active, max_public, timeout):
+        self.limits = limits
+        self.store = store
+        self.active = self.limiter_class(max_active, timeout)
+        self.public = self.limiter_class(max_public, timeout)
+
+    @classmethod
+    def from_config(cls, config, store):
+        return cls(parse_limits(config['RATE_LIMITS']), store, config['MAX_CONCURRENT_REQUESTS'],
+                   config[cls.public_cap_setting], config['ADMISSION_TIMEOUT'])
+
+    def admit(self, route, client):
+        """(None, slots) to run the request, or (Rejection, ()) to shed it"""
+        limit = self.limits.get(route)
+        if limit is not None:
+            decision = self.store.take(f"{route}|{client}", limit)
+            if not decision.allowed:
+                return Rejection(429, 'rate_limited', math.ceil(decision.retry_after)), ()
+
+        gates = (self.active, self.public) if limit is not None else (self.active,)
+        held = []
+        for gate in gates:
+            if not gate.acquire():
+                self.release(held)
+                return Rejection(503, 'overloaded', 1), ()
+            held.append(gate)
+        return None, held
+
+    @staticmethod
+    def release(slots):
+        for gate in slots:
+            gate.release()
+
+
+class AsyncAdmissionControl(AdmissionControl):
+    limiter_class = AsyncConcurrencyLimiter
+    public_cap_setting = 'ASYNC_MAX_CONCURRENT_PUBLIC_REQUESTS'
+
+    async def admit(self, route, client):
+        limit = self.limits.get(route)
+        if limit is not None:
+            decision = await self.store.atake(f"{route}|{client}", limit)
+            if not decision.allowed:
+                return Rejection(429, 'rate_limited', math.ceil(decision.retry_after)), ()
+
+        gates = (self.active, self.public) if limit is not None else (self.active,)
+        held = []
+        for gate in gates:
+            if not await gate.acquire():
+                self.release(held)
+                return Rejection(503, 'overloaded', 1), ()
+            held.append(gate)
+        return None, held
@@ -0,0 +1,192 @@
+"""Weekly and monthly requirement trends, materialized in RequirementAnalytics.
+
+One document per (granularity, dimension, bucket, value), e.g. the week of
+2024-03-04 for department "IT", holding the submissions created in it and
+the total of their numeric ``estimatedBudget`` values. Buckets are UTC
+weeks starting on Monday and calendar months, by ``created_at``.
+
+The rollup is written by ``$merge`` pipelines that recompute only the
+buckets from the oldest one touched since the last refresh onwards:
+requirements whose ``updated_at`` moved past the refresh watermark, plus
+the ``dirty_since`` that deletes and ``created_at`` edits record. A refresh
+leaves a bucket untouched until it is recomputed, so readers never see it
+empty, and then removes the buckets that no longer have requirements.
+
+Refreshes run on demand when /api/requirements/analytics finds the rollup
+older than ``ANALYTICS_MAX_AGE`` seconds (one process at a time, under a
+lease), or on a schedule:
+
+    python analytics.py refresh          # incremental, e.g. from cron
+    python analytics.py refresh --full   # rebuild every bucket
+
+Requires MongoDB 5.0 or later for ``$dateTrunc``.
+"""
+import argparse
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_COLLECTION = 'RequirementAnalytics'
+# The one document in the collection that is not a bucket
+REFRESH_STATE_ID = 'refresh'
+
+GRANULARITIES = ('week', 'month')
+DIMENSIONS = ('department', 'projectType')
+# Buckets returned when the caller gives no start
+DEFAULT_BUCKETS = {'week': 26, 'month': 12}
+MAX_BUCKETS = {'week': 520, 'month': 120}
+
+# Changes stamped just before the previous refresh may have committed after it
+WATERMARK_SLACK = timedelta(minutes=1)
+# A refresh that dies leaves its lease; the next one may start after this
+REFRESH_LEASE = timedelta(minutes=5)
+
+# Budgets are free text; anything that doesn't convert counts as no budget
+BUDGET = {'$convert': {'input': '$estimatedBudget', 'to': 'double', 'onError': None, 'onNull': None}}
+
+
+def bucket_start(moment, granularity):
+    """The start of the UTC week (Monday) or month containing moment, as $dateTrunc computes it"""
+    day = datetime(moment.year, moment.month, moment.day)
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def rollup_pipeline(granularity, dimension, start, refresh_id):
+    """Recompute the buckets of one series from start onwards and $merge them into the rollup"""
+    trunc = {'date': '$created_at', 'unit': granularity}
+    if granularity == 'week':
+        trunc['startOfWeek'] = 'monday'
+    match = {'created_at': {'$type': 'date'}}
+    if start is not None:
+        match['created_at']['$gte'] = start
+    return [
+        {'$match': match},
+        {'$project': {'created_at': 1, dimension: 1, 'budget': BUDGET}},
+        {'$group': {
+            '_id': {
+                'granularity': granularity,
+                'dimension': dimension,
+                'bucket': {'$dateTrunc': trunc},
+                'value': {'$ifNull': [f'${dimension}', None]}
+            },
+            'submissions': {'$sum': 1},
+            'budget_total': {'$sum': {'$ifNull': ['$budget', 0]}},
+            'budget_count': {'$sum': {'$cond': [{'$eq': ['$budget', None]}, 0, 1]}}
+        }},
+        {'$set': {'refresh_id': refresh_id}},
+        {'$merge': {'into': ANALYTICS_COLLECTION, 'on': '_id',
+                    'whenMatched': 'replace', 'whenNotMatched': 'insert'}}
+    ]
+
+
+def stale_buckets_filter(granularity, start, refresh_id):
+    """Buckets of a recomputed range that the latest refresh did not write"""
+    query = {'_id.granularity': granularity, 'refresh_id': {'$ne': refresh_id}}
+    if start is not None:
+        query['_id.bucket'] = {'$gte': start}
+    return query
+
+
+def oldest_change_pipeline(watermark):
+    """The oldest created_at among requirements changed after watermark"""
+    return [
+        {'$match': {'updated_at': {'$gt': watermark - WATERMARK_SLACK}}},
+        {'$group': {'_id': None, 'oldest': {'$min': '$created_at'}}}
+    ]
+
+
+def refresh_start(state, oldest_changed, full=False):
+    """(start, work): recompute from start (None for everything); work is False when nothing changed"""
+    if full or not state.get('refreshed_at'):
+        return None, True
+    candidates = [moment for moment in (oldest_changed, state.get('dirty_since')) if isinstance(moment, datetime)]
+    if not candidates:
+        return None, False
+    return min(candidates), True
+
+
+def new_refresh_id():
+    return uuid.uuid4().hex
+
+
+def lease_query(now):
+    """Matches the refresh state unless another refresh holds its lease"""
+    return {'_id': REFRESH_STATE_ID,
+            '$or': [{'lease_until': {'$exists': False}}, {'lease_until': {'$lt': now}}]}
+
+
+def parse_analytics_args(args, now=None):
+    """(granularity, dimension, start, end) from the query string; raises ValueError"""
+    granularity = args.get('granularity', 'week')
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of: {', '.join(GRANULARITIES)}")
+    dimension = args.get('dimension', 'department')
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"dimension must be one of: {', '.join(DIMENSIONS)}")
+
+    end = _parse_date(args.get('to'), 'to') if args.get('to') else (now or datetime.utcnow())
+    if args.get('from'):
+        start = _parse_date(args['from'], 'from')
+    else:
+        start = _shift(bucket_start(end, granularity), granularity, -(DEFAULT_BUCKETS[granularity] - 1))
+    start = bucket_start(start, granularity)
+    if start > end:
+        raise ValueError("from must not be after to")
+    if start < _shift(bucket_start(end, granularity), granularity, -MAX_BUCKETS[granularity]):
+        raise ValueError(f"At most {MAX_BUCKETS[granularity]} {granularity}s per request")
+    return granularity, dimension, start, end
+
+
+def _parse_date(value, name):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f"{name} must be a date as YYYY-MM-DD")
+
+
+def _shift(bucket, granularity, count):
+    """The bucket count weeks or months away from bucket"""
+    if granularity == 'week':
+        return bucket + timedelta(weeks=count)
+    month = bucket.year * 12 + bucket.month - 1 + count
+    return bucket.replace(year=month // 12, month=month % 12 + 1)
+
+
+def series_query(granularity, dimension, start, end):
+    return {'_id.granularity': granularity, '_id.dimension': dimension,
+            '_id.bucket': {'$gte': start, '$lte': end}}
+
+
+def series_from_buckets(documents):
+    """Group rollup documents into one series of points per dimension value"""
+    series = {}
+    for document in documents:
+        key = document['_id']
+        series.setdefault(key['value'], []).append({
+            'bucket': key['bucket'],
+            'submissions': document['submissions'],
+            'budget_total': document['budget_total'],
+            'budget_count': document['budget_count']
+        })
+    return [{'value': value, 'points': points}
+            for value, points in sorted(series.items(), key=lambda item: (item[0] is None, str(item[0])))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the KodEstudio requirement analytics rollup")
+    parser.add_argument('command', choices=['refresh'])
+    parser.add_argument('--full', action='store_true', help="Recompute every bucket")
+    args = parser.parse_args()
+
+    # database imports this module
+    from database import DatabaseManager
+    print(json.dumps(DatabaseManager().refresh_requirements_analytics(full=args.full), default=str))
+
+
+if __name__ == '__main__':
+    main()
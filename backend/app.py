@@ -1,38 +1,127 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, current_app, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from database import DatabaseManager
+from config import Config
+from logging_setup import configure_logging
+import metrics
+from compression import compress_response
+from json_provider import FastJSONProvider, dumps_bytes
+from database import DatabaseManager, SEARCH_DEFAULT_LIMIT
+from search import keyword_clauses
+from bulk import DEFAULT_BATCH_SIZE, read_rows, export_lines
+from projection import ALL, SUMMARY
+from passwords import HashingBusy
+from schema import (
+    CLIENTE_SCHEMA, CLIENTE_UPDATE_SCHEMA, REQUIREMENT_SCHEMA, REQUIREMENT_UPDATE_SCHEMA, PayloadTooLarge
+)
+from admission import (
+    RATE_LIMIT_COLLECTION, AdmissionControl, ConcurrencyLimiter, MemoryStore, MongoStore, Rejection, client_address
+)
+from analytics import parse_analytics_args
+from changes import ChangeFeed, Subscription, change_bus, sse_frames
+from connection import get_database
+import codecs
 import logging
 from datetime import datetime, timedelta
+import time
 from bson.errors import InvalidId
 from bson import ObjectId
 import jwt
 from functools import wraps
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Flask app
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your_secret_key'  # Cambia esto por una clave secreta segura
+# All /api/* routes; registered on the app by create_app
+api = Blueprint('api', __name__)
 
-# Configure CORS
-CORS(app, resources={
-    r"/api/*": {
-        "origins": ["http://localhost:3000"],
-        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
-    }
-})
-
-# Initialize database manager
+# Initialize database manager (the Mongo connection opens on first use)
 db_manager = DatabaseManager()
 
 # Error handler for invalid ObjectId
-@app.errorhandler(InvalidId)
+@api.app_errorhandler(InvalidId)
 def handle_invalid_id(error):
     return jsonify({'error': 'Invalid requirement ID format'}), 400
 
+def ndjson_response(documents):
+    """Stream documents as newline-delimited JSON without buffering the full result"""
+    def generate():
+        try:
+            for document in documents:
+                yield dumps_bytes(document) + b'\n'
+        except Exception as e:
+            # Headers are already sent, so the client sees a truncated stream
+            logger.error(f"Error streaming results: {str(e)}")
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def cached_json_response(entry, cache_control):
+    """Serve a CachedResponse, answering 304 when the client's validators match"""
+    response = Response(entry.body, mimetype='application/json')
+    response.set_etag(entry.etag, weak=True)
+    response.last_modified = entry.last_modified
+    response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(request)
+
+def hashing_busy_response():
+    """503 for requests turned away because every password hashing slot is taken"""
+    response = jsonify({'error': 'Too many login attempts in progress, retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def read_json_body(schema):
+    """Decode and validate the JSON request body, refusing oversized bodies before reading them whole"""
+    limit = current_app.config['MAX_JSON_BODY_BYTES']
+    if request.content_length is not None and request.content_length > limit:
+        raise PayloadTooLarge(limit)
+    if not request.is_json:
+        raise ValueError("Request body must be JSON")
+    # One byte past the limit is enough to tell a body without Content-Length is too large
+    return schema.decode(request.stream.read(limit + 1), limit)
+
+def payload_too_large_response(error):
+    """413 for a request body over MAX_JSON_BODY_BYTES"""
+    return jsonify({'error': str(error)}), 413
+
+def rejection_response(rejection):
+    """429/503 with Retry-After for a request shed by admission control"""
+    message = 'Too many requests' if rejection.status == 429 else 'Server busy, retry shortly'
+    response = jsonify({'error': message})
+    response.headers['Retry-After'] = str(rejection.retry_after)
+    return response, rejection.status
+
+def rate_limit_store(config):
+    if config['RATE_LIMIT_STORE'] == 'mongo':
+        return MongoStore(lambda: get_database()[RATE_LIMIT_COLLECTION])
+    return MemoryStore()
+
+def bulk_import_response(kind):
+    """Import a CSV/NDJSON request body in batches and return the per-row report"""
+    fmt = request.args.get('format')
+    if not fmt:
+        fmt = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+    batch_size = int(request.args.get('batch_size', DEFAULT_BATCH_SIZE))
+    # Decode the body incrementally instead of loading the whole upload
+    lines = codecs.iterdecode(request.stream, 'utf-8-sig')
+    report = db_manager.bulk_import(kind, read_rows(lines, fmt), batch_size)
+    return jsonify(report), 200
+
+def export_response(kind):
+    """Stream every client or requirement as NDJSON or CSV"""
+    fmt = request.args.get('format', 'ndjson')
+    batch_size = int(request.args.get('batch_size', DEFAULT_BATCH_SIZE))
+    # export_lines checks the format here, so a bad one is a 400 and not a broken stream
+    lines = export_lines(db_manager.iter_export(kind, batch_size), fmt, db_manager.export_fields(kind))
+
+    def generate():
+        try:
+            yield from lines
+        except Exception as e:
+            logger.error(f"Error streaming export: {str(e)}")
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={kind}.{fmt}'
+    return response
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -41,8 +130,14 @@ def token_required(f):
             return jsonify({'error': 'Token is missing!'}), 403
         try:
             token = token.split(" ")[1]  # Remove 'Bearer' prefix
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            db_manager.get_user_by_id(data['user_id'])  # Verify user exists
+            with metrics.AUTH_DURATION.time():
+                data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+                user = db_manager.get_user_by_id(data['user_id'])  # Verify user exists
+            if not user:
+                return jsonify({'error': 'Token is invalid!'}), 403
+            # Decoded once here and reused by the handlers
+            g.token_claims = data
+            g.current_user = user
         except jwt.ExpiredSignatureError:
             return jsonify({'error': 'Token has expired!'}), 403
         except jwt.InvalidTokenError:
@@ -53,7 +148,11 @@ def token_required(f):
         return f(*args, **kwargs)
     return decorated
 
-@app.route('/api/register', methods=['POST'])
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@api.route('/api/register', methods=['POST'])
 def register():
     try:
         data = request.json
@@ -71,171 +170,164 @@ def register():
         # Create new user
         user_data = {
             'username': username,
-            'password': password,
+            'password': db_manager.hash_password(password),
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow()
         }
         user_id = db_manager.insert_user(user_data)
         return jsonify({'message': 'User registered successfully', 'user_id': user_id}), 201
+    except HashingBusy:
+        return hashing_busy_response()
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
-@app.route('/api/login', methods=['POST'])
+@api.route('/api/login', methods=['POST'])
 def login():
     try:
         auth = request.json
-        print("Received login request with data:", {
-            'username': auth.get('username'),
-            'password': '***'  # No imprimimos la contraseña por seguridad
-        })
 
         if not auth or not auth.get('username') or not auth.get('password'):
-            print("Missing credentials")
+            logger.info("Login rejected: missing credentials")
             return jsonify({'error': 'Missing username or password'}), 401
 
         user = db_manager.get_user_by_username(auth.get('username'))
-        print("Found user:", {
-            '_id': str(user['_id']) if user and '_id' in user else None,
-            'username': user['username'] if user else None
-        })
 
         if not user:
-            print("User not found")
+            logger.info("Login rejected: unknown user", extra={'username': auth.get('username')})
             return jsonify({'error': 'User not found'}), 401
 
-        if not db_manager.verify_password(user['password'], auth.get('password')):
-            print("Invalid password")
+        if not db_manager.check_user_password(user, auth.get('password')):
+            logger.info("Login rejected: invalid password", extra={'username': auth.get('username')})
             return jsonify({'error': 'Invalid password'}), 401
 
         token = jwt.encode({
             'user_id': str(user['_id']),
             'exp': datetime.utcnow() + timedelta(hours=1)
-        }, app.config['SECRET_KEY'], algorithm="HS256")
+        }, current_app.config['SECRET_KEY'], algorithm="HS256")
 
         response_data = {
             'token': token,
             'username': user['username']
         }
-        print("Sending response:", response_data)
+        logger.debug("Login succeeded", extra={'username': user['username']})
         
         return jsonify(response_data)
 
+    except HashingBusy:
+        logger.warning("Login rejected: password hashing saturated")
+        return hashing_busy_response()
     except Exception as e:
-        print("Login error:", str(e))
+        logger.error(f"Login error: {str(e)}")
         return jsonify({'error': 'Authentication failed'}), 401
 
-@app.route('/api/logout', methods=['POST'])
+@api.route('/api/logout', methods=['POST'])
 def logout():
     # En un sistema basado en JWT, el logout se maneja en el frontend
     return jsonify({'message': 'Logged out successfully'}), 200
 
-@app.route('/api/clientes', methods=['POST'])
+@api.route('/api/clientes', methods=['POST'])
 @token_required
 def create_cliente():
     try:
-        data = request.json
+        data = read_json_body(CLIENTE_SCHEMA)
         cliente_id = db_manager.insert_cliente(data)
         return jsonify({
             'message': 'Cliente creado exitosamente',
             'cliente_id': cliente_id
         }), 201
+    except PayloadTooLarge as e:
+        return payload_too_large_response(e)
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error creando cliente: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
 
-@app.route('/api/clientes/<cliente_id>', methods=['PUT'])
+@api.route('/api/clientes/<cliente_id>', methods=['PUT'])
 @token_required
 def update_cliente(cliente_id):
     try:
-        data = request.json
+        data = read_json_body(CLIENTE_UPDATE_SCHEMA)
         success = db_manager.update_cliente(cliente_id, data)
         if success:
             return jsonify({'message': 'Cliente actualizado exitosamente'}), 200
         return jsonify({'error': 'Cliente no encontrado'}), 404
+    except PayloadTooLarge as e:
+        return payload_too_large_response(e)
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error actualizando cliente: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
 
-@app.route('/api/user', methods=['GET'])
+@api.route('/api/user', methods=['GET'])
 @token_required
 def get_current_user():
     try:
-        token = request.headers.get('Authorization').split(" ")[1]
-        data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-        user = db_manager.get_user_by_id(data['user_id'])
-        if user:
-            return jsonify(user), 200
-        return jsonify({'error': 'User not found'}), 404
+        return jsonify(g.current_user), 200
     except Exception as e:
         logger.error(f"Error retrieving user: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
-@app.route('/api/user', methods=['PUT'])
+@api.route('/api/user', methods=['PUT'])
 @token_required
 def update_current_user():
     try:
-        token = request.headers.get('Authorization').split(" ")[1]
-        data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-        user_id = data['user_id']
+        user_id = g.token_claims['user_id']
         update_data = request.json
         
         # Formatear la fecha de actualización
         update_data['updated_at'] = datetime.utcnow().strftime('%a, %d %b %Y %H:%M:%S GMT')
+        if update_data.get('password'):
+            update_data['password'] = db_manager.hash_password(update_data['password'])
         
         success = db_manager.update_user(user_id, update_data)
         if success:
             return jsonify({'message': 'User updated successfully'}), 200
         return jsonify({'error': 'User not found'}), 404
+    except HashingBusy:
+        return hashing_busy_response()
     except Exception as e:
         logger.error(f"Error updating user: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
-@app.route('/api/clientes', methods=['GET'])
+@api.route('/api/clientes', methods=['GET'])
 @token_required
 def get_clientes():
     try:
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 10))
         
-        filters = {}
-        
-        # Procesar filtros individuales
+        # Procesar filtros individuales con el índice de búsqueda
+        clauses = []
         if request.args.get('nombre'):
-            filters['nombre'] = {
-                "$regex": f".*{request.args.get('nombre')}.*",
-                "$options": "i"
-            }
+            clauses.extend(keyword_clauses(request.args.get('nombre'), ['nombre']))
         
         if request.args.get('ciudad'):
-            filters['ciudad'] = {
-                "$regex": f".*{request.args.get('ciudad')}.*",
-                "$options": "i"
-            }
-            
-        # Log para debugging
-        print("Filters applied:", filters)
+            clauses.extend(keyword_clauses(request.args.get('ciudad'), ['ciudad']))
+        
+        filters = {'$and': clauses} if clauses else {}
+        logger.debug("Filters applied: %s", filters)
         
         result = db_manager.get_all_clientes(
             filters=filters,
             page=page,
-            per_page=per_page
+            per_page=per_page,
+            cursor=request.args.get('cursor'),
+            with_total=request.args.get('with_total'),
+            fields=request.args.get('fields', SUMMARY)
         )
-        
-        # Log para debugging
-        print("Results:", result)
+        logger.debug("Returned %d clients", len(result['clientes']))
         
         return jsonify(result), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print("Error in get_clientes:", str(e))  # Log para debugging
         logger.error(f"Error retrieving clients: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
 
-@app.route('/api/clientes/<cliente_id>', methods=['DELETE'])
+@api.route('/api/clientes/<cliente_id>', methods=['DELETE'])
 @token_required
 def delete_cliente(cliente_id):
     try:
@@ -247,7 +339,7 @@ def delete_cliente(cliente_id):
         logger.error(f"Error deleting client: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
-@app.route('/api/clientes/search', methods=['GET'])
+@api.route('/api/clientes/search', methods=['GET'])
 @token_required
 def search_clientes():
     try:
@@ -255,36 +347,74 @@ def search_clientes():
         if not search_term:
             return jsonify({'error': 'Search term is required'}), 400
         
-        results = db_manager.search_clientes(search_term)
-        return jsonify({'results': results}), 200
+        if request.args.get('format') == 'ndjson':
+            limit = request.args.get('limit')
+            documents = db_manager.iter_search_clientes(search_term, int(limit) if limit else None,
+                                                        fields=request.args.get('fields', SUMMARY))
+            return ndjson_response(documents)
+
+        result = db_manager.search_clientes(
+            search_term,
+            limit=int(request.args.get('limit', SEARCH_DEFAULT_LIMIT)),
+            cursor=request.args.get('cursor'),
+            fields=request.args.get('fields', SUMMARY)
+        )
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error searching clients: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
-@app.route('/api/reviews', methods=['GET'])
+@api.route('/api/clientes/import', methods=['POST'])
+@token_required
+def import_clientes():
+    try:
+        return bulk_import_response('clientes')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error importing clients: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@api.route('/api/clientes/export', methods=['GET'])
+@token_required
+def export_clientes():
+    try:
+        return export_response('clientes')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error exporting clients: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@api.route('/api/reviews', methods=['GET'])
 def get_reviews():
     try:
-        reviews = db_manager.get_all_reviews()
-        return jsonify(reviews), 200
+        return cached_json_response(db_manager.get_cached_reviews(), 'public, no-cache')
     except Exception as e:
         logger.error(f"Error retrieving reviews: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
 
-@app.route('/api/submit-requirements', methods=['POST'])
+@api.route('/api/submit-requirements', methods=['POST'])
 def submit_requirements():
     try:
-        data = request.json
+        data = read_json_body(REQUIREMENT_SCHEMA)
         requirement_id = db_manager.insert_project_requirement(data)
         return jsonify({
             'message': 'Requirement created successfully',
             'requirement_id': requirement_id
         }), 201
+    except PayloadTooLarge as e:
+        return payload_too_large_response(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error creating requirement: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
     
-@app.route('/api/requirements', methods=['GET'])
+@api.route('/api/requirements', methods=['GET'])
 @token_required
 def get_requirements():
     try:
@@ -307,7 +437,12 @@ def get_requirements():
             filters=filters,
             sort_by=sort_by,
             page=page,
-            per_page=per_page
+            per_page=per_page,
+            cursor=request.args.get('cursor'),
+            with_total=request.args.get('with_total'),
+            fields=request.args.get('fields', SUMMARY),
+            # The sort plan is only reported when debugging
+            with_plan=current_app.debug
         )
         return jsonify(result), 200
     except ValueError as e:
@@ -316,25 +451,36 @@ def get_requirements():
         logger.error(f"Error retrieving requirements: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
-@app.route('/api/requirements/<requirement_id>', methods=['GET'])
+@api.route('/api/requirements/<requirement_id>', methods=['GET'])
 def get_requirement(requirement_id):
     try:
-        requirement = db_manager.get_project_requirement(requirement_id)
+        fields = request.args.get('fields', ALL)
+        if fields == ALL:
+            entry = db_manager.get_cached_project_requirement(requirement_id)
+            if entry:
+                return cached_json_response(entry, 'private, no-cache')
+            return jsonify({'error': 'Requirement not found'}), 404
+
+        requirement = db_manager.get_project_requirement(requirement_id, fields)
         if requirement:
             return jsonify(requirement), 200
         return jsonify({'error': 'Requirement not found'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error retrieving requirement: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
-@app.route('/api/requirements/<requirement_id>', methods=['PUT'])
+@api.route('/api/requirements/<requirement_id>', methods=['PUT'])
 def update_requirement(requirement_id):
     try:
-        data = request.json
+        data = read_json_body(REQUIREMENT_UPDATE_SCHEMA)
         success = db_manager.update_project_requirement(requirement_id, data)
         if success:
             return jsonify({'message': 'Solicitud actualizada'}), 200
         return jsonify({'error': 'Solicitud no encontrada'}), 404
+    except PayloadTooLarge as e:
+        return payload_too_large_response(e)
     except ValueError as e:
         logger.warning(f"Validation error: {e}")
         return jsonify({'error': str(e)}), 400
@@ -342,7 +488,7 @@ def update_requirement(requirement_id):
         logger.error(f"Unexpected error: {e}")
         return jsonify({'error': 'Unexpected error occurred'}), 500
 
-@app.route('/api/requirements/<requirement_id>', methods=['DELETE'])
+@api.route('/api/requirements/<requirement_id>', methods=['DELETE'])
 def delete_requirement(requirement_id):
     try:
         success = db_manager.delete_project_requirement(requirement_id)
@@ -353,20 +499,55 @@ def delete_requirement(requirement_id):
         logger.error(f"Error deleting requirement: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
-@app.route('/api/requirements/search', methods=['GET'])
+@api.route('/api/requirements/search', methods=['GET'])
 def search_requirements():
     try:
         search_term = request.args.get('q', '')
         if not search_term:
             return jsonify({'error': 'Search term is required'}), 400
         
-        results = db_manager.search_requirements(search_term)
-        return jsonify({'results': results}), 200
+        if request.args.get('format') == 'ndjson':
+            limit = request.args.get('limit')
+            documents = db_manager.iter_search_requirements(search_term, int(limit) if limit else None,
+                                                            fields=request.args.get('fields', SUMMARY))
+            return ndjson_response(documents)
+
+        result = db_manager.search_requirements(
+            search_term,
+            limit=int(request.args.get('limit', SEARCH_DEFAULT_LIMIT)),
+            cursor=request.args.get('cursor'),
+            fields=request.args.get('fields', SUMMARY)
+        )
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error searching requirements: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
-@app.route('/api/requirements/stats', methods=['GET'])
+@api.route('/api/requirements/import', methods=['POST'])
+@token_required
+def import_requirements():
+    try:
+        return bulk_import_response('requirements')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error importing requirements: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@api.route('/api/requirements/export', methods=['GET'])
+@token_required
+def export_requirements():
+    try:
+        return export_response('requirements')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error exporting requirements: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@api.route('/api/requirements/stats', methods=['GET'])
 def get_stats():
     try:
         stats = db_manager.get_requirements_stats()
@@ -375,5 +556,122 @@ def get_stats():
         logger.error(f"Error retrieving stats: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@api.route('/api/requirements/analytics', methods=['GET'])
+@token_required
+def get_analytics():
+    try:
+        granularity, dimension, start, end = parse_analytics_args(request.args)
+        analytics = db_manager.get_requirements_analytics(granularity, dimension, start, end,
+                                                          max_age=current_app.config['ANALYTICS_MAX_AGE'])
+        return jsonify(analytics), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error retrieving analytics: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@api.route('/api/changes/stream', methods=['GET'])
+@token_required
+def stream_changes():
+    """Server-Sent Events for inserts, updates and deletes of requirements, clients and reviews"""
+    slots = current_app.extensions['change_stream_slots']
+    if not slots.acquire():
+        return rejection_response(Rejection(503, 'overloaded', 5))
+    subscription = Subscription(change_bus)
+    frames = sse_frames(subscription, request.headers.get('Last-Event-ID'),
+                        duration=current_app.config['CHANGE_STREAM_DURATION'])
+    response = Response(frames, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Keep proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+
+    @response.call_on_close
+    def close_stream():
+        subscription.close()
+        slots.release()
+
+    return response
+
+def create_app(config_object=Config):
+    """Application factory used by wsgi.py, `flask run` and the dev server"""
+    configure_logging(config_object)
+    app = Flask(__name__)
+    app.config.from_object(config_object)
+    app.json = FastJSONProvider(app)
+
+    # Configure CORS
+    CORS(app, resources={
+        r"/api/*": {
+            "origins": ["http://localhost:3000"],
+            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+            "allow_headers": ["Content-Type", "Authorization"]
+        }
+    })
+
+    app.register_blueprint(api)
+
+    if app.config['METRICS_ENABLED']:
+        @app.before_request
+        def start_timer():
+            g.request_started = time.perf_counter()
+
+        @app.after_request
+        def record_request(response):
+            # Label by the URL rule, not the path, to keep one series per route
+            route = request.url_rule.rule if request.url_rule else '<unmatched>'
+            metrics.observe_request(request.method, route, response.status_code,
+                                    time.perf_counter() - g.request_started)
+            return response
+
+    admission = AdmissionControl.from_config(app.config, rate_limit_store(app.config))
+
+    # Streams are long-lived, so they get their own cap instead of admission slots
+    app.extensions['change_stream_slots'] = ConcurrencyLimiter(app.config['CHANGE_STREAM_MAX_CLIENTS'],
+                                                               app.config['ADMISSION_TIMEOUT'])
+    change_feed = ChangeFeed.from_config(app.config, change_bus, get_database)
+    change_bus.subscribe(db_manager.apply_change)
+
+    @app.before_request
+    def start_change_feed():
+        # Started by the first request of each worker, as threads don't survive the fork
+        change_feed.start()
+
+    @app.before_request
+    def admit():
+        # CORS preflights, scrapes and change streams are never shed
+        if request.method == 'OPTIONS' or request.endpoint in ('api.get_metrics', 'api.stream_changes'):
+            return None
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        client = client_address(request.access_route, request.remote_addr,
+                                app.config['RATE_LIMIT_TRUSTED_PROXIES'])
+        rejection, g.admission_slots = admission.admit(route, client)
+        if rejection is not None:
+            metrics.REQUESTS_SHED.inc(route, rejection.reason)
+            logger.info("Request shed: %s", rejection.reason, extra={'route': route, 'client': client})
+            return rejection_response(rejection)
+        return None
+
+    @app.teardown_request
+    def release_admission(exc):
+        # Streaming responses keep their slots until the body is sent
+        admission.release(g.pop('admission_slots', ()))
+
+    @app.after_request
+    def compress(response):
+        return compress_response(response, request.headers.get('Accept-Encoding'),
+                                 app.config['COMPRESS_MIN_SIZE'], app.config['COMPRESS_LEVEL'])
+
+    # Apply the index registry; a failure here must not keep the API from starting
+    if app.config['ENSURE_INDEXES']:
+        try:
+            db_manager.ensure_indexes()
+        except Exception as e:
+            logger.error(f"Index bootstrap failed: {str(e)}")
+        finally:
+            # Don't carry an open client into forked workers
+            db_manager.close()
+
+    return app
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    create_app().run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,680 @@
+"""Async ASGI server exposing the same /api/* routes as app.py.
+
+Run with any ASGI server, e.g. ``hypercorn asgi:app --bind 0.0.0.0:5000``.
+Handlers await AsyncDatabaseManager, so a single worker keeps many requests
+in flight while they wait on MongoDB. Unlike Flask, Quart caps request
+bodies at ``MAX_CONTENT_LENGTH`` (16 MiB by default), which also bounds the
+bulk imports.
+"""
+from quart import Quart, Response, g, request, jsonify
+from quart_cors import cors
+from async_database import AsyncDatabaseManager
+from config import Config
+from logging_setup import configure_logging
+import metrics
+from compression import set_gzip_body, should_compress
+from json_provider import FastJSONProvider, dumps_bytes
+from database import SEARCH_DEFAULT_LIMIT
+from projection import ALL, SUMMARY
+from bulk import DEFAULT_BATCH_SIZE, aexport_lines, read_rows, spool
+from passwords import HashingBusy
+from schema import (
+    CLIENTE_SCHEMA, CLIENTE_UPDATE_SCHEMA, REQUIREMENT_SCHEMA, REQUIREMENT_UPDATE_SCHEMA, PayloadTooLarge
+)
+from admission import (
+    RATE_LIMIT_COLLECTION, AsyncAdmissionControl, AsyncConcurrencyLimiter, MemoryStore, MongoStore, Rejection,
+    client_address
+)
+from analytics import parse_analytics_args
+from changes import AsyncChangeFeed, AsyncSubscription, async_sse_frames, change_bus
+from search import keyword_clauses
+import codecs
+import logging
+from datetime import datetime, timedelta
+import time
+from bson.errors import InvalidId
+import jwt
+from functools import wraps
+
+configure_logging(Config)
+logger = logging.getLogger(__name__)
+
+app = Quart(__name__)
+app.config.from_object(Config)
+app.json = FastJSONProvider(app)
+
+app = cors(
+    app,
+    allow_origin=["http://localhost:3000"],
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"]
+)
+
+# Created in the serving event loop by connect_database
+db_manager = None
+
+if Config.RATE_LIMIT_STORE == 'mongo':
+    rate_limit_store = MongoStore(lambda: db_manager.db[RATE_LIMIT_COLLECTION])
+else:
+    rate_limit_store = MemoryStore()
+admission = AsyncAdmissionControl.from_config(app.config, rate_limit_store)
+change_stream_slots = AsyncConcurrencyLimiter(Config.CHANGE_STREAM_MAX_CLIENTS, Config.ADMISSION_TIMEOUT)
+change_feed = AsyncChangeFeed.from_config(app.config, change_bus, lambda: db_manager.db)
+
+
+@app.before_serving
+async def connect_database():
+    global db_manager
+    db_manager = AsyncDatabaseManager()
+    try:
+        await db_manager.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Index bootstrap failed: {str(e)}")
+    change_bus.subscribe(db_manager.apply_change)
+    change_feed.start()
+
+
+@app.after_serving
+async def stop_change_feed():
+    await change_feed.stop()
+
+
+if Config.METRICS_ENABLED:
+    @app.before_request
+    async def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    async def record_request(response):
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        metrics.observe_request(request.method, route, response.status_code,
+                                time.perf_counter() - g.request_started)
+        return response
+
+
+@app.before_request
+async def admit():
+    if request.method == 'OPTIONS' or request.endpoint in ('get_metrics', 'stream_changes'):
+        return None
+    route = request.url_rule.rule if request.url_rule else '<unmatched>'
+    client = client_address(request.access_route, request.remote_addr, Config.RATE_LIMIT_TRUSTED_PROXIES)
+    rejection, g.admission_slots = await admission.admit(route, client)
+    if rejection is not None:
+        metrics.REQUESTS_SHED.inc(route, rejection.reason)
+        logger.info("Request shed: %s", rejection.reason, extra={'route': route, 'client': client})
+        return rejection_response(rejection)
+    return None
+
+
+@app.teardown_request
+async def release_admission(exc):
+    admission.release(g.pop('admission_slots', ()))
+
+
+@app.after_request
+async def compress(response):
+    if should_compress(response, request.headers.get('Accept-Encoding'),
+                       app.config['COMPRESS_MIN_SIZE']):
+        set_gzip_body(response, await response.get_data(), app.config['COMPRESS_LEVEL'])
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+async def get_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.errorhandler(InvalidId)
+async def handle_invalid_id(error):
+    return jsonify({'error': 'Invalid requirement ID format'}), 400
+
+
+async def cached_json_response(entry, cache_control):
+    """Serve a CachedResponse, answering 304 when the client's validators match"""
+    response = Response(entry.body, mimetype='application/json')
+    response.set_etag(entry.etag, weak=True)
+    response.last_modified = entry.last_modified
+    response.headers['Cache-Control'] = cache_control
+    return await response.make_conditional(request)
+
+
+async def read_json_body(schema):
+    """Decode and validate the JSON request body, refusing oversized bodies before reading them whole"""
+    limit = app.config['MAX_JSON_BODY_BYTES']
+    if request.content_length is not None and request.content_length > limit:
+        raise PayloadTooLarge(limit)
+    if not request.is_json:
+        raise ValueError("Request body must be JSON")
+    body = bytearray()
+    async for chunk in request.body:
+        body += chunk
+        if len(body) > limit:
+            raise PayloadTooLarge(limit)
+    return schema.decode(bytes(body), limit)
+
+
+def payload_too_large_response(error):
+    """413 for a request body over MAX_JSON_BODY_BYTES"""
+    return jsonify({'error': str(error)}), 413
+
+
+def hashing_busy_response():
+    """503 for requests turned away because every password hashing slot is taken"""
+    response = jsonify({'error': 'Too many login attempts in progress, retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+def rejection_response(rejection):
+    """429/503 with Retry-After for a request shed by admission control"""
+    message = 'Too many requests' if rejection.status == 429 else 'Server busy, retry shortly'
+    response = jsonify({'error': message})
+    response.headers['Retry-After'] = str(rejection.retry_after)
+    return response, rejection.status
+
+
+def ndjson_response(documents):
+    """Stream documents as newline-delimited JSON without buffering the full result"""
+    async def generate():
+        try:
+            async for document in documents:
+                yield dumps_bytes(document) + b'\n'
+        except Exception as e:
+            logger.error(f"Error streaming results: {str(e)}")
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+async def bulk_import_response(kind):
+    """Import a CSV/NDJSON request body in batches and return the per-row report"""
+    fmt = request.args.get('format')
+    if not fmt:
+        fmt = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+    batch_size = int(request.args.get('batch_size', DEFAULT_BATCH_SIZE))
+    # read_rows needs a synchronous line iterator, so the upload is spooled (to disk when large) first
+    with await spool(request.body) as body:
+        report = await db_manager.bulk_import(kind, read_rows(codecs.iterdecode(body, 'utf-8-sig'), fmt),
+                                              batch_size)
+    return jsonify(report), 200
+
+
+def export_response(kind):
+    """Stream every client or requirement as NDJSON or CSV"""
+    fmt = request.args.get('format', 'ndjson')
+    batch_size = int(request.args.get('batch_size', DEFAULT_BATCH_SIZE))
+    # aexport_lines checks the format here, so a bad one is a 400 and not a broken stream
+    lines = aexport_lines(db_manager.iter_export(kind, batch_size), fmt, db_manager.export_fields(kind))
+
+    async def generate():
+        try:
+            async for line in lines:
+                yield line
+        except Exception as e:
+            logger.error(f"Error streaming export: {str(e)}")
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = Response(generate(), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={kind}.{fmt}'
+    return response
+
+
+def token_required(f):
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        token = request.headers.get('Authorization')
+        if not token:
+            return jsonify({'error': 'Token is missing!'}), 403
+        try:
+            token = token.split(" ")[1]
+            with metrics.AUTH_DURATION.time():
+                data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
+                user = await db_manager.get_user_by_id(data['user_id'])
+            if not user:
+                return jsonify({'error': 'Token is invalid!'}), 403
+            g.token_claims = data
+            g.current_user = user
+        except jwt.ExpiredSignatureError:
+            return jsonify({'error': 'Token has expired!'}), 403
+        except jwt.InvalidTokenError:
+            return jsonify({'error': 'Token is invalid!'}), 403
+        except Exception as e:
+            logger.error(f"Token error: {str(e)}")
+            return jsonify({'error': 'Token is invalid!'}), 403
+        return await f(*args, **kwargs)
+    return decorated
+
+
+@app.route('/api/register', methods=['POST'])
+async def register():
+    try:
+        data = await request.get_json()
+        username = data.get('username')
+        password = data.get('password')
+
+        if not username or not password:
+            return jsonify({'message': 'Missing required fields'}), 400
+
+        existing_user = await db_manager.get_user_by_username(username)
+        if existing_user:
+            return jsonify({'message': 'Username already exists'}), 400
+
+        user_data = {
+            'username': username,
+            'password': await db_manager.hash_password(password),
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow()
+        }
+        user_id = await db_manager.insert_user(user_data)
+        return jsonify({'message': 'User registered successfully', 'user_id': user_id}), 201
+    except HashingBusy:
+        return hashing_busy_response()
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+
+@app.route('/api/login', methods=['POST'])
+async def login():
+    try:
+        auth = await request.get_json()
+        if not auth or not auth.get('username') or not auth.get('password'):
+            logger.info("Login rejected: missing credentials")
+            return jsonify({'error': 'Missing username or password'}), 401
+
+        user = await db_manager.get_user_by_username(auth.get('username'))
+        if not user:
+            logger.info("Login rejected: unknown user", extra={'username': auth.get('username')})
+            return jsonify({'error': 'User not found'}), 401
+
+        if not await db_manager.check_user_password(user, auth.get('password')):
+            logger.info("Login rejected: invalid password", extra={'username': auth.get('username')})
+            return jsonify({'error': 'Invalid password'}), 401
+
+        token = jwt.encode({
+            'user_id': str(user['_id']),
+            'exp': datetime.utcnow() + timedelta(hours=1)
+        }, app.config['SECRET_KEY'], algorithm="HS256")
+
+        return jsonify({'token': token, 'username': user['username']})
+    except HashingBusy:
+        logger.warning("Login rejected: password hashing saturated")
+        return hashing_busy_response()
+    except Exception as e:
+        logger.error(f"Login error: {str(e)}")
+        return jsonify({'error': 'Authentication failed'}), 401
+
+
+@app.route('/api/logout', methods=['POST'])
+async def logout():
+    return jsonify({'message': 'Logged out successfully'}), 200
+
+
+@app.route('/api/clientes', methods=['POST'])
+@token_required
+async def create_cliente():
+    try:
+        data = await read_json_body(CLIENTE_SCHEMA)
+        cliente_id = await db_manager.insert_cliente(data)
+        return jsonify({
+            'message': 'Cliente creado exitosamente',
+            'cliente_id': cliente_id
+        }), 201
+    except PayloadTooLarge as e:
+        return payload_too_large_response(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error creando cliente: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+
+@app.route('/api/clientes/<cliente_id>', methods=['PUT'])
+@token_required
+async def update_cliente(cliente_id):
+    try:
+        data = await read_json_body(CLIENTE_UPDATE_SCHEMA)
+        success = await db_manager.update_cliente(cliente_id, data)
+        if success:
+            return jsonify({'message': 'Cliente actualizado exitosamente'}), 200
+        return jsonify({'error': 'Cliente no encontrado'}), 404
+    except PayloadTooLarge as e:
+        return payload_too_large_response(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error actualizando cliente: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+
+@app.route('/api/user', methods=['GET'])
+@token_required
+async def get_current_user():
+    return jsonify(g.current_user), 200
+
+
+@app.route('/api/user', methods=['PUT'])
+@token_required
+async def update_current_user():
+    try:
+        update_data = await request.get_json()
+        update_data['updated_at'] = datetime.utcnow().strftime('%a, %d %b %Y %H:%M:%S GMT')
+        if update_data.get('password'):
+            update_data['password'] = await db_manager.hash_password(update_data['password'])
+
+        success = await db_manager.update_user(g.token_claims['user_id'], update_data)
+        if success:
+            return jsonify({'message': 'User updated successfully'}), 200
+        return jsonify({'error': 'User not found'}), 404
+    except HashingBusy:
+        return hashing_busy_response()
+    except Exception as e:
+        logger.error(f"Error updating user: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/clientes', methods=['GET'])
+@token_required
+async def get_clientes():
+    try:
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', 10))
+
+        clauses = []
+        if request.args.get('nombre'):
+            clauses.extend(keyword_clauses(request.args.get('nombre'), ['nombre']))
+        if request.args.get('ciudad'):
+            clauses.extend(keyword_clauses(request.args.get('ciudad'), ['ciudad']))
+        filters = {'$and': clauses} if clauses else {}
+
+        result = await db_manager.get_all_clientes(
+            filters=filters,
+            page=page,
+            per_page=per_page,
+            cursor=request.args.get('cursor'),
+            with_total=request.args.get('with_total'),
+            fields=request.args.get('fields', SUMMARY)
+        )
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error retrieving clients: {str(e)}")
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+
+@app.route('/api/clientes/<cliente_id>', methods=['DELETE'])
+@token_required
+async def delete_cliente(cliente_id):
+    try:
+        success = await db_manager.delete_cliente(cliente_id)
+        if success:
+            return jsonify({'message': 'Client deleted successfully'}), 200
+        return jsonify({'error': 'Client not found'}), 404
+    except Exception as e:
+        logger.error(f"Error deleting client: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/clientes/search', methods=['GET'])
+@token_required
+async def search_clientes():
+    try:
+        search_term = request.args.get('q', '')
+        if not search_term:
+            return jsonify({'error': 'Search term is required'}), 400
+
+        if request.args.get('format') == 'ndjson':
+            limit = request.args.get('limit')
+            documents = db_manager.iter_search_clientes(search_term, int(limit) if limit else None,
+                                                        fields=request.args.get('fields', SUMMARY))
+            return ndjson_response(documents)
+
+        result = await db_manager.search_clientes(
+            search_term,
+            limit=int(request.args.get('limit', SEARCH_DEFAULT_LIMIT)),
+            cursor=request.args.get('cursor'),
+            fields=request.args.get('fields', SUMMARY)
+        )
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error searching clients: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/clientes/import', methods=['POST'])
+@token_required
+async def import_clientes():
+    try:
+        return await bulk_import_response('clientes')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error importing clients: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/clientes/export', methods=['GET'])
+@token_required
+async def export_clientes():
+    try:
+        return export_response('clientes')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error exporting clients: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/reviews', methods=['GET'])
+async def get_reviews():
+    try:
+        return await cached_json_response(await db_manager.get_cached_reviews(), 'public, no-cache')
+    except Exception as e:
+        logger.error(f"Error retrieving reviews: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/submit-requirements', methods=['POST'])
+async def submit_requirements():
+    try:
+        data = await read_json_body(REQUIREMENT_SCHEMA)
+        requirement_id = await db_manager.insert_project_requirement(data)
+        return jsonify({
+            'message': 'Requirement created successfully',
+            'requirement_id': requirement_id
+        }), 201
+    except PayloadTooLarge as e:
+        return payload_too_large_response(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error creating requirement: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/requirements', methods=['GET'])
+@token_required
+async def get_requirements():
+    try:
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', 10))
+
+        filters = {}
+        for field in ['status', 'priority', 'department']:
+            if request.args.get(field):
+                filters[field] = request.args.get(field)
+
+        sort_by = {}
+        if request.args.get('sort_field'):
+            sort_by[request.args.get('sort_field')] = int(request.args.get('sort_direction', 1))
+
+        result = await db_manager.get_all_project_requirements(
+            filters=filters,
+            sort_by=sort_by,
+            page=page,
+            per_page=per_page,
+            cursor=request.args.get('cursor'),
+            with_total=request.args.get('with_total'),
+            fields=request.args.get('fields', SUMMARY),
+            # The sort plan is only reported when debugging
+            with_plan=app.debug
+        )
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error retrieving requirements: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/requirements/<requirement_id>', methods=['GET'])
+async def get_requirement(requirement_id):
+    try:
+        fields = request.args.get('fields', ALL)
+        if fields == ALL:
+            entry = await db_manager.get_cached_project_requirement(requirement_id)
+            if entry:
+                return await cached_json_response(entry, 'private, no-cache')
+            return jsonify({'error': 'Requirement not found'}), 404
+
+        requirement = await db_manager.get_project_requirement(requirement_id, fields)
+        if requirement:
+            return jsonify(requirement), 200
+        return jsonify({'error': 'Requirement not found'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error retrieving requirement: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/requirements/<requirement_id>', methods=['PUT'])
+async def update_requirement(requirement_id):
+    try:
+        data = await read_json_body(REQUIREMENT_UPDATE_SCHEMA)
+        success = await db_manager.update_project_requirement(requirement_id, data)
+        if success:
+            return jsonify({'message': 'Solicitud actualizada'}), 200
+        return jsonify({'error': 'Solicitud no encontrada'}), 404
+    except PayloadTooLarge as e:
+        return payload_too_large_response(e)
+    except ValueError as e:
+        logger.warning(f"Validation error: {e}")
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}")
+        return jsonify({'error': 'Unexpected error occurred'}), 500
+
+
+@app.route('/api/requirements/<requirement_id>', methods=['DELETE'])
+async def delete_requirement(requirement_id):
+    try:
+        success = await db_manager.delete_project_requirement(requirement_id)
+        if success:
+            return jsonify({'message': 'Requirement deleted successfully'}), 200
+        return jsonify({'error': 'Requirement not found'}), 404
+    except Exception as e:
+        logger.error(f"Error deleting requirement: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/requirements/search', methods=['GET'])
+async def search_requirements():
+    try:
+        search_term = request.args.get('q', '')
+        if not search_term:
+            return jsonify({'error': 'Search term is required'}), 400
+
+        if request.args.get('format') == 'ndjson':
+            limit = request.args.get('limit')
+            documents = db_manager.iter_search_requirements(search_term, int(limit) if limit else None,
+                                                            fields=request.args.get('fields', SUMMARY))
+            return ndjson_response(documents)
+
+        result = await db_manager.search_requirements(
+            search_term,
+            limit=int(request.args.get('limit', SEARCH_DEFAULT_LIMIT)),
+            cursor=request.args.get('cursor'),
+            fields=request.args.get('fields', SUMMARY)
+        )
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error searching requirements: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/requirements/import', methods=['POST'])
+@token_required
+async def import_requirements():
+    try:
+        return await bulk_import_response('requirements')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error importing requirements: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/requirements/export', methods=['GET'])
+@token_required
+async def export_requirements():
+    try:
+        return export_response('requirements')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error exporting requirements: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/requirements/stats', methods=['GET'])
+async def get_stats():
+    try:
+        stats = await db_manager.get_requirements_stats()
+        return jsonify(stats), 200
+    except Exception as e:
+        logger.error(f"Error retrieving stats: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/requirements/analytics', methods=['GET'])
+@token_required
+async def get_analytics():
+    try:
+        granularity, dimension, start, end = parse_analytics_args(request.args)
+        analytics = await db_manager.get_requirements_analytics(granularity, dimension, start, end,
+                                                                max_age=Config.ANALYTICS_MAX_AGE)
+        return jsonify(analytics), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error retrieving analytics: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/changes/stream', methods=['GET'])
+@token_required
+async def stream_changes():
+    """Server-Sent Events for inserts, updates and deletes of requirements, clients and reviews"""
+    if not await change_stream_slots.acquire():
+        return rejection_response(Rejection(503, 'overloaded', 5))
+    subscription = AsyncSubscription(change_bus)
+    last_event_id = request.headers.get('Last-Event-ID')
+
+    async def generate():
+        try:
+            async for frame in async_sse_frames(subscription, last_event_id,
+                                                duration=Config.CHANGE_STREAM_DURATION):
+                yield frame
+        finally:
+            subscription.close()
+            change_stream_slots.release()
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # Outlive Quart's RESPONSE_TIMEOUT
+    response.timeout = None
+    return response
@@ -0,0 +1,854 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from bson import ObjectId, json_util
+from datetime import datetime, timedelta
+import logging
+from config import Config, mongo_client_options
+from pagination import encode_cursor, decode_cursor, keyset_query
+from cache import TTLCache
+from bulk import aimport_rows
+from metrics import instrument, mongo_event_listeners
+from http_cache import ResponseCache
+from indexes import INDEXES, RETIRED_INDEXES
+from analytics import (
+    ANALYTICS_COLLECTION, DIMENSIONS, GRANULARITIES, REFRESH_LEASE, REFRESH_STATE_ID, bucket_start,
+    lease_query, new_refresh_id, oldest_change_pipeline, refresh_start, rollup_pipeline,
+    series_from_buckets, series_query, stale_buckets_filter
+)
+from stats import STATS_FIELDS, STATS_PIPELINE, StatsSnapshot, stats_from_facet
+from search import (
+    CLIENTE_SEARCH_FIELDS, REQUIREMENT_SEARCH_FIELDS, SEARCH_PROJECTION,
+    search_fields, ranked_pipeline, untouched_search_fields
+)
+from projection import ALL, SUMMARY, build_projection
+from sorting import plan_sort, plan_to_dict
+from passwords import password_hasher
+from changes import OwnWrites
+from references import (
+    CLIENTE_REFERENCE_PROJECTION, ClienteResolver, cliente_tag, normalize_email, requestor_changes, requirement_tags
+)
+from database import (
+    DatabaseManager, TOTAL_MODES, SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, SEARCH_BATCH_SIZE,
+    CLIENTE_DOCUMENT_FIELDS, CLIENTE_SUMMARY_FIELDS, REQUIREMENT_DOCUMENT_FIELDS, REQUIREMENT_SUMMARY_FIELDS
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabaseManager:
+    """Motor-backed mirror of DatabaseManager for the ASGI server.
+
+    Every public coroutine has the same name, arguments and return value as
+    its DatabaseManager counterpart. The client must be created inside the
+    running event loop, so build the manager from a startup hook.
+    """
+
+    serialize_object_id = staticmethod(DatabaseManager.serialize_object_id)
+    validate_requirement_data = staticmethod(DatabaseManager.validate_requirement_data)
+    validate_update_data = staticmethod(DatabaseManager.validate_update_data)
+    validate_cliente_data = staticmethod(DatabaseManager.validate_cliente_data)
+    export_fields = staticmethod(DatabaseManager.export_fields)
+
+    def __init__(self, uri=None):
+        try:
+            listeners = mongo_event_listeners() if Config.METRICS_ENABLED else []
+            self.client = AsyncIOMotorClient(uri or Config.MONGO_URI, event_listeners=listeners,
+                                             **mongo_client_options())
+            self.db = self.client[Config.MONGO_DB]
+            self.collection = self.db['Solicitudes']
+            self.users_collection = self.db['Usuarios']
+            self.reviews_collection = self.db['Calificaciones']
+            self.clientes_collection = self.db['Clientes']
+            self.analytics_collection = self.db[ANALYTICS_COLLECTION]
+            self._count_caches = {
+                self.collection.name: TTLCache(maxsize=256, ttl=30),
+                self.clientes_collection.name: TTLCache(maxsize=256, ttl=30)
+            }
+            self._stats_snapshot = StatsSnapshot(ttl=60)
+            self._own_writes = OwnWrites(maxsize=4096, ttl=60)
+            self._user_cache = TTLCache(maxsize=1024, ttl=300)
+            self._response_cache = ResponseCache(maxsize=1024, ttl=300)
+            self._cliente_resolver = ClienteResolver(maxsize=4096, ttl=60)
+            logger.info("Successfully connected to MongoDB (async)")
+        except Exception as e:
+            logger.error(f"Error connecting to MongoDB: {str(e)}")
+            raise
+
+    async def ensure_indexes(self):
+        """Create the indexes declared in the index registry"""
+        created, failed = [], set()
+        for spec in INDEXES:
+            try:
+                name = await self.db[spec.collection].create_index(spec.keys, **spec.options)
+                created.append(f"{spec.collection}.{name}")
+            except OperationFailure as e:
+                failed.add(spec.collection)
+                logger.error(f"Error creating index {spec.options.get('name')} on {spec.collection}: {str(e)}")
+        for collection, name in RETIRED_INDEXES:
+            if collection in failed:
+                continue
+            try:
+                if name in await self.db[collection].index_information():
+                    await self.db[collection].drop_index(name)
+                    logger.info(f"Dropped retired index {name} on {collection}")
+            except OperationFailure as e:
+                logger.error(f"Error dropping index {name} on {collection}: {str(e)}")
+        return created
+
+    async def insert_user(self, user_data):
+        """Insert a new user into the database"""
+        try:
+            result = await self.users_collection.insert_one(user_data)
+            logger.debug("Successfully inserted user with ID: %s", result.inserted_id)
+            return str(result.inserted_id)
+        except Exception as e:
+            logger.error(f"Error inserting user: {str(e)}")
+            raise
+
+    async def update_user(self, user_id, update_data):
+        """Update an existing user"""
+        try:
+            if '_id' in update_data:
+                del update_data['_id']
+
+            result = await self.users_collection.update_one(
+                {"_id": ObjectId(user_id)},
+                {"$set": update_data}
+            )
+
+            self._user_cache.delete(str(user_id))
+            if result.matched_count > 0:
+                logger.debug("Successfully updated user: %s", user_id)
+                return True
+            logger.warning(f"No user found with ID: {user_id}")
+            return False
+        except Exception as e:
+            logger.error(f"Error updating user: {str(e)}")
+            raise
+
+    async def get_all_reviews(self):
+        """Retrieve all reviews from the database"""
+        try:
+            # ObjectIds, nested ones included, are encoded by the JSON provider
+            return await self.reviews_collection.find().to_list(length=None)
+        except Exception as e:
+            logger.error(f"Error retrieving reviews: {str(e)}")
+            raise
+
+    async def get_cached_reviews(self):
+        """All reviews as a CachedResponse; reviews are edited outside the API, so the change feed or the TTL refreshes them"""
+        return await self._response_cache.aget(('reviews',), self.get_all_reviews)
+
+    async def get_all_clientes(self, filters=None, page=1, per_page=10, cursor=None, with_total=None,
+                               fields=SUMMARY):
+        """Retrieve all clients with optional filtering and pagination"""
+        try:
+            query = filters if filters else {}
+            projection = build_projection(fields, CLIENTE_SUMMARY_FIELDS, CLIENTE_DOCUMENT_FIELDS)
+
+            if cursor is not None:
+                clientes, next_cursor = await self._find_page_by_cursor(
+                    self.clientes_collection, query, '_id', 1, per_page, cursor, projection
+                )
+                result = {
+                    'clientes': clientes,
+                    'per_page': per_page,
+                    'has_more': next_cursor is not None,
+                    'next_cursor': next_cursor
+                }
+                await self._add_total(result, self.clientes_collection, query, with_total or 'false')
+                return result
+
+            skip = (page - 1) * per_page
+            cursor = self.clientes_collection.find(query, projection).skip(skip).limit(per_page + 1)
+            clientes = [cliente async for cliente in cursor]
+
+            result = {
+                'clientes': clientes[:per_page],
+                'page': page,
+                'per_page': per_page,
+                'has_more': len(clientes) > per_page
+            }
+            await self._add_total(result, self.clientes_collection, query, with_total or 'exact')
+            return result
+        except Exception as e:
+            logger.error(f"Error retrieving clients: {str(e)}")
+            raise
+
+    async def _find_page_by_cursor(self, collection, query, sort_field, direction, per_page, cursor,
+                                   projection=SEARCH_PROJECTION, allow_disk_use=False):
+        """Fetch one keyset page and the cursor for the page that follows it"""
+        if cursor:
+            query = keyset_query(query, sort_field, direction, decode_cursor(cursor))
+
+        sort_params = [(sort_field, direction)]
+        if sort_field != '_id':
+            sort_params.append(('_id', direction))
+
+        page = collection.find(query, projection).sort(sort_params).limit(per_page + 1)
+        if allow_disk_use:
+            page = page.allow_disk_use(True)
+        documents = await page.to_list(length=per_page + 1)
+        next_cursor = None
+        if len(documents) > per_page:
+            documents = documents[:per_page]
+            next_cursor = encode_cursor(sort_field, direction, documents[-1])
+
+        return documents, next_cursor
+
+    async def _add_total(self, result, collection, query, with_total):
+        """Attach total and total_pages to a list result according to with_total"""
+        if with_total not in TOTAL_MODES:
+            raise ValueError(f"with_total must be one of: {', '.join(TOTAL_MODES)}")
+        if with_total == 'false':
+            return
+
+        total_documents = await self._count_documents(collection, query, with_total == 'estimated')
+        result['total'] = total_documents
+        result['total_pages'] = -(-total_documents // result['per_page'])  # Ceiling division
+
+    async def _count_documents(self, collection, query, estimated=False):
+        """Count matching documents, optionally from metadata or the count cache"""
+        if not estimated:
+            return await collection.count_documents(query)
+        if not query:
+            return await collection.estimated_document_count()
+
+        count_cache = self._count_caches[collection.name]
+        key = json_util.dumps(query, sort_keys=True)
+        total_documents = count_cache.get(key)
+        if total_documents is None:
+            total_documents = await collection.count_documents(query)
+            count_cache.set(key, total_documents)
+        return total_documents
+
+    def _invalidate_counts(self, *collections):
+        """Drop cached counts after documents are inserted or deleted"""
+        for collection in collections:
+            self._count_caches[collection.name].clear()
+
+    async def delete_cliente(self, cliente_id):
+        """Delete a client"""
+        try:
+            result = await self.clientes_collection.delete_one({"_id": ObjectId(cliente_id)})
+            self._forget_cliente(ObjectId(cliente_id))
+            if result.deleted_count > 0:
+                self._invalidate_counts(self.clientes_collection)
+                logger.debug("Successfully deleted client: %s", cliente_id)
+                return True
+            logger.warning(f"No client found with ID: {cliente_id}")
+            return False
+        except Exception as e:
+            logger.error(f"Error deleting client: {str(e)}")
+            raise
+
+    async def search_clientes(self, search_term, limit=SEARCH_DEFAULT_LIMIT, cursor=None, fields=SUMMARY):
+        """Search clients by name, email and city, best matches first"""
+        try:
+            projection = build_projection(fields, CLIENTE_SUMMARY_FIELDS, CLIENTE_DOCUMENT_FIELDS, ('_score',))
+            return await self._search_page(self.clientes_collection, CLIENTE_SEARCH_FIELDS,
+                                           search_term, limit, cursor, projection)
+        except Exception as e:
+            logger.error(f"Error searching clients: {str(e)}")
+            raise
+
+    def iter_search_clientes(self, search_term, limit=None, batch_size=SEARCH_BATCH_SIZE, fields=SUMMARY):
+        """Asynchronously yield matching clients straight from the database cursor"""
+        projection = build_projection(fields, CLIENTE_SUMMARY_FIELDS, CLIENTE_DOCUMENT_FIELDS)
+        return self._iter_search(self.clientes_collection, CLIENTE_SEARCH_FIELDS,
+                                 search_term, limit, batch_size, projection)
+
+    async def _search_page(self, collection, weights, search_term, limit, cursor, projection=None):
+        """Run a ranked search and return one page plus the cursor for the next"""
+        if not 1 <= limit <= SEARCH_MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {SEARCH_MAX_LIMIT}")
+
+        cursor_data = decode_cursor(cursor) if cursor else None
+        pipeline = ranked_pipeline(search_term, weights, limit + 1, cursor_data, projection)
+        documents = await collection.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+
+        next_cursor = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            next_cursor = encode_cursor('_score', -1, documents[-1])
+
+        for document in documents:
+            document.pop('_score', None)
+        return {
+            'results': documents,
+            'next_cursor': next_cursor
+        }
+
+    def _iter_search(self, collection, weights, search_term, limit, batch_size, projection=None):
+        """Validate eagerly, then lazily stream ranked search results"""
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be a positive integer")
+        pipeline = ranked_pipeline(search_term, weights, limit, projection=projection)
+
+        async def generate():
+            cursor = collection.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+            try:
+                async for document in cursor:
+                    document.pop('_score', None)
+                    yield document
+            finally:
+                await cursor.close()
+
+        return generate()
+
+    async def _search_update(self, collection, weights, query, update_data):
+        """Search arrays to $set along with update_data; {} unless it changes a searchable field"""
+        untouched = untouched_search_fields(update_data, weights)
+        if untouched is None:
+            return {}
+        stored = await collection.find_one(query, {field: 1 for field in untouched}) if untouched else None
+        return search_fields(dict(stored or {}, **update_data), weights)
+
+    async def insert_cliente(self, cliente_data):
+        """Insert a new client into the database"""
+        try:
+            cliente_data['created_at'] = datetime.utcnow()
+            cliente_data['updated_at'] = datetime.utcnow()
+            cliente_data.update(search_fields(cliente_data, CLIENTE_SEARCH_FIELDS))
+            cliente_data['email_key'] = normalize_email(cliente_data.get('email'))
+            result = await self.clientes_collection.insert_one(cliente_data)
+            self._invalidate_counts(self.clientes_collection)
+            logger.debug("Successfully inserted client with ID: %s", result.inserted_id)
+            return str(result.inserted_id)
+        except DuplicateKeyError:
+            raise ValueError("A client with that email already exists")
+        except Exception as e:
+            logger.error(f"Error inserting client: {str(e)}")
+            raise
+
+    async def update_cliente(self, cliente_id, update_data):
+        """Update an existing client"""
+        try:
+            if '_id' in update_data:
+                del update_data['_id']
+            update_data['updated_at'] = datetime.utcnow()
+            if 'email' in update_data:
+                update_data['email_key'] = normalize_email(update_data['email'])
+            update_data.update(await self._search_update(self.clientes_collection, CLIENTE_SEARCH_FIELDS,
+                                                         {"_id": ObjectId(cliente_id)}, update_data))
+
+            result = await self.clientes_collection.update_one(
+                {"_id": ObjectId(cliente_id)},
+                {"$set": update_data}
+            )
+
+            if result.matched_count > 0:
+                logger.debug("Successfully updated client: %s", cliente_id)
+                self._forget_cliente(ObjectId(cliente_id))
+                return True
+            logger.warning(f"No client found with ID: {cliente_id}")
+            return False
+        except DuplicateKeyError:
+            raise ValueError("A client with that email already exists")
+        except Exception as e:
+            logger.error(f"Error updating client: {str(e)}")
+            raise
+
+    def apply_change(self, change):
+        """Drop what the caches hold for a document changed by any process, see changes.py"""
+        if change.operation == 'reset':
+            for count_cache in self._count_caches.values():
+                count_cache.clear()
+            self._stats_snapshot.invalidate()
+            self._cliente_resolver.clear()
+            self._response_cache.clear()
+        elif change.collection == self.collection.name:
+            self._response_cache.invalidate(('requirement', str(change.document_id)))
+            if self._own_writes.claim(change):
+                # The write already adjusted the counts and the stats snapshot
+                return
+            if change.operation != 'update':
+                self._invalidate_counts(self.collection)
+            if self._stats_snapshot.outdated_by(change):
+                self._stats_snapshot.invalidate()
+        elif change.collection == self.clientes_collection.name:
+            self._forget_cliente(change.document_id)
+            if change.operation != 'update':
+                self._invalidate_counts(self.clientes_collection)
+        elif change.collection == self.reviews_collection.name:
+            self._response_cache.invalidate(('reviews',))
+
+    def _forget_cliente(self, cliente_id):
+        """Drop a changed client from the caches that hold its data"""
+        self._cliente_resolver.invalidate(cliente_id)
+        self._response_cache.invalidate_tag(cliente_tag(cliente_id))
+
+    async def _resolve_clientes(self, documents):
+        """Fill the requestor fields of requirements from their referenced clients"""
+        found, missing = self._cliente_resolver.plan(documents)
+        if missing:
+            cursor = self.clientes_collection.find({"_id": {"$in": missing}}, CLIENTE_REFERENCE_PROJECTION)
+            found.update(self._cliente_resolver.store([cliente async for cliente in cursor]))
+        return self._cliente_resolver.apply(documents, found)
+
+    async def _iter_resolved(self, documents, batch_size):
+        """_resolve_clientes over a stream, one lookup per batch_size documents"""
+        batch = []
+        async for document in documents:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                for resolved in await self._resolve_clientes(batch):
+                    yield resolved
+                batch = []
+        if batch:
+            for resolved in await self._resolve_clientes(batch):
+                yield resolved
+
+    async def get_cliente(self, cliente_id):
+        """Retrieve a specific client by ID"""
+        try:
+            cliente = await self.clientes_collection.find_one({"_id": ObjectId(cliente_id)}, SEARCH_PROJECTION)
+            return cliente
+        except Exception as e:
+            logger.error(f"Error retrieving client: {str(e)}")
+            raise
+
+    async def insert_project_requirement(self, form_data):
+        """Insert a new project requirement into the database"""
+        try:
+            form_data['created_at'] = datetime.utcnow()
+            form_data['updated_at'] = datetime.utcnow()
+            form_data.update(search_fields(form_data, REQUIREMENT_SEARCH_FIELDS))
+            form_data['cliente_id'] = await self._upsert_cliente(DatabaseManager._cliente_from_requirement(form_data))
+
+            form_data['_id'] = ObjectId()
+            self._own_writes.expect(self.collection.name, form_data['_id'])
+            result = await self.collection.insert_one(form_data)
+            self._stats_snapshot.apply(added=form_data)
+            self._invalidate_counts(self.collection, self.clientes_collection)
+            logger.debug("Successfully inserted requirement with ID: %s", result.inserted_id)
+
+            return str(result.inserted_id)
+        except Exception as e:
+            logger.error(f"Error inserting project requirement: {str(e)}")
+            raise
+
+    async def _upsert_cliente(self, client_data):
+        """_id of the client with client_data's email key, inserting client_data if there is none"""
+        key = client_data['email_key']
+        if key is None:
+            await self.clientes_collection.insert_one(client_data)
+            return client_data['_id']
+        cliente = await self.clientes_collection.find_one_and_update(
+            {"email_key": key},
+            {"$setOnInsert": {field: value for field, value in client_data.items() if field != 'email_key'}},
+            projection={'_id': 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return cliente['_id']
+
+    async def _upsert_clientes(self, clientes):
+        """_upsert_cliente for a batch in one bulk write; returns the client _ids in order"""
+        keyed = {}
+        for cliente in clientes:
+            if cliente['email_key'] is not None:
+                keyed.setdefault(cliente['email_key'], cliente)
+        unkeyed = [cliente for cliente in clientes if cliente['email_key'] is None]
+
+        if keyed:
+            operations = [
+                UpdateOne({"email_key": key},
+                          {"$setOnInsert": {field: value for field, value in cliente.items() if field != 'email_key'}},
+                          upsert=True)
+                for key, cliente in keyed.items()
+            ]
+            try:
+                await self.clientes_collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                logger.warning("Client upsert errors: %d", len(e.details.get('writeErrors', [])))
+        await self._insert_many(self.clientes_collection, unkeyed)
+
+        ids = {cliente['email_key']: cliente['_id'] async for cliente in
+               self.clientes_collection.find({"email_key": {"$in": list(keyed)}}, {'email_key': 1})}
+        return [ids.get(cliente['email_key']) if cliente['email_key'] is not None else cliente['_id']
+                for cliente in clientes]
+
+    async def bulk_import(self, kind, rows, batch_size):
+        """Validate and insert (row_number, row, error) tuples from bulk.read_rows"""
+        try:
+            if kind == 'requirements':
+                report = await aimport_rows(rows, self.validate_requirement_data,
+                                            self.insert_project_requirements_batch, batch_size)
+            elif kind == 'clientes':
+                report = await aimport_rows(rows, self.validate_cliente_data,
+                                            self.insert_clientes_batch, batch_size)
+            else:
+                raise ValueError(f"Unknown import kind: {kind}")
+            logger.info("Bulk import of %s: %d inserted, %d failed", kind, report['inserted'], report['failed'],
+                        extra={'kind': kind, 'inserted': report['inserted'], 'failed': report['failed']})
+            return report
+        except Exception as e:
+            logger.error(f"Error importing {kind}: {str(e)}")
+            raise
+
+    async def insert_clientes_batch(self, clientes):
+        """Insert clients with one unordered insert_many; returns (inserted, [(index, error)])"""
+        for cliente in clientes:
+            cliente['created_at'] = datetime.utcnow()
+            cliente['updated_at'] = datetime.utcnow()
+            cliente.update(search_fields(cliente, CLIENTE_SEARCH_FIELDS))
+            cliente['email_key'] = normalize_email(cliente.get('email'))
+        inserted, errors = await self._insert_many(self.clientes_collection, clientes)
+        self._invalidate_counts(self.clientes_collection)
+        return inserted, errors
+
+    async def insert_project_requirements_batch(self, requirements):
+        """Upsert the batch's clients, then insert the requirements unordered; returns (inserted, [(index, error)])"""
+        for requirement in requirements:
+            requirement['created_at'] = datetime.utcnow()
+            requirement['updated_at'] = datetime.utcnow()
+            requirement.update(search_fields(requirement, REQUIREMENT_SEARCH_FIELDS))
+        cliente_ids = await self._upsert_clientes([DatabaseManager._cliente_from_requirement(requirement)
+                                                   for requirement in requirements])
+        for requirement, cliente_id in zip(requirements, cliente_ids):
+            requirement['cliente_id'] = cliente_id
+        inserted, errors = await self._insert_many(self.collection, requirements)
+
+        self._invalidate_counts(self.collection, self.clientes_collection)
+        self._stats_snapshot.invalidate()
+        return inserted, errors
+
+    @staticmethod
+    async def _insert_many(collection, documents):
+        """Unordered insert_many that reports per-document failures instead of raising"""
+        if not documents:
+            return 0, []
+        try:
+            result = await collection.insert_many(documents, ordered=False)
+            return len(result.inserted_ids), []
+        except BulkWriteError as e:
+            errors = [(error['index'], error['errmsg']) for error in e.details.get('writeErrors', [])]
+            return e.details.get('nInserted', 0), errors
+
+    def iter_export(self, kind, batch_size=1000):
+        """Yield every client or requirement straight from a batched cursor"""
+        if kind == 'requirements':
+            collection = self.collection
+        elif kind == 'clientes':
+            collection = self.clientes_collection
+        else:
+            raise ValueError(f"Unknown export kind: {kind}")
+
+        async def generate():
+            cursor = collection.find({}, SEARCH_PROJECTION).sort('_id', 1).batch_size(batch_size)
+            try:
+                async for document in cursor:
+                    yield document
+            finally:
+                await cursor.close()
+
+        return generate()
+
+    async def get_project_requirement(self, requirement_id, fields=ALL):
+        """Retrieve a specific project requirement by ID"""
+        try:
+            projection = build_projection(fields, REQUIREMENT_SUMMARY_FIELDS, REQUIREMENT_DOCUMENT_FIELDS,
+                                          ('cliente_id',))
+            requirement = await self.collection.find_one({"_id": ObjectId(requirement_id)}, projection)
+            if requirement is not None:
+                await self._resolve_clientes([requirement])
+            return requirement
+        except Exception as e:
+            logger.error(f"Error retrieving project requirement: {str(e)}")
+            raise
+
+    async def get_cached_project_requirement(self, requirement_id):
+        """The full requirement as a CachedResponse, or None if it doesn't exist"""
+        key = ('requirement', str(ObjectId(requirement_id)))
+        return await self._response_cache.aget(key, lambda: self.get_project_requirement(requirement_id),
+                                               tags=requirement_tags)
+
+    async def get_all_project_requirements(self, filters=None, sort_by=None, page=1, per_page=10,
+                                           cursor=None, with_total=None, fields=SUMMARY, with_plan=False):
+        """Retrieve all project requirements with optional filtering and pagination"""
+        try:
+            query = filters if filters else {}
+            plan = plan_sort(self.collection.name, query, sort_by, Config.SORT_UNINDEXED)
+            logger.debug("Sort plan: %s", plan.index or 'in memory', extra={'sort_plan': plan_to_dict(plan)})
+
+            if cursor is not None:
+                sort_field, direction = plan.sort[0]
+                projection = build_projection(fields, REQUIREMENT_SUMMARY_FIELDS,
+                                              REQUIREMENT_DOCUMENT_FIELDS, (sort_field, 'cliente_id'))
+                requirements, next_cursor = await self._find_page_by_cursor(
+                    self.collection, query, sort_field, direction, per_page, cursor, projection,
+                    allow_disk_use=plan.allow_disk_use
+                )
+                await self._resolve_clientes(requirements)
+                result = {
+                    'requirements': requirements,
+                    'per_page': per_page,
+                    'has_more': next_cursor is not None,
+                    'next_cursor': next_cursor
+                }
+                await self._add_total(result, self.collection, query, with_total or 'false')
+                if with_plan:
+                    result['sort_plan'] = plan_to_dict(plan)
+                return result
+
+            skip = (page - 1) * per_page
+            projection = build_projection(fields, REQUIREMENT_SUMMARY_FIELDS, REQUIREMENT_DOCUMENT_FIELDS,
+                                          ('cliente_id',))
+            cursor = self.collection.find(query, projection).sort(plan.sort).skip(skip).limit(per_page + 1)
+            if plan.allow_disk_use:
+                cursor = cursor.allow_disk_use(True)
+            requirements = [req async for req in cursor]
+
+            result = {
+                'requirements': await self._resolve_clientes(requirements[:per_page]),
+                'page': page,
+                'per_page': per_page,
+                'has_more': len(requirements) > per_page
+            }
+            await self._add_total(result, self.collection, query, with_total or 'exact')
+            if with_plan:
+                result['sort_plan'] = plan_to_dict(plan)
+            return result
+        except Exception as e:
+            logger.error(f"Error retrieving project requirements: {str(e)}")
+            raise
+
+    async def update_project_requirement(self, requirement_id, update_data):
+        """Update an existing project requirement"""
+        try:
+            if '_id' in update_data:
+                del update_data['_id']
+            update_data['updated_at'] = datetime.utcnow()
+            update_data.update(await self._search_update(self.collection, REQUIREMENT_SEARCH_FIELDS,
+                                                         {"_id": ObjectId(requirement_id)}, update_data))
+
+            self._own_writes.expect(self.collection.name, ObjectId(requirement_id))
+            previous = await self.collection.find_one_and_update(
+                {"_id": ObjectId(requirement_id)},
+                {"$set": update_data},
+                projection=dict({field: 1 for field in STATS_FIELDS}, cliente_id=1, created_at=1),
+                return_document=ReturnDocument.BEFORE
+            )
+
+            if previous is not None:
+                logger.debug("Successfully updated requirement: %s", requirement_id)
+                self._response_cache.invalidate(('requirement', str(previous['_id'])))
+                current = dict(previous, **{field: update_data[field] for field in STATS_FIELDS if field in update_data})
+                self._stats_snapshot.apply(removed=previous, added=current)
+                if 'created_at' in update_data:
+                    # Moved out of its analytics buckets, which updated_at alone doesn't reveal
+                    await self._mark_analytics_dirty(previous.get('created_at'))
+
+                client_data = requestor_changes(update_data)
+                if client_data and previous.get('cliente_id') is not None:
+                    client_data['updated_at'] = datetime.utcnow()
+                    if 'email' in client_data:
+                        client_data['email_key'] = normalize_email(client_data['email'])
+                    client_data.update(await self._search_update(self.clientes_collection, CLIENTE_SEARCH_FIELDS,
+                                                                 {"_id": previous['cliente_id']}, client_data))
+                    try:
+                        await self.clientes_collection.update_one({"_id": previous['cliente_id']}, {"$set": client_data})
+                    except DuplicateKeyError:
+                        logger.warning(f"Requirement {requirement_id} requestor email is taken by another client")
+                    self._forget_cliente(previous['cliente_id'])
+
+                return True
+            logger.warning(f"No requirement found with ID: {requirement_id}")
+            return False
+        except Exception as e:
+            logger.error(f"Error updating project requirement: {str(e)}")
+            raise
+
+    async def delete_project_requirement(self, requirement_id):
+        """Delete a project requirement"""
+        try:
+            self._own_writes.expect(self.collection.name, ObjectId(requirement_id))
+            deleted = await self.collection.find_one_and_delete(
+                {"_id": ObjectId(requirement_id)},
+                projection=dict({field: 1 for field in STATS_FIELDS}, created_at=1)
+            )
+            if deleted is not None:
+                self._invalidate_counts(self.collection)
+                self._response_cache.invalidate(('requirement', str(deleted['_id'])))
+                self._stats_snapshot.apply(removed=deleted)
+                await self._mark_analytics_dirty(deleted.get('created_at'))
+                logger.debug("Successfully deleted requirement: %s", requirement_id)
+                return True
+            logger.warning(f"No requirement found with ID: {requirement_id}")
+            return False
+        except Exception as e:
+            logger.error(f"Error deleting project requirement: {str(e)}")
+            raise
+
+    async def search_requirements(self, search_term, limit=SEARCH_DEFAULT_LIMIT, cursor=None, fields=SUMMARY):
+        """Search project requirements by title, requestor, department and description, best matches first"""
+        try:
+            projection = build_projection(fields, REQUIREMENT_SUMMARY_FIELDS, REQUIREMENT_DOCUMENT_FIELDS,
+                                          ('_score', 'cliente_id'))
+            page = await self._search_page(self.collection, REQUIREMENT_SEARCH_FIELDS,
+                                           search_term, limit, cursor, projection)
+            await self._resolve_clientes(page['results'])
+            return page
+        except Exception as e:
+            logger.error(f"Error searching requirements: {str(e)}")
+            raise
+
+    def iter_search_requirements(self, search_term, limit=None, batch_size=SEARCH_BATCH_SIZE, fields=SUMMARY):
+        """Asynchronously yield matching project requirements straight from the database cursor"""
+        projection = build_projection(fields, REQUIREMENT_SUMMARY_FIELDS, REQUIREMENT_DOCUMENT_FIELDS,
+                                      ('cliente_id',))
+        documents = self._iter_search(self.collection, REQUIREMENT_SEARCH_FIELDS,
+                                      search_term, limit, batch_size, projection)
+        return self._iter_resolved(documents, batch_size)
+
+    async def get_requirements_stats(self):
+        """Get statistics about project requirements from the cached snapshot"""
+        try:
+            return await self._stats_snapshot.aget(self._load_requirements_stats)
+        except Exception as e:
+            logger.error(f"Error getting requirements statistics: {str(e)}")
+            raise
+
+    async def _load_requirements_stats(self):
+        """Compute the total and every breakdown in a single $facet aggregation"""
+        facet = await self.collection.aggregate(STATS_PIPELINE).next()
+        return stats_from_facet(facet)
+
+    async def get_requirements_analytics(self, granularity, dimension, start, end, max_age=None):
+        """Bucketed series from the analytics rollup, refreshing it first when older than max_age seconds"""
+        try:
+            state = await self.analytics_collection.find_one({'_id': REFRESH_STATE_ID}, {'refreshed_at': 1}) or {}
+            refreshed_at = state.get('refreshed_at')
+            if max_age is not None and (refreshed_at is None
+                                        or refreshed_at < datetime.utcnow() - timedelta(seconds=max_age)):
+                # Busy or failing, the refresh leaves readers the current rollup
+                try:
+                    refreshed_at = (await self.refresh_requirements_analytics()).get('refreshed_at', refreshed_at)
+                except Exception as e:
+                    logger.warning(f"Serving stale analytics: {str(e)}")
+            buckets = self.analytics_collection.find(series_query(granularity, dimension, start, end))
+            return {
+                'granularity': granularity,
+                'dimension': dimension,
+                'from': start,
+                'to': end,
+                'refreshed_at': refreshed_at,
+                'series': series_from_buckets(await buckets.sort('_id.bucket', 1).to_list(None))
+            }
+        except Exception as e:
+            logger.error(f"Error getting requirements analytics: {str(e)}")
+            raise
+
+    async def refresh_requirements_analytics(self, full=False):
+        """Recompute the analytics buckets changed since the last refresh, see analytics.py"""
+        try:
+            now = datetime.utcnow()
+            try:
+                state = await self.analytics_collection.find_one_and_update(
+                    lease_query(now), {'$set': {'lease_until': now + REFRESH_LEASE}},
+                    upsert=True, return_document=ReturnDocument.BEFORE
+                ) or {}
+            except DuplicateKeyError:
+                return {'status': 'busy'}
+
+            try:
+                oldest_changed = None
+                if state.get('refreshed_at') and not full:
+                    changed = await self.collection.aggregate(
+                        oldest_change_pipeline(state['refreshed_at'])).to_list(None)
+                    oldest_changed = changed[0]['oldest'] if changed else None
+                start, work = refresh_start(state, oldest_changed, full)
+                report = {'status': 'refreshed' if work else 'unchanged', 'since': start, 'removed': 0}
+                if work:
+                    refresh_id = new_refresh_id()
+                    for granularity in GRANULARITIES:
+                        first_bucket = bucket_start(start, granularity) if start else None
+                        for dimension in DIMENSIONS:
+                            await self.collection.aggregate(
+                                rollup_pipeline(granularity, dimension, first_bucket, refresh_id)).to_list(None)
+                        report['removed'] += (await self.analytics_collection.delete_many(
+                            stale_buckets_filter(granularity, first_bucket, refresh_id)
+                        )).deleted_count
+            except Exception:
+                await self.analytics_collection.update_one({'_id': REFRESH_STATE_ID}, {'$unset': {'lease_until': ''}})
+                raise
+
+            await self.analytics_collection.update_one(
+                {'_id': REFRESH_STATE_ID, 'dirty_since': state.get('dirty_since')},
+                {'$unset': {'dirty_since': ''}}
+            )
+            await self.analytics_collection.update_one(
+                {'_id': REFRESH_STATE_ID},
+                {'$set': {'refreshed_at': now}, '$unset': {'lease_until': ''}}
+            )
+            report['refreshed_at'] = now
+            logger.info("Requirements analytics %s", report['status'], extra={'removed': report['removed']})
+            return report
+        except Exception as e:
+            logger.error(f"Error refreshing requirements analytics: {str(e)}")
+            raise
+
+    async def _mark_analytics_dirty(self, created_at):
+        """Have the next analytics refresh recompute from created_at's buckets"""
+        if not isinstance(created_at, datetime):
+            return
+        try:
+            await self.analytics_collection.update_one({'_id': REFRESH_STATE_ID},
+                                                       {'$min': {'dirty_since': created_at}}, upsert=True)
+        except Exception as e:
+            logger.warning(f"Error marking analytics for refresh: {str(e)}")
+
+    async def get_user_by_username(self, username):
+        """Retrieve a user by username"""
+        try:
+            user = await self.users_collection.find_one({"username": username})
+            if user:
+                return self.serialize_object_id(user)
+            return None
+        except Exception as e:
+            logger.error(f"Error retrieving user: {str(e)}")
+            raise
+
+    async def get_user_by_id(self, user_id):
+        """Retrieve a user by ID, served from the user cache when possible"""
+        try:
+            user = self._user_cache.get(str(user_id))
+            if user is None:
+                user = await self.users_collection.find_one({"_id": ObjectId(user_id)}, {"password": 0})
+                if not user:
+                    return None
+                user = self.serialize_object_id(user)
+                self._user_cache.set(str(user_id), user)
+            return dict(user)
+        except Exception as e:
+            logger.error(f"Error retrieving user: {str(e)}")
+            raise
+
+    async def hash_password(self, password):
+        """Salted hash of password for storing; raises HashingBusy when saturated"""
+        return await password_hasher.ahash(password)
+
+    async def verify_password(self, stored_password, provided_password):
+        """Verify a stored password against one provided by the user"""
+        matches, _ = await password_hasher.averify(stored_password, provided_password)
+        return matches
+
+    async def check_user_password(self, user, provided_password):
+        """verify_password for a stored user, upgrading a plaintext or outdated hash on success"""
+        matches, new_hash = await password_hasher.averify(user['password'], provided_password)
+        if matches and new_hash:
+            try:
+                await self.users_collection.update_one(
+                    {"_id": ObjectId(user['_id']), "password": user['password']},
+                    {"$set": {"password": new_hash}}
+                )
+            except Exception as e:
+                logger.warning(f"Error upgrading password hash: {str(e)}")
+        return matches
+
+
+if Config.METRICS_ENABLED:
+    instrument(AsyncDatabaseManager)
+
@@ -0,0 +1,87 @@
+"""Time JSON encoding of requirement pages: the old response path against FastJSONProvider.
+
+Usage (from backend/): python -m benchmarks.json_benchmark --docs 1000 --repeat 50
+
+No database is needed. Prints one JSON object per path with the encode time
+for ``--docs`` full requirement documents in milliseconds and the body size.
+"""
+import argparse
+import json
+import statistics
+import time
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import json_provider
+from benchmarks.synthetic import make_requirement
+from database import DatabaseManager
+
+
+def make_documents(count):
+    """Requirements as the driver returns them: ObjectId _id and datetime timestamps"""
+    documents = []
+    for i in range(count):
+        document = make_requirement(i)
+        document['_id'] = ObjectId()
+        document['updated_at'] = document['created_at']
+        documents.append(document)
+    return documents
+
+
+def old_path(provider):
+    """serialize_object_id on every document, then Flask's default jsonify encoder"""
+    def run(documents):
+        page = [DatabaseManager.serialize_object_id(dict(document)) for document in documents]
+        return provider.dumps({'requirements': page}, separators=(',', ':')).encode('utf-8')
+    return run
+
+
+def fast_path(documents):
+    return json_provider.dumps_bytes({'requirements': documents})
+
+
+def stdlib_fast_path(documents):
+    """FastJSONProvider's fallback when orjson is not installed"""
+    orjson, json_provider.orjson = json_provider.orjson, None
+    try:
+        return json_provider.dumps_bytes({'requirements': documents})
+    finally:
+        json_provider.orjson = orjson
+
+
+def measure(run, documents, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = run(documents)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[int(0.95 * (len(timings) - 1))], 3),
+        'bytes': len(body)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--docs', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    documents = make_documents(args.docs)
+    paths = {'old': old_path(DefaultJSONProvider(app)), 'fast-stdlib': stdlib_fast_path}
+    if json_provider.orjson is not None:
+        paths['fast-orjson'] = fast_path
+
+    with app.app_context():
+        for path, run in paths.items():
+            result = {'path': path, 'docs': args.docs}
+            result.update(measure(run, documents, args.repeat))
+            print(json.dumps(result), flush=True)
+
+
+if __name__ == '__main__':
+    main()
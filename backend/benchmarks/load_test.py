@@ -0,0 +1,96 @@
+"""Closed-loop HTTP load test for comparing the sync (app.py) and async (asgi.py) servers.
+
+Start each server against the same database, then run for example:
+
+    python -m benchmarks.load_test --url http://localhost:5000 --label sync
+    python -m benchmarks.load_test --url http://localhost:5001 --label async
+
+Run both servers with ``RATE_LIMITS=''`` and the ``MAX_CONCURRENT_*`` caps
+raised above the highest concurrency (e.g. ``MAX_CONCURRENT_REQUESTS=2000
+MAX_CONCURRENT_PUBLIC_REQUESTS=2000 ASYNC_MAX_CONCURRENT_PUBLIC_REQUESTS=2000``);
+with the defaults most requests are answered 429 or 503 and the comparison
+measures admission control instead of the servers.
+
+Each concurrency level keeps that many clients issuing back-to-back requests
+for ``--duration`` seconds. One JSON object per (label, path, concurrency)
+is printed with requests/sec and latency percentiles in milliseconds, both
+over successful (2xx) responses only; ``shed`` counts 429 and 503 answers
+and ``errors`` every other failure.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import aiohttp
+
+DEFAULT_PATHS = ['/api/requirements/stats', '/api/reviews']
+
+
+SHED_STATUSES = (429, 503)
+
+
+async def client_loop(session, url, headers, deadline, latencies, failures):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            async with session.get(url, headers=headers) as response:
+                await response.read()
+                status = response.status
+        except aiohttp.ClientError:
+            failures['errors'] += 1
+            continue
+        if 200 <= status < 300:
+            latencies.append((time.perf_counter() - started) * 1000)
+        else:
+            # Rejections return early; timing them would flatter the server
+            failures['shed' if status in SHED_STATUSES else 'errors'] += 1
+
+
+async def run_level(base_url, path, concurrency, duration, headers):
+    latencies, failures = [], {'shed': 0, 'errors': 0}
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=60)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(
+            client_loop(session, base_url + path, headers, deadline, latencies, failures)
+            for _ in range(concurrency)
+        ))
+
+    latencies.sort()
+
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3) if latencies else None
+
+    return {
+        'path': path,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'shed': failures['shed'],
+        'errors': failures['errors'],
+        'rps': round(len(latencies) / duration, 1),
+        'p50_ms': percentile(0.50),
+        'p99_ms': percentile(0.99)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--label', default='server')
+    parser.add_argument('--path', action='append', dest='paths')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 200, 1000])
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--token', help="JWT for authenticated routes")
+    args = parser.parse_args()
+
+    headers = {'Authorization': f"Bearer {args.token}"} if args.token else {}
+    for path in args.paths or DEFAULT_PATHS:
+        for concurrency in args.concurrency:
+            result = asyncio.run(run_level(args.url, path, concurrency, args.duration, headers))
+            print(json.dumps(dict(result, label=args.label)), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Logins per second at each password hashing cost.
+
+Usage (from backend/):
+
+    python -m benchmarks.password_benchmark --logins 200 --clients 16 --workers 2
+
+No database is needed: login throughput is bound by the hash, so each login
+here is one PasswordHasher.verify() against a stored hash of that method.
+``--clients`` threads log in concurrently through a hasher with ``--workers``
+pool threads, as request threads do in one API process. Prints one JSON
+object per method with logins/sec, the single-hash time and the login
+latency seen by the clients; pick the highest cost whose throughput still
+covers the expected login peak per process.
+"""
+import argparse
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash
+
+from passwords import PasswordHasher
+
+DEFAULT_METHODS = (
+    'pbkdf2:sha256:260000',
+    'pbkdf2:sha256:600000',
+    'pbkdf2:sha256:1000000',
+    'scrypt:16384:8:1',
+    'scrypt:32768:8:1',
+    'scrypt:65536:8:1'
+)
+
+
+def run_method(method, args):
+    password = 'correct horse battery staple'
+    stored = generate_password_hash(password, method)
+    hasher = PasswordHasher(method, args.workers, max_pending=args.logins, wait_timeout=None)
+
+    started = time.perf_counter()
+    generate_password_hash(password, method)
+    single_ms = (time.perf_counter() - started) * 1000
+
+    def login(_):
+        started = time.perf_counter()
+        matches, _ = hasher.verify(stored, password)
+        assert matches
+        return (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(max_workers=args.clients) as clients:
+        started = time.perf_counter()
+        latencies = sorted(clients.map(login, range(args.logins)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'method': method,
+        'workers': args.workers,
+        'clients': args.clients,
+        'logins_per_sec': round(args.logins / elapsed, 1),
+        'hash_ms': round(single_ms, 2),
+        'login_median_ms': round(statistics.median(latencies), 2),
+        'login_p95_ms': round(latencies[int(0.95 * (len(latencies) - 1))], 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--methods', default=','.join(DEFAULT_METHODS),
+                        help="Comma-separated werkzeug hash methods")
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=16, help="Concurrent login threads")
+    parser.add_argument('--workers', type=int, default=2, help="PASSWORD_HASH_WORKERS")
+    args = parser.parse_args()
+
+    for method in args.methods.split(','):
+        print(json.dumps(run_method(method.strip(), args)), flush=True)
+
+
+if __name__ == '__main__':
+    main()
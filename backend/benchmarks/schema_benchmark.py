@@ -0,0 +1,90 @@
+"""Request bodies decoded and validated per second by schema.py.
+
+Usage (from backend/):
+
+    python -m benchmarks.schema_benchmark --bodies 20000 --text-size 2000
+
+No database or server is needed: each body is a requirement submission
+encoded as the frontend sends it, with ``--text-size`` characters in each
+long text field. Prints one JSON object per decoder: the schema's decode()
+with orjson and with the standard library, and, for comparison, a plain
+json.loads followed by the key-presence check validation used to be. The
+last line times how long an oversized body takes to be refused.
+"""
+import argparse
+import json
+import time
+
+import schema
+from database import REQUIREMENT_FIELDS
+from schema import REQUIREMENT_SCHEMA, PayloadTooLarge
+
+LONG_FIELDS = ('description', 'dependencies', 'technicalRequirements', 'businessJustification', 'riskAssessment')
+
+
+def requirement_body(text_size):
+    body = {field: f'{field} value' for field in REQUIREMENT_FIELDS}
+    body.update({field: 'x' * text_size for field in LONG_FIELDS})
+    body.update({'requestorEmail': 'ana@example.com', 'estimatedBudget': '15000'})
+    return json.dumps(body).encode('utf-8')
+
+
+def presence_check(body):
+    data = json.loads(body)
+    missing = [field for field in REQUIREMENT_FIELDS if field not in data]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    return data
+
+
+def run(name, decode, body, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        decode(body)
+    elapsed = time.perf_counter() - started
+    return {
+        'decoder': name,
+        'body_bytes': len(body),
+        'bodies_per_sec': round(count / elapsed),
+        'mb_per_sec': round(len(body) * count / elapsed / 1e6, 1),
+        'us_per_body': round(elapsed / count * 1e6, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bodies', type=int, default=20000)
+    parser.add_argument('--text-size', type=int, default=2000, help="Characters per long text field")
+    args = parser.parse_args()
+
+    body = requirement_body(args.text_size)
+    REQUIREMENT_SCHEMA.decode(body)
+    orjson = schema.orjson
+
+    decoders = [('presence_check', presence_check), ('schema_stdlib', None)]
+    if orjson is not None:
+        decoders.append(('schema_orjson', REQUIREMENT_SCHEMA.decode))
+    for name, decode in decoders:
+        if decode is None:
+            # The stdlib fallback, as it runs when orjson is not installed
+            schema.orjson = None
+            decode = REQUIREMENT_SCHEMA.decode
+        try:
+            print(json.dumps(run(name, decode, body, args.bodies)), flush=True)
+        finally:
+            schema.orjson = orjson
+
+    oversized = b' ' * (schema.Config.MAX_JSON_BODY_BYTES + 1)
+    started = time.perf_counter()
+    for _ in range(args.bodies):
+        try:
+            REQUIREMENT_SCHEMA.decode(oversized)
+        except PayloadTooLarge:
+            pass
+    elapsed = time.perf_counter() - started
+    print(json.dumps({'decoder': 'oversized_rejected', 'body_bytes': len(oversized),
+                      'us_per_body': round(elapsed / args.bodies * 1e6, 2)}), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Compare the legacy unanchored $regex search with the keyword index search.
+
+Usage (from backend/): python -m benchmarks.search_benchmark --sizes 100000 1000000
+
+Seeds a scratch database (KodEstudioBench by default) and prints one JSON
+object per (collection, size, path) with latency percentiles in milliseconds.
+"""
+import argparse
+import json
+import statistics
+import time
+from pymongo import MongoClient
+
+from benchmarks.synthetic import make_cliente, make_requirement
+from indexes import INDEXES, ensure_indexes
+from search import CLIENTE_SEARCH_FIELDS, REQUIREMENT_SEARCH_FIELDS, ranked_pipeline, search_fields
+
+TERMS = ['ana', 'peña', 'cusco', 'sistema gestión', 'quispe mamani', 'xyz']
+
+TARGETS = [
+    ('Clientes', make_cliente, CLIENTE_SEARCH_FIELDS),
+    ('Solicitudes', make_requirement, REQUIREMENT_SEARCH_FIELDS),
+]
+
+
+def regex_query(term, fields):
+    """The query the search endpoints used before the keyword index"""
+    return {"$or": [{field: {"$regex": term, "$options": "i"}} for field in fields]}
+
+
+def seed(collection, factory, weights, size, batch_size=10000):
+    """Grow the collection to size documents, reusing whatever is already there"""
+    start = collection.estimated_document_count()
+    for offset in range(start, size, batch_size):
+        batch = []
+        for i in range(offset, min(offset + batch_size, size)):
+            document = factory(i)
+            document.update(search_fields(document, weights))
+            batch.append(document)
+        collection.insert_many(batch, ordered=False)
+
+
+def measure(run, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[int(0.95 * (len(timings) - 1))], 3),
+        'max_ms': round(timings[-1], 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--uri', default='mongodb://localhost:27017')
+    parser.add_argument('--db', default='KodEstudioBench')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    db = MongoClient(args.uri)[args.db]
+    ensure_indexes(db, [spec for spec in INDEXES if spec.collection in ('Clientes', 'Solicitudes')])
+
+    for size in sorted(args.sizes):
+        for name, factory, weights in TARGETS:
+            collection = db[name]
+            seed(collection, factory, weights, size)
+            for term in TERMS:
+                paths = {
+                    'regex': lambda: list(collection.find(regex_query(term, weights))),
+                    'keyword': lambda: list(collection.aggregate(ranked_pipeline(term, weights), allowDiskUse=True))
+                }
+                for path, run in paths.items():
+                    result = {'collection': name, 'size': size, 'term': term, 'path': path}
+                    result.update(measure(run, args.repeat))
+                    print(json.dumps(result), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+"""Time every DatabaseManager method and /api/* route against seeded synthetic data.
+
+Usage (from backend/):
+
+    python -m benchmarks.suite --db KodEstudioBench --output before.json
+    python -m benchmarks.suite --db KodEstudioBench --output after.json --compare before.json
+
+``--backend mongomock`` runs against an in-process stand-in instead of a
+mongod (``pip install mongomock``); it is handy for smoke runs, but its
+timings say nothing about the real server and a few aggregation operators
+are missing, so those cases report an error instead of a timing.
+
+Each case prints one JSON line; ``--output`` also writes the whole run (git
+commit, volumes, results) as one JSON document. ``--compare`` prints the
+ratio against an earlier run and exits with status 1 when any case is more
+than ``--threshold`` slower.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.synthetic import make_calificacion, make_cliente, make_requirement, make_usuario
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def seed(db_manager, volumes, batch_size=5000):
+    """Replace the benchmark collections with freshly generated documents"""
+    from search import CLIENTE_SEARCH_FIELDS, REQUIREMENT_SEARCH_FIELDS, search_fields
+    from migrate_clientes import backfill
+
+    targets = [
+        (db_manager.clientes_collection, make_cliente, CLIENTE_SEARCH_FIELDS, volumes['clientes']),
+        (db_manager.collection, make_requirement, REQUIREMENT_SEARCH_FIELDS, volumes['requirements']),
+        (db_manager.users_collection, make_usuario, None, volumes['usuarios']),
+        (db_manager.reviews_collection, make_calificacion, None, volumes['calificaciones']),
+    ]
+    for collection, factory, weights, size in targets:
+        collection.drop()
+        for offset in range(0, size, batch_size):
+            batch = []
+            for i in range(offset, min(offset + batch_size, size)):
+                document = factory(i)
+                if weights:
+                    document.update(search_fields(document, weights))
+                batch.append(document)
+            collection.insert_many(batch, ordered=False)
+    db_manager.ensure_indexes()
+    # Link requirements to clients the way a migrated database is
+    backfill(db_manager, batch_size)
+
+
+def measure(run, repeat, warmup, setup=None):
+    """Median/p95/min/mean in milliseconds; setup() runs untimed before each call"""
+    timings = []
+    for iteration in range(warmup + repeat):
+        args = setup() if setup else ()
+        started = time.perf_counter()
+        run(*args)
+        elapsed = (time.perf_counter() - started) * 1000
+        if iteration >= warmup:
+            timings.append(elapsed)
+    timings.sort()
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[int(0.95 * (len(timings) - 1))], 3),
+        'min_ms': round(timings[0], 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'repeat': repeat
+    }
+
+
+def form_payload(document):
+    """What the forms send: the document without server-managed timestamps"""
+    document.pop('created_at', None)
+    document.pop('updated_at', None)
+    return document
+
+
+def requirement_update(i):
+    """A full edit-form payload, so the clientes sync runs too"""
+    return form_payload(make_requirement(i, seed=1))
+
+
+def db_cases(db_manager, volumes, per_page=10):
+    """(name, run, setup) for every public DatabaseManager method"""
+    new_users = itertools.count(volumes['usuarios'])
+
+    def new_user():
+        i = next(new_users)
+        return form_payload(make_usuario(i, seed=3))
+
+    requirement_id = str(db_manager.collection.find_one({}, {'_id': 1})['_id'])
+    cliente = db_manager.clientes_collection.find_one({}, {'_id': 1, 'email': 1})
+    user = db_manager.users_collection.find_one({}, {'_id': 1, 'username': 1, 'email': 1})
+    deep_clientes = max(1, volumes['clientes'] // per_page - 1)
+    deep_requirements = max(1, volumes['requirements'] // per_page - 1)
+
+    def scratch_cliente():
+        return (db_manager.insert_cliente(make_cliente(0, seed=2)),)
+
+    def scratch_requirement():
+        return (db_manager.insert_project_requirement(make_requirement(0, seed=2)),)
+
+    def drop_stats():
+        db_manager._stats_snapshot.invalidate()
+        return ()
+
+    def evict_responses():
+        db_manager._response_cache.clear()
+        return ()
+
+    return [
+        ('db.get_all_clientes.page_1', lambda: db_manager.get_all_clientes(page=1, per_page=per_page), None),
+        ('db.get_all_clientes.page_deep',
+         lambda: db_manager.get_all_clientes(page=deep_clientes, per_page=per_page), None),
+        ('db.get_all_clientes.cursor_first',
+         lambda: db_manager.get_all_clientes(per_page=per_page, cursor=''), None),
+        ('db.get_all_project_requirements.page_1',
+         lambda: db_manager.get_all_project_requirements(page=1, per_page=per_page), None),
+        ('db.get_all_project_requirements.page_deep',
+         lambda: db_manager.get_all_project_requirements(page=deep_requirements, per_page=per_page), None),
+        ('db.get_all_project_requirements.filtered',
+         lambda: db_manager.get_all_project_requirements({'status': 'Aprobado'}, per_page=per_page), None),
+        ('db.get_all_project_requirements.fields_all',
+         lambda: db_manager.get_all_project_requirements(per_page=per_page, fields='all'), None),
+        ('db.search_clientes', lambda: db_manager.search_clientes('ana'), None),
+        ('db.search_requirements', lambda: db_manager.search_requirements('sistema gestión'), None),
+        ('db.iter_search_requirements', lambda: list(db_manager.iter_search_requirements('portal', 500)), None),
+        ('db.get_requirements_stats.cached', db_manager.get_requirements_stats, None),
+        ('db.get_requirements_stats.cold', db_manager.get_requirements_stats, drop_stats),
+        ('db.get_project_requirement', lambda: db_manager.get_project_requirement(requirement_id), None),
+        ('db.get_cached_project_requirement',
+         lambda: db_manager.get_cached_project_requirement(requirement_id), None),
+        ('db.get_cliente', lambda: db_manager.get_cliente(str(cliente['_id'])), None),
+        ('db.get_all_reviews', db_manager.get_all_reviews, None),
+        ('db.get_cached_reviews.cold', db_manager.get_cached_reviews, evict_responses),
+        ('db.get_cached_reviews.warm', db_manager.get_cached_reviews, None),
+        ('db.get_user_by_username', lambda: db_manager.get_user_by_username(user['username']), None),
+        ('db.get_user_by_email', lambda: db_manager.get_user_by_email(user['email']), None),
+        ('db.get_user_by_id', lambda: db_manager.get_user_by_id(str(user['_id'])), None),
+        ('db.update_project_requirement',
+         lambda: db_manager.update_project_requirement(requirement_id, requirement_update(1)), None),
+        ('db.update_cliente',
+         lambda: db_manager.update_cliente(str(cliente['_id']), {'ciudad': 'Cusco'}), None),
+        ('db.update_user',
+         lambda: db_manager.update_user(str(user['_id']), {'updated_at': datetime.utcnow()}), None),
+        ('db.insert_cliente', lambda: db_manager.insert_cliente(make_cliente(0, seed=3)), None),
+        ('db.insert_project_requirement',
+         lambda: db_manager.insert_project_requirement(make_requirement(0, seed=3)), None),
+        ('db.insert_user',
+         lambda: db_manager.insert_user(new_user()), None),
+        ('db.delete_cliente', db_manager.delete_cliente, scratch_cliente),
+        ('db.delete_project_requirement', db_manager.delete_project_requirement, scratch_requirement),
+        ('db.iter_export.first_1000',
+         lambda: [doc for _, doc in zip(range(1000), db_manager.iter_export('requirements'))], None),
+    ]
+
+
+def http_cases(client, db_manager, volumes, token, per_page=10):
+    """(name, run, setup) for every /api/* route through the Flask test client"""
+    headers = {'Authorization': f"Bearer {token}"}
+    requirement_id = str(db_manager.collection.find_one({}, {'_id': 1})['_id'])
+    cliente_id = str(db_manager.clientes_collection.find_one({}, {'_id': 1})['_id'])
+    deep_clientes = max(1, volumes['clientes'] // per_page - 1)
+    deep_requirements = max(1, volumes['requirements'] // per_page - 1)
+    reviews_etag = client.get('/api/reviews').headers.get('ETag')
+
+    def call(method, path, expect=(200,), extra_headers=None, **kwargs):
+        request_headers = dict(headers, **(extra_headers or {}))
+
+        def run():
+            response = client.open(path, method=method, headers=request_headers, **kwargs)
+            response.get_data()
+            if response.status_code not in expect:
+                raise RuntimeError(f"{method} {path} returned {response.status_code}")
+        return run
+
+    def scratch_requirement():
+        return (db_manager.insert_project_requirement(make_requirement(0, seed=4)),)
+
+    def delete_requirement(requirement):
+        call('DELETE', f'/api/requirements/{requirement}')()
+
+    return [
+        ('http.GET /api/clientes?page=1', call('GET', f'/api/clientes?page=1&per_page={per_page}'), None),
+        ('http.GET /api/clientes?page=deep',
+         call('GET', f'/api/clientes?page={deep_clientes}&per_page={per_page}'), None),
+        ('http.GET /api/clientes?nombre=', call('GET', '/api/clientes?nombre=ana'), None),
+        ('http.GET /api/clientes/search', call('GET', '/api/clientes/search?q=ana'), None),
+        ('http.GET /api/clientes/export', call('GET', '/api/clientes/export?format=csv'), None),
+        ('http.PUT /api/clientes/<id>',
+         call('PUT', f'/api/clientes/{cliente_id}', json={'ciudad': 'Lima'}), None),
+        ('http.POST /api/clientes',
+         call('POST', '/api/clientes', expect=(201,), json=form_payload(make_cliente(0, seed=5))), None),
+        ('http.GET /api/requirements?page=1', call('GET', f'/api/requirements?page=1&per_page={per_page}'), None),
+        ('http.GET /api/requirements?page=deep',
+         call('GET', f'/api/requirements?page={deep_requirements}&per_page={per_page}'), None),
+        ('http.GET /api/requirements?sort',
+         call('GET', '/api/requirements?status=Aprobado&sort_field=requestedEndDate&sort_direction=1'), None),
+        ('http.GET /api/requirements/search', call('GET', '/api/requirements/search?q=sistema'), None),
+        ('http.GET /api/requirements/search?format=ndjson',
+         call('GET', '/api/requirements/search?q=sistema&format=ndjson&limit=500'), None),
+        ('http.GET /api/requirements/stats', call('GET', '/api/requirements/stats'), None),
+        ('http.GET /api/requirements/<id>', call('GET', f'/api/requirements/{requirement_id}'), None),
+        ('http.PUT /api/requirements/<id>',
+         lambda: call('PUT', f'/api/requirements/{requirement_id}', json=requirement_update(2))(), None),
+        ('http.POST /api/submit-requirements',
+         call('POST', '/api/submit-requirements', expect=(201,), json=form_payload(make_requirement(0, seed=5))),
+         None),
+        ('http.DELETE /api/requirements/<id>', delete_requirement, scratch_requirement),
+        ('http.GET /api/reviews', call('GET', '/api/reviews'), None),
+        ('http.GET /api/reviews (304)',
+         call('GET', '/api/reviews', expect=(304,), extra_headers={'If-None-Match': reviews_etag or ''}), None),
+        ('http.POST /api/login', call('POST', '/api/login', json={'username': 'usuario0', 'password': 'clave0'}),
+         None),
+        ('http.GET /api/user', call('GET', '/api/user'), None),
+        ('http.GET /metrics', call('GET', '/metrics'), None),
+    ]
+
+
+def compare(results, baseline_path, threshold):
+    """Print current/baseline median ratios; return True if any case regressed"""
+    with open(baseline_path) as f:
+        baseline = {result['name']: result for result in json.load(f)['results']}
+    regressed = False
+    for result in results:
+        before = baseline.get(result['name'])
+        if not before or 'median_ms' not in before or 'median_ms' not in result:
+            continue
+        ratio = result['median_ms'] / before['median_ms'] if before['median_ms'] else None
+        slower = ratio is not None and ratio > 1 + threshold
+        regressed = regressed or slower
+        print(json.dumps({'name': result['name'], 'baseline_ms': before['median_ms'],
+                          'current_ms': result['median_ms'], 'ratio': round(ratio, 3) if ratio else None,
+                          'regression': slower}), flush=True)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=['mongod', 'mongomock'], default='mongod')
+    parser.add_argument('--uri', default='mongodb://localhost:27017')
+    parser.add_argument('--db', default='KodEstudioBench')
+    parser.add_argument('--clientes', type=int, default=10000)
+    parser.add_argument('--requirements', type=int, default=10000)
+    parser.add_argument('--usuarios', type=int, default=1000)
+    parser.add_argument('--calificaciones', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--only', help="Run only cases whose name contains this text")
+    parser.add_argument('--output', help="Write the full run as JSON to this file")
+    parser.add_argument('--compare', help="A previous --output file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Relative slowdown counted as a regression (default 0.2)")
+    args = parser.parse_args()
+
+    if args.db == 'KodEstudio':
+        parser.error("refusing to seed the application database; pick another --db")
+
+    # Config is read at import time, so point it at the benchmark database first
+    os.environ['MONGO_URI'] = args.uri
+    os.environ['MONGO_DB'] = args.db
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    # Every case comes from one address; measure the routes, not the rate limiter
+    os.environ.setdefault('RATE_LIMITS', '')
+
+    if args.backend == 'mongomock':
+        import mongomock
+        import connection
+        connection.MongoClient = mongomock.MongoClient
+
+    import jwt
+    import app as app_module
+
+    app = app_module.create_app()
+    db_manager = app_module.db_manager
+    volumes = {'clientes': args.clientes, 'requirements': args.requirements,
+               'usuarios': max(1, args.usuarios), 'calificaciones': args.calificaciones}
+    seed(db_manager, volumes)
+
+    user = db_manager.get_user_by_username('usuario0')
+    token = jwt.encode({'user_id': str(user['_id'])}, app.config['SECRET_KEY'], algorithm='HS256')
+
+    cases = db_cases(db_manager, volumes) + http_cases(app.test_client(), db_manager, volumes, token)
+    results = []
+    for name, run, setup in cases:
+        if args.only and args.only not in name:
+            continue
+        result = {'name': name}
+        try:
+            result.update(measure(run, args.repeat, args.warmup, setup))
+        except Exception as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+        results.append(result)
+        print(json.dumps(result), flush=True)
+
+    run_info = {
+        'commit': git_commit(),
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'backend': args.backend,
+        'python': platform.python_version(),
+        'volumes': volumes,
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(run_info, f, indent=2)
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
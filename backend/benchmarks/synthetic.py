@@ -0,0 +1,103 @@
+"""Deterministic synthetic documents shaped like the KodEstudio collections."""
+import random
+from datetime import datetime, timedelta
+
+NOMBRES = ['José', 'María', 'Lucía', 'Martín', 'Sofía', 'Andrés', 'Ana', 'Jesús',
+           'Valeria', 'Óscar', 'Camila', 'Raúl', 'Ximena', 'Iván', 'Inés', 'Diego']
+APELLIDOS = ['Pérez', 'Núñez', 'Gómez', 'Rodríguez', 'Peña', 'Quispe', 'Mamani',
+             'Flores', 'Sánchez', 'Díaz', 'Huamán', 'Chávez', 'Ramírez', 'Vásquez']
+CIUDADES = ['Lima', 'Arequipa', 'Cusco', 'Piura', 'La Libertad', 'Junín', 'Áncash',
+            'Cajamarca', 'Loreto', 'San Martín', 'Puno', 'Ica']
+PROJECT_TYPES = ['Desarollo App Móvil', 'Desarollo Web', 'Aplicación de Escritorio',
+                 'Consultoría', 'Otro']
+PRIORITIES = ['Bajo', 'Medio', 'Alto', 'Crítico']
+STATUSES = ['Rechazado', 'Aprobado', 'En Progreso']
+PALABRAS = ['sistema', 'gestión', 'inventario', 'ventas', 'portal', 'clientes', 'móvil',
+            'facturación', 'reportes', 'integración', 'almacén', 'pagos', 'logística',
+            'reservas', 'matrícula', 'planilla', 'catálogo', 'seguimiento', 'análisis']
+
+BASE_DATE = datetime(2024, 1, 1)
+
+
+def _person(rng):
+    nombre = f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}"
+    email = f"{nombre.split()[0].lower()}.{rng.randrange(10 ** 6)}@example.com"
+    celular = f"9{rng.randrange(10 ** 8):08d}"
+    return nombre, email, celular
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(PALABRAS) for _ in range(words)).capitalize()
+
+
+def make_cliente(i, seed=0):
+    """Build the i-th synthetic Clientes document"""
+    rng = random.Random(seed * 1_000_003 + i)
+    nombre, email, celular = _person(rng)
+    created_at = BASE_DATE + timedelta(minutes=i)
+    return {
+        'nombre': nombre,
+        'email': email,
+        'celular': celular,
+        'ciudad': rng.choice(CIUDADES),
+        'created_at': created_at,
+        'updated_at': created_at
+    }
+
+
+def make_requirement(i, seed=0):
+    """Build the i-th synthetic Solicitudes document with every required field"""
+    rng = random.Random(seed * 1_000_003 + i)
+    requestor, requestor_email, requestor_phone = _person(rng)
+    sponsor, sponsor_email, sponsor_phone = _person(rng)
+    created_at = BASE_DATE + timedelta(minutes=i)
+    return {
+        'date': created_at.strftime('%Y-%m-%d'),
+        'projectTitle': _text(rng, 3),
+        'requestorName': requestor,
+        'requestorPhone': requestor_phone,
+        'requestorEmail': requestor_email,
+        'department': rng.choice(CIUDADES),
+        'sponsorName': sponsor,
+        'sponsorPhone': sponsor_phone,
+        'sponsorEmail': sponsor_email,
+        'description': _text(rng, 60),
+        'dependencies': _text(rng, 8),
+        'requestedEndDate': (created_at + timedelta(days=rng.randrange(30, 365))).strftime('%Y-%m-%d'),
+        'estimatedBudget': str(rng.randrange(1000, 200000, 500)),
+        'status': rng.choice(STATUSES),
+        'priority': rng.choice(PRIORITIES),
+        'projectType': rng.choice(PROJECT_TYPES),
+        'technicalRequirements': _text(rng, 40),
+        'businessJustification': _text(rng, 40),
+        'riskAssessment': _text(rng, 30),
+        'created_at': created_at,
+        'updated_at': created_at
+    }
+
+
+def make_usuario(i, seed=0):
+    """Build the i-th synthetic Usuarios document; the password is ``clave{i}``"""
+    rng = random.Random(seed * 1_000_003 + i)
+    nombre, email, _ = _person(rng)
+    created_at = BASE_DATE + timedelta(minutes=i)
+    return {
+        'username': f"usuario{i}",
+        'email': email,
+        'nombre': nombre,
+        'password': f"clave{i}",
+        'created_at': created_at,
+        'updated_at': created_at
+    }
+
+
+def make_calificacion(i, seed=0):
+    """Build the i-th synthetic Calificaciones document, shaped like the landing-page carousel"""
+    rng = random.Random(seed * 1_000_003 + i)
+    nombre, _, _ = _person(rng)
+    return {
+        'cliente': nombre,
+        'calificacion': '⭐' * rng.randint(3, 5),
+        'descripcion': _text(rng, 20),
+        'created_at': BASE_DATE + timedelta(minutes=i)
+    }
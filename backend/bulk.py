@@ -0,0 +1,216 @@
+"""Bulk CSV/NDJSON import and streaming export for clients and requirements.
+
+CLI usage (from backend/):
+
+    python bulk.py import requirements solicitudes.csv --batch-size 1000
+    python bulk.py export clientes --format csv > clientes.csv
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+import tempfile
+from datetime import datetime
+from bson import ObjectId
+
+from json_provider import dumps_bytes
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_BATCH_SIZE = 10000
+# Only the first errors are reported so the report stays small on bad files
+MAX_REPORTED_ERRORS = 1000
+
+FORMATS = ('ndjson', 'csv')
+# Uploads to the async server are buffered in memory up to this size, then on disk
+SPOOL_MEMORY_BYTES = 1024 * 1024
+
+
+def read_rows(lines, fmt):
+    """Yield (row_number, row, error) for every record of a CSV or NDJSON text stream"""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+
+    if fmt == 'csv':
+        for row_number, row in enumerate(csv.DictReader(lines), start=1):
+            yield row_number, row, None
+        return
+
+    row_number = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, f"Invalid JSON: {str(e)}"
+            continue
+        if not isinstance(row, dict):
+            yield row_number, None, "Each line must be a JSON object"
+            continue
+        yield row_number, row, None
+
+
+def import_rows(rows, validate, insert_batch, batch_size=DEFAULT_BATCH_SIZE):
+    """Validate rows and insert them in unordered batches, reporting failures per row
+
+    validate returns the row as it should be stored or raises ValueError.
+    """
+    report = _new_report(batch_size)
+    for batch in _validated_batches(rows, validate, batch_size, report):
+        _record_inserts(report, batch, insert_batch([row for _, row in batch]))
+    return _finish(report)
+
+
+async def aimport_rows(rows, validate, insert_batch, batch_size=DEFAULT_BATCH_SIZE):
+    """import_rows for a coroutine insert_batch"""
+    report = _new_report(batch_size)
+    for batch in _validated_batches(rows, validate, batch_size, report):
+        _record_inserts(report, batch, await insert_batch([row for _, row in batch]))
+    return _finish(report)
+
+
+def _new_report(batch_size):
+    if not 1 <= batch_size <= MAX_BATCH_SIZE:
+        raise ValueError(f"batch_size must be between 1 and {MAX_BATCH_SIZE}")
+    return {'received': 0, 'inserted': 0, 'failed': 0, 'errors': []}
+
+
+def _record_error(report, row_number, message):
+    report['failed'] += 1
+    if len(report['errors']) < MAX_REPORTED_ERRORS:
+        report['errors'].append({'row': row_number, 'error': message})
+
+
+def _validated_batches(rows, validate, batch_size, report):
+    """Yield lists of (row_number, row) to insert, recording the rows that fail validation"""
+    batch = []
+    for row_number, row, error in rows:
+        report['received'] += 1
+        if error is None:
+            try:
+                row = validate(row)
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            _record_error(report, row_number, error)
+            continue
+        batch.append((row_number, row))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _record_inserts(report, batch, result):
+    inserted, errors = result
+    report['inserted'] += inserted
+    for index, message in errors:
+        _record_error(report, batch[index][0], message)
+
+
+def _finish(report):
+    report['errors_truncated'] = report['failed'] > len(report['errors'])
+    return report
+
+
+async def spool(chunks, max_size=SPOOL_MEMORY_BYTES):
+    """Collect an async body in a temporary file, on disk past max_size, for read_rows' line iterator"""
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_size)
+    try:
+        async for chunk in chunks:
+            spooled.write(chunk)
+    except BaseException:
+        spooled.close()
+        raise
+    spooled.seek(0)
+    return spooled
+
+
+def to_plain(value):
+    """Convert BSON values to their JSON/CSV text form"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: to_plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_plain(item) for item in value]
+    return value
+
+
+def line_encoder(fmt, fields):
+    """(header, encode): the export's first line, or None, and the function writing each document's line as bytes"""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+
+    if fmt == 'ndjson':
+        return None, lambda document: dumps_bytes(document) + b'\n'
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(values)
+        return buffer.getvalue().encode('utf-8')
+
+    return line(fields), lambda document: line([to_plain(document.get(field, '')) for field in fields])
+
+
+def export_lines(documents, fmt, fields):
+    """Check the format now, then yield the export one line at a time so memory stays flat"""
+    header, encode = line_encoder(fmt, fields)
+
+    def generate():
+        if header is not None:
+            yield header
+        for document in documents:
+            yield encode(document)
+
+    return generate()
+
+
+def aexport_lines(documents, fmt, fields):
+    """export_lines over an async iterator of documents"""
+    header, encode = line_encoder(fmt, fields)
+
+    async def generate():
+        if header is not None:
+            yield header
+        async for document in documents:
+            yield encode(document)
+
+    return generate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import/export for KodEstudio")
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('kind', choices=['clientes', 'requirements'])
+    parser.add_argument('path', nargs='?', help="Input file for import (default: stdin)")
+    parser.add_argument('--format', choices=FORMATS)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from database import DatabaseManager
+    db_manager = DatabaseManager()
+
+    if args.command == 'export':
+        documents = db_manager.iter_export(args.kind, args.batch_size)
+        for chunk in export_lines(documents, args.format or 'ndjson', db_manager.export_fields(args.kind)):
+            sys.stdout.buffer.write(chunk)
+        return
+
+    fmt = args.format or ('csv' if args.path and args.path.endswith('.csv') else 'ndjson')
+    with (open(args.path, encoding='utf-8-sig', newline='') if args.path else sys.stdin) as lines:
+        report = db_manager.bulk_import(args.kind, read_rows(lines, fmt), args.batch_size)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
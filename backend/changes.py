@@ -0,0 +1,495 @@
+"""Live change feed over Solicitudes, Clientes and Calificaciones.
+
+A background watcher follows the database and publishes every insert,
+update and delete as a ``Change`` on the process's ``change_bus``. Two kinds
+of subscribers consume it:
+
+* DatabaseManager drops what its caches hold for the changed document, so
+  writes made by other workers, hosts or tools show up without waiting for
+  the cache TTLs.
+* ``/api/changes/stream`` relays the changes to dashboards as Server-Sent
+  Events, so they refetch a list or the stats when something changed
+  instead of polling them.
+
+``CHANGE_FEED`` picks the source:
+
+* ``stream``: a MongoDB change stream, resumed from its last token after
+  errors. Needs a replica set or sharded cluster.
+* ``poll``: queries documents whose ``updated_at`` moved past the last poll
+  every ``CHANGE_POLL_INTERVAL`` seconds (``_id`` for Calificaciones, which
+  has no timestamps). Sees inserts and updates but not deletes, which the
+  cache TTLs still cover.
+* ``auto`` (default): ``stream``, falling back to ``poll`` when the server
+  does not support change streams.
+* ``off``: no watcher; caches rely on their TTLs alone.
+
+When the feed cannot say what it missed (a change stream resumed past its
+oplog window, or a slow SSE client) subscribers get a ``reset`` change and
+should treat everything as changed.
+"""
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+import metrics
+from cache import TTLCache
+from pagination import keyset_query
+
+logger = logging.getLogger(__name__)
+
+WATCHED_COLLECTIONS = ('Solicitudes', 'Clientes', 'Calificaciones')
+FEED_MODES = ('auto', 'stream', 'poll', 'off')
+
+# The field the poller follows per collection
+POLL_FIELDS = {
+    'Solicitudes': 'updated_at',
+    'Clientes': 'updated_at',
+    'Calificaciones': '_id'
+}
+POLL_BATCH_SIZE = 500
+
+# "The $changeStream stage is only supported on replica sets" and friends
+STREAM_UNSUPPORTED_CODES = (40573, 40324, 20)
+# The resume token fell off the oplog
+HISTORY_LOST_CODES = (286, 280)
+
+# Operation type and ids only: subscribers refetch what they show
+WATCH_PIPELINE = [
+    {'$match': {'ns.coll': {'$in': list(WATCHED_COLLECTIONS)},
+                'operationType': {'$in': ['insert', 'update', 'replace', 'delete']}}},
+    {'$project': {'operationType': 1, 'ns': 1, 'documentKey': 1, 'updateDescription.updatedFields': 1}}
+]
+
+# fields: the updated top-level fields, when known; updated_at: the document's, for polled changes
+Change = namedtuple('Change', ['collection', 'operation', 'document_id', 'fields', 'sequence', 'updated_at'],
+                    defaults=(None, None, None))
+
+RESET = Change(None, 'reset', None)
+
+
+def change_from_event(event):
+    """Change for one change stream event"""
+    operation = event['operationType']
+    fields = None
+    if operation == 'update':
+        # 'a.b' updates report the top-level field a
+        fields = sorted({field.split('.', 1)[0] for field in event['updateDescription']['updatedFields']})
+    return Change(event['ns']['coll'], 'update' if operation == 'replace' else operation,
+                  event['documentKey']['_id'], fields)
+
+
+def change_to_dict(change):
+    return {
+        'collection': change.collection,
+        'operation': change.operation,
+        'id': str(change.document_id) if change.document_id is not None else None,
+        'fields': change.fields
+    }
+
+
+
+class ChangeBus:
+    """In-process publish/subscribe of Change objects with a short replay history.
+
+    Sequences are per process, so event ids carry an origin that a forked or
+    restarted process changes: a client that reconnects elsewhere gets a
+    reset instead of a replay of somebody else's numbering.
+    """
+
+    def __init__(self, history=1024):
+        self._subscribers = []
+        self._history = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._new_origin()
+
+    def _new_origin(self):
+        self.origin = f"{os.getpid():x}{int(time.time() * 1000):x}"
+        self.sequence = 0
+        self._history.clear()
+
+    def subscribe(self, callback):
+        """Call callback(change) for every change published from now on"""
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def publish(self, change):
+        with self._lock:
+            self.sequence += 1
+            change = change._replace(sequence=self.sequence)
+            self._history.append(change)
+            subscribers = list(self._subscribers)
+        metrics.CHANGE_EVENTS.inc(change.collection or '', change.operation)
+        # Callbacks run on the watcher, so they must not block
+        for callback in subscribers:
+            try:
+                callback(change)
+            except Exception as e:
+                logger.warning(f"Change subscriber failed: {str(e)}")
+        return change
+
+    def event_id(self, change):
+        return f"{self.origin}-{change.sequence}"
+
+    def since(self, event_id):
+        """Changes published after event_id, or None when they can't all be replayed"""
+        origin, _, sequence = (event_id or '').rpartition('-')
+        if origin != self.origin or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        with self._lock:
+            if self._history and self._history[0].sequence > sequence + 1:
+                return None
+            return [change for change in self._history if change.sequence > sequence]
+
+    def _reset_after_fork(self):
+        # Subscribers stay; the child numbers its own changes
+        self._lock = threading.Lock()
+        self._new_origin()
+
+
+class OwnWrites:
+    """Documents this process is writing, so their feed events can be told from other writers'.
+
+    Register a write with ``expect`` before making it; ``claim`` then
+    consumes one registration per event. A write whose event never comes
+    (it failed, or polling folded it into another) leaves its registration
+    until ``ttl`` passes, so a later event from elsewhere may be claimed in
+    its place; callers only use this to skip work their own writes already
+    did, within bounds their caches' TTLs cover.
+    """
+
+    def __init__(self, maxsize=4096, ttl=60):
+        self._pending = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def expect(self, collection, document_id):
+        key = (collection, document_id)
+        with self._lock:
+            self._pending.set(key, self._pending.get(key, 0) + 1)
+
+    def claim(self, change):
+        """True, once per expected write, when change is one of ours"""
+        key = (change.collection, change.document_id)
+        with self._lock:
+            pending = self._pending.get(key, 0)
+            if not pending:
+                return False
+            if pending == 1:
+                self._pending.delete(key)
+            else:
+                self._pending.set(key, pending - 1)
+            return True
+
+
+class Subscription:
+    """Changes published since subscribing, buffered for one blocking consumer"""
+
+    def __init__(self, bus, maxsize=256):
+        self.bus = bus
+        self.overflowed = False
+        self._queue = self._make_queue(maxsize)
+        bus.subscribe(self._put)
+
+    @staticmethod
+    def _make_queue(maxsize):
+        return queue.Queue(maxsize)
+
+    def _put(self, change):
+        try:
+            self._queue.put_nowait(change)
+        except (queue.Full, asyncio.QueueFull):
+            self.overflowed = True
+
+    def get(self, timeout):
+        """The next change, or None after timeout seconds without one"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self._put)
+
+
+class AsyncSubscription(Subscription):
+    """Subscription for a coroutine; changes are handed over to its event loop"""
+
+    def __init__(self, bus, maxsize=256):
+        self._loop = asyncio.get_running_loop()
+        super().__init__(bus, maxsize)
+
+    @staticmethod
+    def _make_queue(maxsize):
+        return asyncio.Queue(maxsize)
+
+    def _put(self, change):
+        self._loop.call_soon_threadsafe(super()._put, change)
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+SSE_HEARTBEAT = b': keep-alive\n\n'
+
+
+def sse_event(bus, change):
+    """One Server-Sent Events frame; its id lets a reconnecting client resume"""
+    return (f"id: {bus.event_id(change)}\nevent: {change.operation}\n"
+            f"data: {json.dumps(change_to_dict(change))}\n\n").encode('utf-8')
+
+
+def sse_replay(subscription, last_event_id):
+    """(frames to send first, last sequence they cover); open the subscription before calling"""
+    bus = subscription.bus
+    current = bus.sequence
+    frames = [b'retry: 3000\n\n']
+    if not last_event_id:
+        return frames, current
+    missed = bus.since(last_event_id)
+    if missed is None:
+        # The client missed changes we don't have; it must refetch everything
+        frames.append(sse_event(bus, RESET._replace(sequence=current)))
+        return frames, current
+    frames.extend(sse_event(bus, change) for change in missed)
+    return frames, max([current] + [change.sequence for change in missed])
+
+
+def sse_frames(subscription, last_event_id, heartbeat=15, duration=300):
+    """Server-Sent Events for a Subscription: the replay, then live changes.
+
+    Ends after ``duration`` seconds, or after a reset once the client fell
+    behind, so it reconnects with Last-Event-ID and the thread is returned.
+    """
+    frames, sent = sse_replay(subscription, last_event_id)
+    yield from frames
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        change = subscription.get(heartbeat)
+        if subscription.overflowed:
+            yield sse_event(subscription.bus, RESET._replace(sequence=subscription.bus.sequence))
+            return
+        if change is None:
+            yield SSE_HEARTBEAT
+        elif change.sequence > sent:
+            sent = change.sequence
+            yield sse_event(subscription.bus, change)
+
+
+async def async_sse_frames(subscription, last_event_id, heartbeat=15, duration=300):
+    """sse_frames for an AsyncSubscription"""
+    frames, sent = sse_replay(subscription, last_event_id)
+    for frame in frames:
+        yield frame
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        change = await subscription.get(heartbeat)
+        if subscription.overflowed:
+            yield sse_event(subscription.bus, RESET._replace(sequence=subscription.bus.sequence))
+            return
+        if change is None:
+            yield SSE_HEARTBEAT
+        elif change.sequence > sent:
+            sent = change.sequence
+            yield sse_event(subscription.bus, change)
+
+
+class ChangePoller:
+    """Finds the documents whose POLL_FIELDS value moved past the previous poll.
+
+    Polls page on (field, _id) like the list cursors in pagination.py, so a
+    batch ending inside a run of documents sharing one timestamp (a bulk
+    import writes hundreds per millisecond) resumes within that run.
+
+    A write stamped before, but committed after, a poll that already moved
+    past its timestamp is missed; the cache TTLs bound that case too.
+    """
+
+    def __init__(self):
+        now = datetime.utcnow()
+        self._since = {name: ObjectId.from_datetime(now) if field == '_id' else now
+                       for name, field in POLL_FIELDS.items()}
+        # _id of the last document polled at _since, once there is one
+        self._last_id = dict.fromkeys(POLL_FIELDS)
+
+    def query(self, name):
+        """(filter, projection, sort) for the next poll of collection name"""
+        field, since, last_id = POLL_FIELDS[name], self._since[name], self._last_id[name]
+        if field == '_id' or last_id is None:
+            query = {field: {'$gt': since}}
+        else:
+            query = keyset_query({}, field, 1, {'f': field, 'd': 1, 'v': since, 'id': last_id})
+        sort = [(field, 1)] if field == '_id' else [(field, 1), ('_id', 1)]
+        return query, {field: 1, 'created_at': 1}, sort
+
+    def advance(self, name, documents):
+        """Changes for the documents a poll returned, in order"""
+        field, since = POLL_FIELDS[name], self._since[name]
+        changes = []
+        for document in documents:
+            self._since[name], self._last_id[name] = document[field], document['_id']
+            created_at = document.get('created_at')
+            inserted = field == '_id' or (isinstance(created_at, datetime) and created_at > since)
+            changes.append(Change(name, 'insert' if inserted else 'update', document['_id'],
+                                  updated_at=document[field] if field == 'updated_at' else None))
+        return changes
+
+
+class ChangeFeed:
+    """Runs the CHANGE_FEED source on a daemon thread in each process that starts it"""
+
+    retry_seconds = 5
+
+    def __init__(self, bus, get_database, mode='auto', poll_interval=5):
+        if mode not in FEED_MODES:
+            raise ValueError(f"CHANGE_FEED must be one of: {', '.join(FEED_MODES)}")
+        self.bus = bus
+        self.get_database = get_database
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._token = None
+
+    @classmethod
+    def from_config(cls, config, bus, get_database):
+        return cls(bus, get_database, config['CHANGE_FEED'], config['CHANGE_POLL_INTERVAL'])
+
+    def start(self):
+        """Start the watcher unless this process already runs it; cheap enough per request"""
+        if self.mode == 'off' or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A forked worker inherits the flag but not the thread
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            self._token = None
+            threading.Thread(target=self._run, name='change-feed', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        polling, poller = self.mode == 'poll', None
+        while not self._stop.is_set():
+            try:
+                if polling:
+                    poller = poller or ChangePoller()
+                    self._poll(poller)
+                else:
+                    self._watch()
+            except Exception as e:
+                polling, delay = self._recover(e, polling)
+                self._stop.wait(delay)
+
+    def _recover(self, error, polling):
+        """(polling, seconds to wait) after the source failed with error"""
+        code = getattr(error, 'code', None)
+        if isinstance(error, OperationFailure) and not polling:
+            if self.mode == 'auto' and code in STREAM_UNSUPPORTED_CODES:
+                logger.info(f"Change streams unavailable, polling every {self.poll_interval}s")
+                return True, 0
+            if code in HISTORY_LOST_CODES:
+                logger.warning("Change stream history lost; resetting subscribers")
+                self._token = None
+                self.bus.publish(RESET)
+                return polling, 0
+        logger.error(f"Change feed error: {str(error)}")
+        return polling, self.retry_seconds
+
+    def _watch(self):
+        with self.get_database().watch(WATCH_PIPELINE, resume_after=self._token,
+                                       max_await_time_ms=1000) as stream:
+            while stream.alive and not self._stop.is_set():
+                event = stream.try_next()
+                self._token = stream.resume_token
+                if event is not None:
+                    self.bus.publish(change_from_event(event))
+
+    def _poll(self, poller):
+        db = self.get_database()
+        while not self._stop.is_set():
+            for name in WATCHED_COLLECTIONS:
+                query, projection, sort = poller.query(name)
+                documents = list(db[name].find(query, projection).sort(sort).limit(POLL_BATCH_SIZE))
+                for change in poller.advance(name, documents):
+                    self.bus.publish(change)
+            self._stop.wait(self.poll_interval)
+
+
+class AsyncChangeFeed(ChangeFeed):
+    """ChangeFeed as a task on the running event loop, over a Motor database"""
+
+    def start(self):
+        if self.mode == 'off' or getattr(self, '_task', None) is not None:
+            return
+        self._token = None
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        task, self._task = getattr(self, '_task', None), None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        polling, poller = self.mode == 'poll', None
+        while True:
+            try:
+                if polling:
+                    poller = poller or ChangePoller()
+                    await self._poll(poller)
+                else:
+                    await self._watch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                polling, delay = self._recover(e, polling)
+                await asyncio.sleep(delay)
+
+    async def _watch(self):
+        async with self.get_database().watch(WATCH_PIPELINE, resume_after=self._token,
+                                             max_await_time_ms=1000) as stream:
+            while stream.alive:
+                event = await stream.try_next()
+                self._token = stream.resume_token
+                if event is not None:
+                    self.bus.publish(change_from_event(event))
+
+    async def _poll(self, poller):
+        db = self.get_database()
+        while True:
+            for name in WATCHED_COLLECTIONS:
+                query, projection, sort = poller.query(name)
+                documents = await db[name].find(query, projection).sort(sort).limit(POLL_BATCH_SIZE).to_list(None)
+                for change in poller.advance(name, documents):
+                    self.bus.publish(change)
+            await asyncio.sleep(self.poll_interval)
+
+
+change_bus = ChangeBus()
+
+os.register_at_fork(after_in_child=change_bus._reset_after_fork)
@@ -0,0 +1,48 @@
+"""gzip for buffered API responses.
+
+Only complete bodies are compressed: streamed NDJSON/CSV responses have no
+Content-Length and are left alone, as are bodies below the size threshold
+where gzip costs more CPU than it saves on the wire.
+"""
+import gzip
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/csv', 'application/x-ndjson', 'text/plain')
+
+
+def accepts_gzip(accept_encoding):
+    """Whether an Accept-Encoding header value allows gzip"""
+    for coding in (accept_encoding or '').split(','):
+        name, _, params = coding.strip().partition(';')
+        if name.strip().lower() in ('gzip', '*'):
+            return params.replace(' ', '') != 'q=0'
+    return False
+
+
+def should_compress(response, accept_encoding, min_size):
+    """Whether a response is complete, compressible and large enough to gzip"""
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return False
+    response.vary.add('Accept-Encoding')
+    return (
+        response.status_code == 200
+        and 'Content-Encoding' not in response.headers
+        and response.content_length is not None
+        and response.content_length >= min_size
+        and accepts_gzip(accept_encoding)
+    )
+
+
+def set_gzip_body(response, data, level):
+    """Replace the response body with its gzip encoding"""
+    body = gzip.compress(data, compresslevel=level, mtime=0)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Content-Length'] = str(len(body))
+    return response
+
+
+def compress_response(response, accept_encoding, min_size, level):
+    """after_request helper for Flask"""
+    if should_compress(response, accept_encoding, min_size):
+        set_gzip_body(response, response.get_data(), level)
+    return response
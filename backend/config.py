@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+class Config:
+    """Settings read from the environment, with development defaults"""
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'your_secret_key')  # Cambia esto en producción
+
+    MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017')
+    MONGO_DB = os.environ.get('MONGO_DB', 'KodEstudio')
+    # Each process owns its pool, so size it to the threads of one worker
+    MONGO_MAX_POOL_SIZE = _env_int('MONGO_MAX_POOL_SIZE', 50)
+    MONGO_MIN_POOL_SIZE = _env_int('MONGO_MIN_POOL_SIZE', 0)
+    MONGO_CONNECT_TIMEOUT_MS = _env_int('MONGO_CONNECT_TIMEOUT_MS', 5000)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = _env_int('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)
+    MONGO_SOCKET_TIMEOUT_MS = _env_int('MONGO_SOCKET_TIMEOUT_MS', 30000)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = _env_int('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000)
+
+    ENSURE_INDEXES = os.environ.get('ENSURE_INDEXES', '1') == '1'
+
+    # Request, database and pool instrumentation served on /metrics
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+
+    # See logging_setup.py
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_LEVELS = os.environ.get('LOG_LEVELS', '')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+    LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', '0.01'))
+
+    # See passwords.py; raising the cost upgrades stored hashes as users log in
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = _env_int('PASSWORD_HASH_WORKERS', 2)
+    PASSWORD_HASH_MAX_PENDING = _env_int('PASSWORD_HASH_MAX_PENDING', 16)
+    PASSWORD_HASH_WAIT_TIMEOUT = float(os.environ.get('PASSWORD_HASH_WAIT_TIMEOUT', '2'))
+
+    # See admission.py; per client address and route, count/seconds
+    RATE_LIMITS = os.environ.get(
+        'RATE_LIMITS',
+        '/api/login=10/60,/api/register=5/60,/api/submit-requirements=20/60,/api/reviews=120/60'
+    )
+    RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE', 'memory')  # memory | mongo
+    # X-Forwarded-For hops added by our own reverse proxies
+    RATE_LIMIT_TRUSTED_PROXIES = _env_int('RATE_LIMIT_TRUSTED_PROXIES', 0)
+    MAX_CONCURRENT_REQUESTS = _env_int('MAX_CONCURRENT_REQUESTS', 100)
+    MAX_CONCURRENT_PUBLIC_REQUESTS = _env_int('MAX_CONCURRENT_PUBLIC_REQUESTS',
+                                              max(1, _env_int('WEB_THREADS', 4) // 2))
+    # asgi.py serves every request from one event loop, so its cap doesn't follow WEB_THREADS
+    ASYNC_MAX_CONCURRENT_PUBLIC_REQUESTS = _env_int('ASYNC_MAX_CONCURRENT_PUBLIC_REQUESTS',
+                                                    max(1, _env_int('MAX_CONCURRENT_REQUESTS', 100) // 2))
+    ADMISSION_TIMEOUT = float(os.environ.get('ADMISSION_TIMEOUT', '0.25'))
+
+    # See changes.py; auto | stream | poll | off
+    CHANGE_FEED = os.environ.get('CHANGE_FEED', 'auto')
+    CHANGE_POLL_INTERVAL = float(os.environ.get('CHANGE_POLL_INTERVAL', '5'))
+    # Open /api/changes/stream connections per process; each holds a thread under gunicorn
+    CHANGE_STREAM_MAX_CLIENTS = _env_int('CHANGE_STREAM_MAX_CLIENTS', max(1, _env_int('WEB_THREADS', 4) // 2))
+    # Seconds before a stream ends and the client reconnects with Last-Event-ID
+    CHANGE_STREAM_DURATION = _env_int('CHANGE_STREAM_DURATION', 300)
+
+    # See sorting.py; what /api/requirements does with a sort no index serves: disk | reject
+    SORT_UNINDEXED = os.environ.get('SORT_UNINDEXED', 'disk')
+
+    # See analytics.py; /api/requirements/analytics refreshes a rollup older than this (seconds)
+    ANALYTICS_MAX_AGE = _env_int('ANALYTICS_MAX_AGE', 300)
+
+    # See schema.py; client and requirement bodies larger than this are refused with 413 (bytes)
+    MAX_JSON_BODY_BYTES = _env_int('MAX_JSON_BODY_BYTES', 256 * 1024)
+    # Longest description, dependencies... a requirement may carry (characters)
+    MAX_TEXT_LENGTH = _env_int('MAX_TEXT_LENGTH', 10000)
+
+    # gzip buffered responses at least this large (bytes)
+    COMPRESS_MIN_SIZE = _env_int('COMPRESS_MIN_SIZE', 1024)
+    COMPRESS_LEVEL = _env_int('COMPRESS_LEVEL', 6)
+
+    # Read by gunicorn.conf.py
+    BIND = os.environ.get('BIND', '0.0.0.0:5000')
+    WEB_WORKERS = _env_int('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1)
+    WEB_THREADS = _env_int('WEB_THREADS', 4)
+
+
+def mongo_client_options(config=Config):
+    """Keyword arguments for MongoClient / AsyncIOMotorClient"""
+    return {
+        'maxPoolSize': config.MONGO_MAX_POOL_SIZE,
+        'minPoolSize': config.MONGO_MIN_POOL_SIZE,
+        'connectTimeoutMS': config.MONGO_CONNECT_TIMEOUT_MS,
+        'serverSelectionTimeoutMS': config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        'socketTimeoutMS': config.MONGO_SOCKET_TIMEOUT_MS,
+        'waitQueueTimeoutMS': config.MONGO_WAIT_QUEUE_TIMEOUT_MS
+    }
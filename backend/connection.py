@@ -0,0 +1,50 @@
+import logging
+import os
+import threading
+from pymongo import MongoClient
+from config import Config, mongo_client_options
+from metrics import mongo_event_listeners
+
+logger = logging.getLogger(__name__)
+
+# One MongoClient (and therefore one connection pool) per process and URI
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_client(uri=None):
+    """Return the process-wide MongoClient for uri, opening it on first use.
+
+    Clients are keyed by PID as well, so a process forked after a client was
+    opened gets its own instead of sharing the parent's sockets.
+    """
+    key = (os.getpid(), uri or Config.MONGO_URI)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                try:
+                    listeners = mongo_event_listeners() if Config.METRICS_ENABLED else []
+                    client = MongoClient(key[1], event_listeners=listeners, **mongo_client_options())
+                    _clients[key] = client
+                    logger.info("Successfully connected to MongoDB")
+                except Exception as e:
+                    logger.error(f"Error connecting to MongoDB: {str(e)}")
+                    raise
+    return client
+
+
+def get_database(name=None, uri=None):
+    """Return a Database handle on the shared client"""
+    return get_client(uri)[name or Config.MONGO_DB]
+
+
+def close_clients():
+    """Close this process's clients and forget any inherited from a parent"""
+    pid = os.getpid()
+    with _lock:
+        for (owner_pid, _), client in list(_clients.items()):
+            if owner_pid == pid:
+                client.close()
+        _clients.clear()
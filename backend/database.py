@@ -1,35 +1,150 @@
-from pymongo import MongoClient
-from bson import ObjectId
-from datetime import datetime
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from bson import ObjectId, json_util
+from datetime import datetime, timedelta
 import logging
-from werkzeug.security import generate_password_hash, check_password_hash
+import threading
+from config import Config
+from connection import get_client, get_database, close_clients
+from metrics import instrument
+from pagination import encode_cursor, decode_cursor, keyset_query
+from cache import TTLCache
+from http_cache import ResponseCache
+from indexes import ensure_indexes, scan_report
+from analytics import (
+    ANALYTICS_COLLECTION, DIMENSIONS, GRANULARITIES, REFRESH_LEASE, REFRESH_STATE_ID, bucket_start,
+    lease_query, new_refresh_id, oldest_change_pipeline, refresh_start, rollup_pipeline,
+    series_from_buckets, series_query, stale_buckets_filter
+)
+from stats import STATS_FIELDS, STATS_PIPELINE, StatsSnapshot, stats_from_facet
+from bulk import import_rows
+from projection import ALL, SUMMARY, build_projection
+from references import (
+    CLIENTE_REFERENCE_PROJECTION, ClienteResolver, cliente_tag, normalize_email, requestor_changes, requirement_tags
+)
+from sorting import plan_sort, plan_to_dict
+from search import (
+    CLIENTE_SEARCH_FIELDS, REQUIREMENT_SEARCH_FIELDS, SEARCH_PROJECTION,
+    search_fields, ranked_pipeline, untouched_search_fields
+)
+from passwords import password_hasher
+from changes import OwnWrites
+from schema import (
+    CLIENTE_SCHEMA, CLIENTE_SCHEMA_FIELDS, REQUIREMENT_SCHEMA, REQUIREMENT_SCHEMA_FIELDS, REQUIREMENT_UPDATE_SCHEMA
+)
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+TOTAL_MODES = ('false', 'estimated', 'exact')
+
+SEARCH_DEFAULT_LIMIT = 50
+SEARCH_MAX_LIMIT = 1000
+SEARCH_BATCH_SIZE = 200
+
+# The field rules themselves live in schema.py
+REQUIREMENT_FIELDS = tuple(REQUIREMENT_SCHEMA_FIELDS)
+CLIENTE_FIELDS = tuple(CLIENTE_SCHEMA_FIELDS)
+
+# Every field a caller may select with ``fields=`` (also the CSV export columns)
+REQUIREMENT_DOCUMENT_FIELDS = ('_id', 'cliente_id') + REQUIREMENT_FIELDS + ('created_at', 'updated_at')
+CLIENTE_DOCUMENT_FIELDS = ('_id',) + CLIENTE_FIELDS + ('created_at', 'updated_at')
+
+# The columns RequirementsTable and ClientesTable render
+REQUIREMENT_SUMMARY_FIELDS = (
+    'projectTitle', 'department', 'requestorName', 'status', 'priority',
+    'requestedEndDate', 'created_at'
+)
+CLIENTE_SUMMARY_FIELDS = CLIENTE_FIELDS
+
+
 class DatabaseManager:
+    """Process-wide data access object.
+
+    Every ``DatabaseManager()`` returns the same fully initialized instance,
+    so blueprints, workers and scripts can construct it freely. The Mongo
+    connection itself lives in the connection registry and opens on first use.
+    """
     _instance = None
-    
-    def __init__(self):
-        if not DatabaseManager._instance:
-            try:
-                self.client = MongoClient('mongodb://localhost:27017')
-                self.db = self.client['KodEstudio']
-                self.collection = self.db['Solicitudes']
-                self.users_collection = self.db['Usuarios']
-                self.reviews_collection = self.db['Calificaciones']
-                self.clientes_collection = self.db['Clientes']
-                DatabaseManager._instance = self
-                logger.info("Successfully connected to MongoDB")
-            except Exception as e:
-                logger.error(f"Error connecting to MongoDB: {str(e)}")
-                raise
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._setup()
+                    cls._instance = instance
+        return cls._instance
+
+    def _setup(self):
+        # Cached count_documents results per collection, keyed by filter
+        self._count_caches = {
+            'Solicitudes': TTLCache(maxsize=256, ttl=30),
+            'Clientes': TTLCache(maxsize=256, ttl=30)
+        }
+        self._stats_snapshot = StatsSnapshot(ttl=60)
+        # Requirements this process writes; their feed events need no invalidation
+        self._own_writes = OwnWrites(maxsize=4096, ttl=60)
+        # Users looked up by ID on every authenticated request
+        self._user_cache = TTLCache(maxsize=1024, ttl=300)
+        # Encoded bodies of /api/reviews and /api/requirements/<id>
+        self._response_cache = ResponseCache(maxsize=1024, ttl=300)
+        # Clients referenced by the requirements being read, see references.py
+        self._cliente_resolver = ClienteResolver(maxsize=4096, ttl=60)
+
+    @property
+    def client(self):
+        return get_client()
+
+    @property
+    def db(self):
+        return get_database()
+
+    @property
+    def collection(self):
+        return self.db['Solicitudes']
+
+    @property
+    def users_collection(self):
+        return self.db['Usuarios']
+
+    @property
+    def reviews_collection(self):
+        return self.db['Calificaciones']
+
+    @property
+    def clientes_collection(self):
+        return self.db['Clientes']
+
+    @property
+    def analytics_collection(self):
+        return self.db[ANALYTICS_COLLECTION]
+
+    def close(self):
+        """Close this process's client; the next database access reopens it"""
+        close_clients()
+
+    def ensure_indexes(self):
+        """Create the indexes declared in the index registry"""
+        try:
+            return ensure_indexes(self.db)
+        except Exception as e:
+            logger.error(f"Error ensuring indexes: {str(e)}")
+            raise
+
+    def index_report(self):
+        """Report which registered queries would still scan a collection"""
+        try:
+            return scan_report(self.db)
+        except Exception as e:
+            logger.error(f"Error building index report: {str(e)}")
+            raise
 
     def insert_user(self, user_data):
         """Insert a new user into the database"""
         try:
             result = self.users_collection.insert_one(user_data)
-            logger.info(f"Successfully inserted user with ID: {result.inserted_id}")
+            logger.debug("Successfully inserted user with ID: %s", result.inserted_id)
             return str(result.inserted_id)
         except Exception as e:
             logger.error(f"Error inserting user: {str(e)}")
@@ -47,8 +162,9 @@ class DatabaseManager:
                 {"$set": update_data}
             )
             
+            self._user_cache.delete(str(user_id))
             if result.matched_count > 0:
-                logger.info(f"Successfully updated user: {user_id}")
+                logger.debug("Successfully updated user: %s", user_id)
                 return True
             logger.warning(f"No user found with ID: {user_id}")
             return False
@@ -59,50 +175,126 @@ class DatabaseManager:
     def get_all_reviews(self):
         """Retrieve all reviews from the database"""
         try:
-            reviews = list(self.reviews_collection.find())
-            for review in reviews:
-                review['_id'] = str(review['_id'])  # Convert ObjectId to string
-            return reviews
+            # ObjectIds, nested ones included, are encoded by the JSON provider
+            return list(self.reviews_collection.find())
         except Exception as e:
             logger.error(f"Error retrieving reviews: {str(e)}")
             raise
 
-    def get_all_clientes(self, filters=None, page=1, per_page=10):
-        """Retrieve all clients with optional filtering and pagination"""
+    def get_cached_reviews(self):
+        """All reviews as a CachedResponse; reviews are edited outside the API, so the change feed or the TTL refreshes them"""
+        return self._response_cache.get(('reviews',), self.get_all_reviews)
+
+    def get_all_clientes(self, filters=None, page=1, per_page=10, cursor=None, with_total=None,
+                         fields=SUMMARY):
+        """Retrieve all clients with optional filtering and pagination.
+
+        Passing ``cursor`` (an empty string for the first page) switches to
+        keyset pagination ordered by ``_id``; ``page`` is ignored in that mode.
+        ``with_total`` is one of 'false', 'estimated' or 'exact' and defaults
+        to 'exact' for page mode and 'false' for cursor mode. ``fields``
+        selects the returned fields, see projection.py.
+        """
         try:
             query = filters if filters else {}
+            projection = build_projection(fields, CLIENTE_SUMMARY_FIELDS, CLIENTE_DOCUMENT_FIELDS)
             
             # Log the query for debugging
-            logger.info(f"MongoDB query: {query}")
-            
-            # Get total count for pagination
-            total_documents = self.clientes_collection.count_documents(query)
-            logger.info(f"Found {total_documents} documents matching query")
+            logger.debug("MongoDB query: %s", query)
+
+            if cursor is not None:
+                clientes, next_cursor = self._find_page_by_cursor(
+                    self.clientes_collection, query, '_id', 1, per_page, cursor, projection
+                )
+                result = {
+                    'clientes': clientes,
+                    'per_page': per_page,
+                    'has_more': next_cursor is not None,
+                    'next_cursor': next_cursor
+                }
+                self._add_total(result, self.clientes_collection, query, with_total or 'false')
+                return result
             
             # Calculate skip value for pagination
             skip = (page - 1) * per_page
             
-            # Execute query with pagination
-            cursor = self.clientes_collection.find(query).skip(skip).limit(per_page)
-            clientes = [self.serialize_object_id(cliente) for cliente in cursor]
+            # Execute query with pagination, fetching one extra row for has_more
+            cursor = self.clientes_collection.find(query, projection).skip(skip).limit(per_page + 1)
+            clientes = list(cursor)
             
-            return {
-                'clientes': clientes,
-                'total': total_documents,
+            result = {
+                'clientes': clientes[:per_page],
                 'page': page,
                 'per_page': per_page,
-                'total_pages': -(-total_documents // per_page)  # Ceiling division
+                'has_more': len(clientes) > per_page
             }
+            self._add_total(result, self.clientes_collection, query, with_total or 'exact')
+            return result
         except Exception as e:
             logger.error(f"Error retrieving clients: {str(e)}")
             raise
 
+    def _find_page_by_cursor(self, collection, query, sort_field, direction, per_page, cursor,
+                             projection=SEARCH_PROJECTION, allow_disk_use=False):
+        """Fetch one keyset page and the cursor for the page that follows it"""
+        if cursor:
+            query = keyset_query(query, sort_field, direction, decode_cursor(cursor))
+
+        sort_params = [(sort_field, direction)]
+        if sort_field != '_id':
+            sort_params.append(('_id', direction))
+
+        # Fetch one extra document to know whether another page exists
+        page = collection.find(query, projection).sort(sort_params).limit(per_page + 1)
+        if allow_disk_use:
+            page = page.allow_disk_use(True)
+        documents = list(page)
+        next_cursor = None
+        if len(documents) > per_page:
+            documents = documents[:per_page]
+            next_cursor = encode_cursor(sort_field, direction, documents[-1])
+
+        return documents, next_cursor
+
+    def _add_total(self, result, collection, query, with_total):
+        """Attach total and total_pages to a list result according to with_total"""
+        if with_total not in TOTAL_MODES:
+            raise ValueError(f"with_total must be one of: {', '.join(TOTAL_MODES)}")
+        if with_total == 'false':
+            return
+
+        total_documents = self._count_documents(collection, query, with_total == 'estimated')
+        result['total'] = total_documents
+        result['total_pages'] = -(-total_documents // result['per_page'])  # Ceiling division
+
+    def _count_documents(self, collection, query, estimated=False):
+        """Count matching documents, optionally from metadata or the count cache"""
+        if not estimated:
+            return collection.count_documents(query)
+        if not query:
+            return collection.estimated_document_count()
+
+        count_cache = self._count_caches[collection.name]
+        key = json_util.dumps(query, sort_keys=True)
+        total_documents = count_cache.get(key)
+        if total_documents is None:
+            total_documents = collection.count_documents(query)
+            count_cache.set(key, total_documents)
+        return total_documents
+
+    def _invalidate_counts(self, *collections):
+        """Drop cached counts after documents are inserted or deleted"""
+        for collection in collections:
+            self._count_caches[collection.name].clear()
+
     def delete_cliente(self, cliente_id):
         """Delete a client"""
         try:
             result = self.clientes_collection.delete_one({"_id": ObjectId(cliente_id)})
+            self._forget_cliente(ObjectId(cliente_id))
             if result.deleted_count > 0:
-                logger.info(f"Successfully deleted client: {cliente_id}")
+                self._invalidate_counts(self.clientes_collection)
+                logger.debug("Successfully deleted client: %s", cliente_id)
                 return True
             logger.warning(f"No client found with ID: {cliente_id}")
             return False
@@ -110,32 +302,82 @@ class DatabaseManager:
             logger.error(f"Error deleting client: {str(e)}")
             raise
 
-    def search_clientes(self, search_term):
-        """Search clients by various fields"""
+    def search_clientes(self, search_term, limit=SEARCH_DEFAULT_LIMIT, cursor=None, fields=SUMMARY):
+        """Search clients by name, email and city, best matches first"""
         try:
-            query = {
-                "$or": [
-                    {"nombre": {"$regex": search_term, "$options": "i"}},
-                    {"email": {"$regex": search_term, "$options": "i"}},
-                    {"ciudad": {"$regex": search_term, "$options": "i"}}
-                ]
-            }
-            
-            cursor = self.clientes_collection.find(query)
-            clientes = [self.serialize_object_id(cliente) for cliente in cursor]
-            return clientes
+            projection = build_projection(fields, CLIENTE_SUMMARY_FIELDS, CLIENTE_DOCUMENT_FIELDS, ('_score',))
+            return self._search_page(self.clientes_collection, CLIENTE_SEARCH_FIELDS,
+                                     search_term, limit, cursor, projection)
         except Exception as e:
             logger.error(f"Error searching clients: {str(e)}")
             raise
+
+    def iter_search_clientes(self, search_term, limit=None, batch_size=SEARCH_BATCH_SIZE, fields=SUMMARY):
+        """Yield matching clients one by one straight from the database cursor"""
+        projection = build_projection(fields, CLIENTE_SUMMARY_FIELDS, CLIENTE_DOCUMENT_FIELDS)
+        return self._iter_search(self.clientes_collection, CLIENTE_SEARCH_FIELDS,
+                                 search_term, limit, batch_size, projection)
+
+    def _search_page(self, collection, weights, search_term, limit, cursor, projection=None):
+        """Run a ranked search and return one page plus the cursor for the next"""
+        if not 1 <= limit <= SEARCH_MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {SEARCH_MAX_LIMIT}")
+
+        cursor_data = decode_cursor(cursor) if cursor else None
+        pipeline = ranked_pipeline(search_term, weights, limit + 1, cursor_data, projection)
+        documents = list(collection.aggregate(pipeline, allowDiskUse=True))
+
+        next_cursor = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            next_cursor = encode_cursor('_score', -1, documents[-1])
+
+        for document in documents:
+            document.pop('_score', None)
+        return {
+            'results': documents,
+            'next_cursor': next_cursor
+        }
+
+    def _iter_search(self, collection, weights, search_term, limit, batch_size, projection=None):
+        """Validate eagerly, then lazily stream ranked search results"""
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be a positive integer")
+        pipeline = ranked_pipeline(search_term, weights, limit, projection=projection)
+
+        def generate():
+            cursor = collection.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+            try:
+                for document in cursor:
+                    document.pop('_score', None)
+                    yield document
+            finally:
+                cursor.close()
+
+        return generate()
+    
+    def _search_update(self, collection, weights, query, update_data):
+        """Search arrays to $set along with update_data; {} unless it changes a searchable field"""
+        untouched = untouched_search_fields(update_data, weights)
+        if untouched is None:
+            return {}
+        # The fields the update leaves alone still count towards the arrays
+        stored = collection.find_one(query, {field: 1 for field in untouched}) if untouched else None
+        return search_fields(dict(stored or {}, **update_data), weights)
     
     def insert_cliente(self, cliente_data):
         """Insert a new client into the database"""
         try:
             cliente_data['created_at'] = datetime.utcnow()
             cliente_data['updated_at'] = datetime.utcnow()
+            cliente_data.update(search_fields(cliente_data, CLIENTE_SEARCH_FIELDS))
+            cliente_data['email_key'] = normalize_email(cliente_data.get('email'))
             result = self.clientes_collection.insert_one(cliente_data)
-            logger.info(f"Successfully inserted client with ID: {result.inserted_id}")
+            self._invalidate_counts(self.clientes_collection)
+            logger.debug("Successfully inserted client with ID: %s", result.inserted_id)
             return str(result.inserted_id)
+        except DuplicateKeyError:
+            raise ValueError("A client with that email already exists")
         except Exception as e:
             logger.error(f"Error inserting client: {str(e)}")
             raise
@@ -147,6 +389,10 @@ class DatabaseManager:
             if '_id' in update_data:
                 del update_data['_id']
             update_data['updated_at'] = datetime.utcnow()
+            if 'email' in update_data:
+                update_data['email_key'] = normalize_email(update_data['email'])
+            update_data.update(self._search_update(self.clientes_collection, CLIENTE_SEARCH_FIELDS,
+                                                   {"_id": ObjectId(cliente_id)}, update_data))
             
             result = self.clientes_collection.update_one(
                 {"_id": ObjectId(cliente_id)},
@@ -154,34 +400,74 @@ class DatabaseManager:
             )
             
             if result.matched_count > 0:
-                logger.info(f"Successfully updated client: {cliente_id}")
-                
-                # Update client information in the project requirements collection
-                self.collection.update_many(
-                    {"requestorEmail": update_data.get('email')},
-                    {"$set": {
-                        'requestorName': update_data.get('nombre'),
-                        'requestorPhone': update_data.get('celular'),
-                        'department': update_data.get('ciudad'),
-                        'updated_at': datetime.utcnow()
-                    }}
-                )
-                
+                logger.debug("Successfully updated client: %s", cliente_id)
+                # Requirements reference the client, so they pick the change up on read
+                self._forget_cliente(ObjectId(cliente_id))
                 return True
             logger.warning(f"No client found with ID: {cliente_id}")
             return False
+        except DuplicateKeyError:
+            raise ValueError("A client with that email already exists")
         except Exception as e:
             logger.error(f"Error updating client: {str(e)}")
             raise
 
 
+    def apply_change(self, change):
+        """Drop what the caches hold for a document changed by any process, see changes.py"""
+        if change.operation == 'reset':
+            for count_cache in self._count_caches.values():
+                count_cache.clear()
+            self._stats_snapshot.invalidate()
+            self._cliente_resolver.clear()
+            self._response_cache.clear()
+        elif change.collection == self.collection.name:
+            self._response_cache.invalidate(('requirement', str(change.document_id)))
+            if self._own_writes.claim(change):
+                # The write already adjusted the counts and the stats snapshot
+                return
+            if change.operation != 'update':
+                self._invalidate_counts(self.collection)
+            if self._stats_snapshot.outdated_by(change):
+                self._stats_snapshot.invalidate()
+        elif change.collection == self.clientes_collection.name:
+            self._forget_cliente(change.document_id)
+            if change.operation != 'update':
+                self._invalidate_counts(self.clientes_collection)
+        elif change.collection == self.reviews_collection.name:
+            self._response_cache.invalidate(('reviews',))
+
+    def _forget_cliente(self, cliente_id):
+        """Drop a changed client from the caches that hold its data"""
+        self._cliente_resolver.invalidate(cliente_id)
+        # Cached requirement bodies embed their client's fields
+        self._response_cache.invalidate_tag(cliente_tag(cliente_id))
+
+    def _resolve_clientes(self, documents):
+        """Fill the requestor fields of requirements from their referenced clients"""
+        found, missing = self._cliente_resolver.plan(documents)
+        if missing:
+            found.update(self._cliente_resolver.store(
+                self.clientes_collection.find({"_id": {"$in": missing}}, CLIENTE_REFERENCE_PROJECTION)
+            ))
+        return self._cliente_resolver.apply(documents, found)
+
+    def _iter_resolved(self, documents, batch_size):
+        """_resolve_clientes over a stream, one lookup per batch_size documents"""
+        batch = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                yield from self._resolve_clientes(batch)
+                batch = []
+        if batch:
+            yield from self._resolve_clientes(batch)
+
     def get_cliente(self, cliente_id):
         """Retrieve a specific client by ID"""
         try:
-            cliente = self.clientes_collection.find_one({"_id": ObjectId(cliente_id)})
-            if cliente:
-                return self.serialize_object_id(cliente)
-            return None
+            cliente = self.clientes_collection.find_one({"_id": ObjectId(cliente_id)}, SEARCH_PROJECTION)
+            return cliente
         except Exception as e:
             logger.error(f"Error retrieving client: {str(e)}")
             raise
@@ -195,105 +481,261 @@ class DatabaseManager:
 
     @staticmethod
     def validate_requirement_data(data):
-        """Validate required fields in requirement data"""
-        required_fields = [
-            'date', 'projectTitle', 'requestorName', 'requestorPhone',
-            'requestorEmail', 'department', 'sponsorName', 'sponsorPhone',
-            'sponsorEmail', 'description', 'dependencies', 'requestedEndDate',
-            'estimatedBudget', 'status', 'priority', 'projectType',
-            'technicalRequirements', 'businessJustification', 'riskAssessment'
-        ]
-        
-        missing_fields = [field for field in required_fields if field not in data]
-        if missing_fields:
-            raise ValueError(f"Missing required fields: {', '.join(missing_fields)}")
-        
-        return True
+        """The fields of a new requirement, checked against schema.py; raises ValueError"""
+        return REQUIREMENT_SCHEMA.validate(data)
 
     @staticmethod
-    def validate_update_data(data):
-        """Validates update data for project requirements."""
-        valid_fields = {
-            'date', 'projectTitle', 'requestorName', 'requestorPhone',
-            'requestorEmail', 'department', 'sponsorName', 'sponsorPhone',
-            'sponsorEmail', 'description', 'dependencies', 'requestedEndDate',
-            'estimatedBudget', 'status', 'priority', 'projectType',
-            'technicalRequirements', 'businessJustification', 'riskAssessment',
-            '_id', 'created_at', 'updated_at'  # Allow these fields for updates
-        }
+    def validate_cliente_data(data):
+        """The fields of a new client, checked against schema.py; raises ValueError"""
+        return CLIENTE_SCHEMA.validate(data)
 
-        invalid_fields = [field for field in data.keys() if field not in valid_fields]
-        if invalid_fields:
-            raise ValueError(f"Invalid fields provided: {', '.join(invalid_fields)}")
+    @staticmethod
+    def validate_update_data(data):
+        """The fields a requirement update may change, checked against schema.py; raises ValueError"""
+        return REQUIREMENT_UPDATE_SCHEMA.validate(data)
 
     def insert_project_requirement(self, form_data):
         """Insert a new project requirement into the database"""
         try:
             form_data['created_at'] = datetime.utcnow()
             form_data['updated_at'] = datetime.utcnow()
+            form_data.update(search_fields(form_data, REQUIREMENT_SEARCH_FIELDS))
+            # Repeat requestors reuse their client instead of adding a row per submission
+            form_data['cliente_id'] = self._upsert_cliente(self._cliente_from_requirement(form_data))
             
+            form_data['_id'] = ObjectId()
+            self._own_writes.expect(self.collection.name, form_data['_id'])
             # Insert into project requirements collection
             result = self.collection.insert_one(form_data)
-            logger.info(f"Successfully inserted requirement with ID: {result.inserted_id}")
-            
-            # Insert into clients collection
-            client_data = {
-                'nombre': form_data.get('requestorName'),
-                'email': form_data.get('requestorEmail'),
-                'celular': form_data.get('requestorPhone'),
-                'ciudad': form_data.get('department'),
-                'created_at': datetime.utcnow(),
-                'updated_at': datetime.utcnow()
-            }
-            client_result = self.clientes_collection.insert_one(client_data)
-            logger.info(f"Successfully inserted client with ID: {client_result.inserted_id}")
+            self._stats_snapshot.apply(added=form_data)
+            self._invalidate_counts(self.collection, self.clientes_collection)
+            logger.debug("Successfully inserted requirement with ID: %s", result.inserted_id)
             
             return str(result.inserted_id)
         except Exception as e:
             logger.error(f"Error inserting project requirement: {str(e)}")
             raise
 
-    def get_project_requirement(self, requirement_id):
+    @staticmethod
+    def _cliente_from_requirement(form_data):
+        """Build the client document derived from a requirement's requestor, with its _id preassigned"""
+        client_data = {
+            '_id': ObjectId(),
+            'nombre': form_data.get('requestorName'),
+            'email': form_data.get('requestorEmail'),
+            'celular': form_data.get('requestorPhone'),
+            'ciudad': form_data.get('department'),
+            'email_key': normalize_email(form_data.get('requestorEmail')),
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow()
+        }
+        client_data.update(search_fields(client_data, CLIENTE_SEARCH_FIELDS))
+        return client_data
+
+    def _upsert_cliente(self, client_data):
+        """_id of the client with client_data's email key, inserting client_data if there is none"""
+        key = client_data['email_key']
+        if key is None:
+            self.clientes_collection.insert_one(client_data)
+            return client_data['_id']
+        # Existing clients keep their data; the requirement keeps what was submitted
+        cliente = self.clientes_collection.find_one_and_update(
+            {"email_key": key},
+            {"$setOnInsert": {field: value for field, value in client_data.items() if field != 'email_key'}},
+            projection={'_id': 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return cliente['_id']
+
+    def _upsert_clientes(self, clientes):
+        """_upsert_cliente for a batch in one bulk write; returns the client _ids in order"""
+        keyed = {}
+        for cliente in clientes:
+            if cliente['email_key'] is not None:
+                keyed.setdefault(cliente['email_key'], cliente)
+        unkeyed = [cliente for cliente in clientes if cliente['email_key'] is None]
+
+        if keyed:
+            operations = [
+                UpdateOne({"email_key": key},
+                          {"$setOnInsert": {field: value for field, value in cliente.items() if field != 'email_key'}},
+                          upsert=True)
+                for key, cliente in keyed.items()
+            ]
+            try:
+                self.clientes_collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                # Lost upsert races; the winners' rows are read back below
+                logger.warning("Client upsert errors: %d", len(e.details.get('writeErrors', [])))
+        self._insert_many(self.clientes_collection, unkeyed)
+
+        ids = {cliente['email_key']: cliente['_id'] for cliente in
+               self.clientes_collection.find({"email_key": {"$in": list(keyed)}}, {'email_key': 1})}
+        return [ids.get(cliente['email_key']) if cliente['email_key'] is not None else cliente['_id']
+                for cliente in clientes]
+
+    def bulk_import(self, kind, rows, batch_size):
+        """Validate and insert (row_number, row, error) tuples from bulk.read_rows"""
+        try:
+            if kind == 'requirements':
+                report = import_rows(rows, self.validate_requirement_data,
+                                     self.insert_project_requirements_batch, batch_size)
+            elif kind == 'clientes':
+                report = import_rows(rows, self.validate_cliente_data,
+                                     self.insert_clientes_batch, batch_size)
+            else:
+                raise ValueError(f"Unknown import kind: {kind}")
+            logger.info("Bulk import of %s: %d inserted, %d failed", kind, report['inserted'], report['failed'],
+                        extra={'kind': kind, 'inserted': report['inserted'], 'failed': report['failed']})
+            return report
+        except Exception as e:
+            logger.error(f"Error importing {kind}: {str(e)}")
+            raise
+
+    def insert_clientes_batch(self, clientes):
+        """Insert clients with one unordered insert_many; returns (inserted, [(index, error)])"""
+        for cliente in clientes:
+            cliente['created_at'] = datetime.utcnow()
+            cliente['updated_at'] = datetime.utcnow()
+            cliente.update(search_fields(cliente, CLIENTE_SEARCH_FIELDS))
+            cliente['email_key'] = normalize_email(cliente.get('email'))
+        inserted, errors = self._insert_many(self.clientes_collection, clientes)
+        self._invalidate_counts(self.clientes_collection)
+        return inserted, errors
+
+    def insert_project_requirements_batch(self, requirements):
+        """Upsert the batch's clients, then insert the requirements unordered; returns (inserted, [(index, error)])"""
+        for requirement in requirements:
+            requirement['created_at'] = datetime.utcnow()
+            requirement['updated_at'] = datetime.utcnow()
+            requirement.update(search_fields(requirement, REQUIREMENT_SEARCH_FIELDS))
+        cliente_ids = self._upsert_clientes([self._cliente_from_requirement(requirement)
+                                             for requirement in requirements])
+        for requirement, cliente_id in zip(requirements, cliente_ids):
+            requirement['cliente_id'] = cliente_id
+        inserted, errors = self._insert_many(self.collection, requirements)
+
+        self._invalidate_counts(self.collection, self.clientes_collection)
+        self._stats_snapshot.invalidate()
+        return inserted, errors
+
+    @staticmethod
+    def _insert_many(collection, documents):
+        """Unordered insert_many that reports per-document failures instead of raising"""
+        if not documents:
+            return 0, []
+        try:
+            result = collection.insert_many(documents, ordered=False)
+            return len(result.inserted_ids), []
+        except BulkWriteError as e:
+            errors = [(error['index'], error['errmsg']) for error in e.details.get('writeErrors', [])]
+            return e.details.get('nInserted', 0), errors
+
+    @staticmethod
+    def export_fields(kind):
+        """Column order for CSV exports"""
+        if kind == 'requirements':
+            return REQUIREMENT_DOCUMENT_FIELDS
+        if kind == 'clientes':
+            return CLIENTE_DOCUMENT_FIELDS
+        raise ValueError(f"Unknown export kind: {kind}")
+
+    def iter_export(self, kind, batch_size=1000):
+        """Yield every client or requirement straight from a batched cursor"""
+        if kind == 'requirements':
+            collection = self.collection
+        elif kind == 'clientes':
+            collection = self.clientes_collection
+        else:
+            raise ValueError(f"Unknown export kind: {kind}")
+
+        def generate():
+            cursor = collection.find({}, SEARCH_PROJECTION).sort('_id', 1).batch_size(batch_size)
+            try:
+                yield from cursor
+            finally:
+                cursor.close()
+
+        return generate()
+
+    def get_project_requirement(self, requirement_id, fields=ALL):
         """Retrieve a specific project requirement by ID"""
         try:
-            requirement = self.collection.find_one({"_id": ObjectId(requirement_id)})
-            if requirement:
-                return self.serialize_object_id(requirement)
-            return None
+            projection = build_projection(fields, REQUIREMENT_SUMMARY_FIELDS, REQUIREMENT_DOCUMENT_FIELDS,
+                                          ('cliente_id',))
+            requirement = self.collection.find_one({"_id": ObjectId(requirement_id)}, projection)
+            if requirement is not None:
+                self._resolve_clientes([requirement])
+            return requirement
         except Exception as e:
             logger.error(f"Error retrieving project requirement: {str(e)}")
             raise
 
-    def get_all_project_requirements(self, filters=None, sort_by=None, page=1, per_page=10):
-        """Retrieve all project requirements with optional filtering and pagination"""
+    def get_cached_project_requirement(self, requirement_id):
+        """The full requirement as a CachedResponse, or None if it doesn't exist"""
+        key = ('requirement', str(ObjectId(requirement_id)))
+        return self._response_cache.get(key, lambda: self.get_project_requirement(requirement_id),
+                                        tags=requirement_tags)
+
+    def get_all_project_requirements(self, filters=None, sort_by=None, page=1, per_page=10,
+                                     cursor=None, with_total=None, fields=SUMMARY, with_plan=False):
+        """Retrieve all project requirements with optional filtering and pagination.
+
+        ``sort_by`` is {field: direction} for one of the sortable fields in
+        sorting.py; ``with_plan`` adds the chosen sort plan to the result.
+        Passing ``cursor`` (an empty string for the first page) switches to
+        keyset pagination on the sort field plus ``_id``; ``page`` is
+        ignored in that mode. ``with_total`` and ``fields`` behave as in
+        get_all_clientes.
+        """
         try:
             query = filters if filters else {}
-            
-            # Get total count for pagination
-            total_documents = self.collection.count_documents(query)
+            plan = plan_sort(self.collection.name, query, sort_by, Config.SORT_UNINDEXED)
+            logger.debug("Sort plan: %s", plan.index or 'in memory', extra={'sort_plan': plan_to_dict(plan)})
+
+            if cursor is not None:
+                sort_field, direction = plan.sort[0]
+                # The cursor is built from the sort field, so always fetch it
+                projection = build_projection(fields, REQUIREMENT_SUMMARY_FIELDS,
+                                              REQUIREMENT_DOCUMENT_FIELDS, (sort_field, 'cliente_id'))
+                requirements, next_cursor = self._find_page_by_cursor(
+                    self.collection, query, sort_field, direction, per_page, cursor, projection,
+                    allow_disk_use=plan.allow_disk_use
+                )
+                self._resolve_clientes(requirements)
+                result = {
+                    'requirements': requirements,
+                    'per_page': per_page,
+                    'has_more': next_cursor is not None,
+                    'next_cursor': next_cursor
+                }
+                self._add_total(result, self.collection, query, with_total or 'false')
+                if with_plan:
+                    result['sort_plan'] = plan_to_dict(plan)
+                return result
             
             # Calculate skip value for pagination
             skip = (page - 1) * per_page
             
-            # Set up sort parameters
-            sort_params = []
-            if sort_by:
-                for field, direction in sort_by.items():
-                    sort_params.append((field, direction))
-            else:
-                sort_params = [('created_at', -1)]
-            
-            # Execute query with pagination
-            cursor = self.collection.find(query).sort(sort_params).skip(skip).limit(per_page)
-            requirements = [self.serialize_object_id(req) for req in cursor]
+            # Execute query with pagination, fetching one extra row for has_more
+            projection = build_projection(fields, REQUIREMENT_SUMMARY_FIELDS, REQUIREMENT_DOCUMENT_FIELDS,
+                                          ('cliente_id',))
+            cursor = self.collection.find(query, projection).sort(plan.sort).skip(skip).limit(per_page + 1)
+            if plan.allow_disk_use:
+                cursor = cursor.allow_disk_use(True)
+            requirements = list(cursor)
             
-            return {
-                'requirements': requirements,
-                'total': total_documents,
+            result = {
+                'requirements': self._resolve_clientes(requirements[:per_page]),
                 'page': page,
                 'per_page': per_page,
-                'total_pages': -(-total_documents // per_page)  # Ceiling division
+                'has_more': len(requirements) > per_page
             }
+            self._add_total(result, self.collection, query, with_total or 'exact')
+            if with_plan:
+                result['sort_plan'] = plan_to_dict(plan)
+            return result
         except Exception as e:
             logger.error(f"Error retrieving project requirements: {str(e)}")
             raise
@@ -305,27 +747,41 @@ class DatabaseManager:
             if '_id' in update_data:
                 del update_data['_id']
             update_data['updated_at'] = datetime.utcnow()
+            update_data.update(self._search_update(self.collection, REQUIREMENT_SEARCH_FIELDS,
+                                                   {"_id": ObjectId(requirement_id)}, update_data))
             
-            result = self.collection.update_one(
+            self._own_writes.expect(self.collection.name, ObjectId(requirement_id))
+            # Fetch the previous stats fields in the same round trip as the update
+            previous = self.collection.find_one_and_update(
                 {"_id": ObjectId(requirement_id)},
-                {"$set": update_data}
+                {"$set": update_data},
+                projection=dict({field: 1 for field in STATS_FIELDS}, cliente_id=1, created_at=1),
+                return_document=ReturnDocument.BEFORE
             )
             
-            if result.matched_count > 0:
-                logger.info(f"Successfully updated requirement: {requirement_id}")
+            if previous is not None:
+                logger.debug("Successfully updated requirement: %s", requirement_id)
+                self._response_cache.invalidate(('requirement', str(previous['_id'])))
+                current = dict(previous, **{field: update_data[field] for field in STATS_FIELDS if field in update_data})
+                self._stats_snapshot.apply(removed=previous, added=current)
+                if 'created_at' in update_data:
+                    # Moved out of its analytics buckets, which updated_at alone doesn't reveal
+                    self._mark_analytics_dirty(previous.get('created_at'))
                 
-                # Update client information in the clients collection
-                client_data = {
-                    'nombre': update_data.get('requestorName'),
-                    'email': update_data.get('requestorEmail'),
-                    'celular': update_data.get('requestorPhone'),
-                    'ciudad': update_data.get('department'),
-                    'updated_at': datetime.utcnow()
-                }
-                self.clientes_collection.update_one(
-                    {"email": update_data.get('requestorEmail')},
-                    {"$set": client_data}
-                )
+                # Requestor edits go to the referenced client, found by _id so email changes work too
+                client_data = requestor_changes(update_data)
+                if client_data and previous.get('cliente_id') is not None:
+                    client_data['updated_at'] = datetime.utcnow()
+                    if 'email' in client_data:
+                        client_data['email_key'] = normalize_email(client_data['email'])
+                    client_data.update(self._search_update(self.clientes_collection, CLIENTE_SEARCH_FIELDS,
+                                                           {"_id": previous['cliente_id']}, client_data))
+                    try:
+                        self.clientes_collection.update_one({"_id": previous['cliente_id']}, {"$set": client_data})
+                    except DuplicateKeyError:
+                        # The new email belongs to another client; leave both clients as they are
+                        logger.warning(f"Requirement {requirement_id} requestor email is taken by another client")
+                    self._forget_cliente(previous['cliente_id'])
                 
                 return True
             logger.warning(f"No requirement found with ID: {requirement_id}")
@@ -337,9 +793,17 @@ class DatabaseManager:
     def delete_project_requirement(self, requirement_id):
         """Delete a project requirement"""
         try:
-            result = self.collection.delete_one({"_id": ObjectId(requirement_id)})
-            if result.deleted_count > 0:
-                logger.info(f"Successfully deleted requirement: {requirement_id}")
+            self._own_writes.expect(self.collection.name, ObjectId(requirement_id))
+            deleted = self.collection.find_one_and_delete(
+                {"_id": ObjectId(requirement_id)},
+                projection=dict({field: 1 for field in STATS_FIELDS}, created_at=1)
+            )
+            if deleted is not None:
+                self._invalidate_counts(self.collection)
+                self._response_cache.invalidate(('requirement', str(deleted['_id'])))
+                self._stats_snapshot.apply(removed=deleted)
+                self._mark_analytics_dirty(deleted.get('created_at'))
+                logger.debug("Successfully deleted requirement: %s", requirement_id)
                 return True
             logger.warning(f"No requirement found with ID: {requirement_id}")
             return False
@@ -347,61 +811,121 @@ class DatabaseManager:
             logger.error(f"Error deleting project requirement: {str(e)}")
             raise
 
-    def search_requirements(self, search_term):
-        """Search project requirements by various fields"""
+    def search_requirements(self, search_term, limit=SEARCH_DEFAULT_LIMIT, cursor=None, fields=SUMMARY):
+        """Search project requirements by title, requestor, department and description, best matches first"""
         try:
-            query = {
-                "$or": [
-                    {"projectTitle": {"$regex": search_term, "$options": "i"}},
-                    {"description": {"$regex": search_term, "$options": "i"}},
-                    {"requestorName": {"$regex": search_term, "$options": "i"}},
-                    {"department": {"$regex": search_term, "$options": "i"}}
-                ]
-            }
-            
-            cursor = self.collection.find(query)
-            requirements = [self.serialize_object_id(req) for req in cursor]
-            return requirements
+            projection = build_projection(fields, REQUIREMENT_SUMMARY_FIELDS, REQUIREMENT_DOCUMENT_FIELDS,
+                                          ('_score', 'cliente_id'))
+            page = self._search_page(self.collection, REQUIREMENT_SEARCH_FIELDS,
+                                     search_term, limit, cursor, projection)
+            self._resolve_clientes(page['results'])
+            return page
         except Exception as e:
             logger.error(f"Error searching requirements: {str(e)}")
             raise
 
+    def iter_search_requirements(self, search_term, limit=None, batch_size=SEARCH_BATCH_SIZE, fields=SUMMARY):
+        """Yield matching project requirements one by one straight from the database cursor"""
+        projection = build_projection(fields, REQUIREMENT_SUMMARY_FIELDS, REQUIREMENT_DOCUMENT_FIELDS,
+                                      ('cliente_id',))
+        documents = self._iter_search(self.collection, REQUIREMENT_SEARCH_FIELDS,
+                                      search_term, limit, batch_size, projection)
+        return self._iter_resolved(documents, batch_size)
+
     def get_requirements_stats(self):
-        """Get statistics about project requirements"""
+        """Get statistics about project requirements from the cached snapshot"""
         try:
-            stats = {
-                'total_requirements': self.collection.count_documents({}),
-                'status_counts': {},
-                'priority_counts': {},
-                'department_counts': {}
-            }
-            
-            # Status counts
-            status_pipeline = [
-                {"$group": {"_id": "$status", "count": {"$sum": 1}}}
-            ]
-            status_results = list(self.collection.aggregate(status_pipeline))
-            stats['status_counts'] = {item['_id']: item['count'] for item in status_results}
-            
-            # Priority counts
-            priority_pipeline = [
-                {"$group": {"_id": "$priority", "count": {"$sum": 1}}}
-            ]
-            priority_results = list(self.collection.aggregate(priority_pipeline))
-            stats['priority_counts'] = {item['_id']: item['count'] for item in priority_results}
-            
-            # Department counts
-            department_pipeline = [
-                {"$group": {"_id": "$department", "count": {"$sum": 1}}}
-            ]
-            department_results = list(self.collection.aggregate(department_pipeline))
-            stats['department_counts'] = {item['_id']: item['count'] for item in department_results}
-            
-            return stats
+            return self._stats_snapshot.get(self._load_requirements_stats)
         except Exception as e:
             logger.error(f"Error getting requirements statistics: {str(e)}")
             raise
 
+    def _load_requirements_stats(self):
+        """Compute the total and every breakdown in a single $facet aggregation"""
+        facet = next(self.collection.aggregate(STATS_PIPELINE))
+        return stats_from_facet(facet)
+
+    def get_requirements_analytics(self, granularity, dimension, start, end, max_age=None):
+        """Bucketed series from the analytics rollup, refreshing it first when older than max_age seconds"""
+        try:
+            state = self.analytics_collection.find_one({'_id': REFRESH_STATE_ID}, {'refreshed_at': 1}) or {}
+            refreshed_at = state.get('refreshed_at')
+            if max_age is not None and (refreshed_at is None
+                                        or refreshed_at < datetime.utcnow() - timedelta(seconds=max_age)):
+                # Busy or failing, the refresh leaves readers the current rollup
+                try:
+                    refreshed_at = self.refresh_requirements_analytics().get('refreshed_at', refreshed_at)
+                except Exception as e:
+                    logger.warning(f"Serving stale analytics: {str(e)}")
+            buckets = self.analytics_collection.find(series_query(granularity, dimension, start, end))
+            return {
+                'granularity': granularity,
+                'dimension': dimension,
+                'from': start,
+                'to': end,
+                'refreshed_at': refreshed_at,
+                'series': series_from_buckets(buckets.sort('_id.bucket', 1))
+            }
+        except Exception as e:
+            logger.error(f"Error getting requirements analytics: {str(e)}")
+            raise
+
+    def refresh_requirements_analytics(self, full=False):
+        """Recompute the analytics buckets changed since the last refresh, see analytics.py"""
+        try:
+            now = datetime.utcnow()
+            try:
+                state = self.analytics_collection.find_one_and_update(
+                    lease_query(now), {'$set': {'lease_until': now + REFRESH_LEASE}},
+                    upsert=True, return_document=ReturnDocument.BEFORE
+                ) or {}
+            except DuplicateKeyError:
+                # The state exists but another refresh holds the lease
+                return {'status': 'busy'}
+
+            try:
+                oldest_changed = None
+                if state.get('refreshed_at') and not full:
+                    changed = list(self.collection.aggregate(oldest_change_pipeline(state['refreshed_at'])))
+                    oldest_changed = changed[0]['oldest'] if changed else None
+                start, work = refresh_start(state, oldest_changed, full)
+                report = {'status': 'refreshed' if work else 'unchanged', 'since': start, 'removed': 0}
+                if work:
+                    refresh_id = new_refresh_id()
+                    for granularity in GRANULARITIES:
+                        first_bucket = bucket_start(start, granularity) if start else None
+                        for dimension in DIMENSIONS:
+                            self.collection.aggregate(rollup_pipeline(granularity, dimension, first_bucket, refresh_id))
+                        report['removed'] += self.analytics_collection.delete_many(
+                            stale_buckets_filter(granularity, first_bucket, refresh_id)
+                        ).deleted_count
+            except Exception:
+                self.analytics_collection.update_one({'_id': REFRESH_STATE_ID}, {'$unset': {'lease_until': ''}})
+                raise
+
+            # A dirty_since recorded while we ran is newer than the one we read and stays
+            self.analytics_collection.update_one({'_id': REFRESH_STATE_ID, 'dirty_since': state.get('dirty_since')},
+                                                 {'$unset': {'dirty_since': ''}})
+            self.analytics_collection.update_one({'_id': REFRESH_STATE_ID},
+                                                 {'$set': {'refreshed_at': now}, '$unset': {'lease_until': ''}})
+            report['refreshed_at'] = now
+            logger.info("Requirements analytics %s", report['status'], extra={'removed': report['removed']})
+            return report
+        except Exception as e:
+            logger.error(f"Error refreshing requirements analytics: {str(e)}")
+            raise
+
+    def _mark_analytics_dirty(self, created_at):
+        """Have the next analytics refresh recompute from created_at's buckets"""
+        if not isinstance(created_at, datetime):
+            return
+        try:
+            self.analytics_collection.update_one({'_id': REFRESH_STATE_ID},
+                                                 {'$min': {'dirty_since': created_at}}, upsert=True)
+        except Exception as e:
+            # The requirement write succeeded; a full refresh repairs the rollup
+            logger.warning(f"Error marking analytics for refresh: {str(e)}")
+
     def get_user_by_username(self, username):
         """Retrieve a user by username"""
         try:
@@ -413,18 +937,56 @@ class DatabaseManager:
             logger.error(f"Error retrieving user: {str(e)}")
             raise
 
-    def get_user_by_id(self, user_id):
-        """Retrieve a user by ID"""
+    def get_user_by_email(self, email):
+        """Retrieve a user by email"""
         try:
-            user = self.users_collection.find_one({"_id": ObjectId(user_id)})
+            user = self.users_collection.find_one({"email": email})
             if user:
                 return self.serialize_object_id(user)
             return None
         except Exception as e:
             logger.error(f"Error retrieving user: {str(e)}")
             raise
+
+    def get_user_by_id(self, user_id):
+        """Retrieve a user by ID, served from the user cache when possible"""
+        try:
+            user = self._user_cache.get(str(user_id))
+            if user is None:
+                user = self.users_collection.find_one({"_id": ObjectId(user_id)}, {"password": 0})
+                if not user:
+                    return None
+                user = self.serialize_object_id(user)
+                self._user_cache.set(str(user_id), user)
+            return dict(user)
+        except Exception as e:
+            logger.error(f"Error retrieving user: {str(e)}")
+            raise
     
     
+    def hash_password(self, password):
+        """Salted hash of password for storing; raises HashingBusy when saturated"""
+        return password_hasher.hash(password)
+
     def verify_password(self, stored_password, provided_password):
         """Verify a stored password against one provided by the user"""
-        return stored_password == provided_password
\ No newline at end of file
+        matches, _ = password_hasher.verify(stored_password, provided_password)
+        return matches
+
+    def check_user_password(self, user, provided_password):
+        """verify_password for a stored user, upgrading a plaintext or outdated hash on success"""
+        matches, new_hash = password_hasher.verify(user['password'], provided_password)
+        if matches and new_hash:
+            try:
+                # Only replace the value that was verified, not a concurrent change
+                self.users_collection.update_one(
+                    {"_id": ObjectId(user['_id']), "password": user['password']},
+                    {"$set": {"password": new_hash}}
+                )
+            except Exception as e:
+                logger.warning(f"Error upgrading password hash: {str(e)}")
+        return matches
+
+
+if Config.METRICS_ENABLED:
+    instrument(DatabaseManager)
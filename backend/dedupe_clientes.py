@@ -0,0 +1,147 @@
+"""Merge duplicate clients that share a normalized email.
+
+Usage (from backend/):
+
+    python dedupe_clientes.py merge --dry-run
+    python dedupe_clientes.py merge --batch-size 500
+
+Clients written before ``email_key`` existed get it first. Each group of
+clients with the same key then collapses into its oldest client: fields it
+lacks are filled from the newest duplicate that has them, requirements that
+reference a duplicate are re-pointed, and the duplicates are deleted. Work
+is committed every ``--batch-size`` groups, requirements before clients, so
+an interrupted run leaves no dangling references and can be restarted.
+
+Prints a JSON report with the groups merged, clients removed and the
+collection's document count and data size before and after. Once it has
+run, ``python indexes.py ensure`` can build the unique email_key index.
+"""
+import argparse
+import json
+import logging
+from pymongo import DeleteMany, UpdateMany, UpdateOne
+
+from database import CLIENTE_FIELDS, DatabaseManager
+from references import normalize_email
+from search import CLIENTE_SEARCH_FIELDS, search_fields
+
+logger = logging.getLogger(__name__)
+
+# Groups oldest first; the fallback key only matters for --dry-run, before keys are backfilled
+DUPLICATES_PIPELINE = [
+    {'$sort': {'_id': 1}},
+    {'$project': {'key': {'$ifNull': ['$email_key', {'$toLower': {'$trim': {'input': '$email'}}}]}}},
+    {'$match': {'key': {'$type': 'string', '$ne': ''}}},
+    {'$group': {'_id': '$key', 'ids': {'$push': '$_id'}}},
+    {'$match': {'ids.1': {'$exists': True}}}
+]
+
+
+def backfill_keys(clientes, batch_size=1000, dry_run=False):
+    """Set email_key on clients that predate it; returns how many needed it"""
+    operations, count = [], 0
+    for cliente in clientes.find({'email_key': {'$exists': False}}, {'email': 1}):
+        operations.append(UpdateOne({'_id': cliente['_id']},
+                                    {'$set': {'email_key': normalize_email(cliente.get('email'))}}))
+        count += 1
+        if len(operations) >= batch_size:
+            if not dry_run:
+                clientes.bulk_write(operations, ordered=False)
+            operations = []
+    if operations and not dry_run:
+        clientes.bulk_write(operations, ordered=False)
+    return count
+
+
+def merged_fields(survivor, duplicates):
+    """Fields the survivor lacks, taken from the newest duplicate that has them"""
+    fields = {}
+    for field in CLIENTE_FIELDS:
+        if survivor.get(field):
+            continue
+        for duplicate in reversed(duplicates):
+            if duplicate.get(field):
+                fields[field] = duplicate[field]
+                break
+    if fields:
+        fields.update(search_fields(dict(survivor, **fields), CLIENTE_SEARCH_FIELDS))
+    return fields
+
+
+def merge_groups(db_manager, groups, dry_run=False):
+    """Collapse one batch of [oldest_id, duplicate_id, ...] groups; returns (removed, repointed)"""
+    clientes = db_manager.clientes_collection
+    all_ids = [cliente_id for ids in groups for cliente_id in ids]
+    documents = {cliente['_id']: cliente for cliente in
+                 clientes.find({'_id': {'$in': all_ids}}, {field: 1 for field in CLIENTE_FIELDS})}
+
+    cliente_operations, requirement_operations, removed = [], [], 0
+    for ids in groups:
+        survivor, duplicates = ids[0], ids[1:]
+        fields = merged_fields(documents.get(survivor, {}),
+                               [documents[cliente_id] for cliente_id in duplicates if cliente_id in documents])
+        if fields:
+            cliente_operations.append(UpdateOne({'_id': survivor}, {'$set': fields}))
+        requirement_operations.append(UpdateMany({'cliente_id': {'$in': duplicates}},
+                                                 {'$set': {'cliente_id': survivor}}))
+        cliente_operations.append(DeleteMany({'_id': {'$in': duplicates}}))
+        removed += len(duplicates)
+
+    if dry_run:
+        return removed, db_manager.collection.count_documents(
+            {'cliente_id': {'$in': [cliente_id for ids in groups for cliente_id in ids[1:]]}})
+    repointed = db_manager.collection.bulk_write(requirement_operations, ordered=False).modified_count
+    clientes.bulk_write(cliente_operations, ordered=False)
+    return removed, repointed
+
+
+def collection_size(db, name):
+    """Uncompressed data size in bytes, or None where collStats is unavailable"""
+    try:
+        return db.command('collStats', name).get('size')
+    except Exception:
+        return None
+
+
+def dedupe(db_manager, batch_size=500, dry_run=False):
+    """Backfill keys, then merge every duplicate group; returns the report"""
+    clientes = db_manager.clientes_collection
+    report = {
+        'dry_run': dry_run,
+        'count_before': clientes.count_documents({}),
+        'size_before': collection_size(db_manager.db, clientes.name),
+        'keys_backfilled': backfill_keys(clientes, dry_run=dry_run),
+        'groups': 0,
+        'removed': 0,
+        'requirements_repointed': 0
+    }
+
+    # Materialize the groups first: merging deletes documents the aggregation would still be reading
+    groups = [group['ids'] for group in clientes.aggregate(DUPLICATES_PIPELINE, allowDiskUse=True)]
+    for offset in range(0, len(groups), batch_size):
+        batch = groups[offset:offset + batch_size]
+        removed, repointed = merge_groups(db_manager, batch, dry_run)
+        report['groups'] += len(batch)
+        report['removed'] += removed
+        report['requirements_repointed'] += repointed
+        logger.info("Merged %d duplicate groups", report['groups'], extra={'removed': report['removed']})
+
+    report['count_after'] = report['count_before'] - report['removed'] if dry_run else clientes.count_documents({})
+    report['size_after'] = None if dry_run else collection_size(db_manager.db, clientes.name)
+    if report['count_before']:
+        report['shrunk_pct'] = round(100 * (1 - report['count_after'] / report['count_before']), 1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge duplicate KodEstudio clients")
+    parser.add_argument('command', choices=['merge'])
+    parser.add_argument('--batch-size', type=int, default=500, help="Duplicate groups per write batch")
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    print(json.dumps(dedupe(DatabaseManager(), args.batch_size, args.dry_run)))
+
+
+if __name__ == '__main__':
+    main()
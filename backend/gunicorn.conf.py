@@ -0,0 +1,16 @@
+# gunicorn -c gunicorn.conf.py wsgi:app
+# Every value can be tuned through the environment, see config.Config.
+from config import Config
+
+bind = Config.BIND
+workers = Config.WEB_WORKERS
+threads = Config.WEB_THREADS
+worker_class = 'gthread'
+
+# The app is imported once in the master; DatabaseManager opens its
+# MongoClient lazily per process, so workers never share sockets.
+preload_app = True
+
+# Recycle workers periodically to bound memory growth
+max_requests = 10000
+max_requests_jitter = 1000
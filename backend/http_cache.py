@@ -0,0 +1,99 @@
+"""Encoded responses for read-mostly endpoints, with ETag/Last-Modified validators.
+
+Entries hold the JSON body exactly as it is sent, so a hit costs neither a
+query nor an encode, and a matching If-None-Match costs only a 304. Writers
+call ``invalidate`` for the keys they touch, or ``invalidate_tag`` for the
+entries built from a document they touch (e.g. the requirements embedding a
+client); ``ttl`` bounds staleness from writes made by other processes or
+outside the API.
+"""
+import hashlib
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from cache import TTLCache
+from json_provider import dumps_bytes
+
+# tags: what the body was built from, for invalidate_tag
+CachedResponse = namedtuple('CachedResponse', ['body', 'etag', 'last_modified', 'tags'], defaults=((),))
+
+
+class ResponseCache:
+    """TTL/LRU cache of CachedResponse entries that loads each key once at a time"""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        # Bumped by every invalidation so a load racing a write is not stored
+        self._generation = 0
+
+    def get(self, key, loader, tags=None):
+        """Return the entry for key, calling loader() on a miss; None if loader returns None
+
+        tags(value), if given, names what the loaded value was built from.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+
+        # A burst of misses on one key runs a single query
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    generation = self._generation
+                    value = loader()
+                    if value is None:
+                        return None
+                    entry = self._encode(value, tags)
+                    with self._lock:
+                        if generation == self._generation:
+                            self._entries.set(key, entry)
+            return entry
+        finally:
+            with self._lock:
+                self._key_locks.pop(key, None)
+
+    async def aget(self, key, loader, tags=None):
+        """get() for coroutine loaders; concurrent misses on one key may each load"""
+        entry = self._entries.get(key)
+        if entry is None:
+            generation = self._generation
+            value = await loader()
+            if value is None:
+                return None
+            entry = self._encode(value, tags)
+            with self._lock:
+                if generation == self._generation:
+                    self._entries.set(key, entry)
+        return entry
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            self._entries.delete(key)
+
+    def invalidate_tag(self, tag):
+        """Drop every entry built from tag"""
+        with self._lock:
+            self._generation += 1
+            self._entries.delete_where(lambda entry: tag in entry.tags)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    @staticmethod
+    def _encode(value, tags=None):
+        body = dumps_bytes(value) + b'\n'
+        return CachedResponse(
+            body=body,
+            etag=hashlib.blake2b(body, digest_size=16).hexdigest(),
+            last_modified=datetime.now(timezone.utc).replace(microsecond=0),
+            tags=tuple(tags(value)) if tags else ()
+        )
@@ -0,0 +1,168 @@
+"""Declarative index registry for the KodEstudio database.
+
+Run ``python indexes.py ensure`` to create the registered indexes and
+``python indexes.py report`` to list the registered queries whose winning
+plan still contains a collection scan.
+"""
+import argparse
+import json
+import logging
+from collections import namedtuple
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+IndexSpec = namedtuple('IndexSpec', ['collection', 'keys', 'options'])
+QuerySpec = namedtuple('QuerySpec', ['name', 'collection', 'filter', 'sort'])
+
+INDEXES = [
+    # Login and register look users up by username
+    IndexSpec('Usuarios', [('username', ASCENDING)], {'name': 'username_unique', 'unique': True}),
+    # One client per normalized email; requirement submissions upsert on it.
+    # Fails until dedupe_clientes.py has merged existing duplicates.
+    IndexSpec('Clientes', [('email_key', ASCENDING)],
+              {'name': 'email_key_unique', 'unique': True,
+               'partialFilterExpression': {'email_key': {'$type': 'string'}}}),
+    # Keyword search over the derived search arrays (see search.py)
+    IndexSpec('Clientes', [('search_keywords', ASCENDING)], {'name': 'search_keywords'}),
+    IndexSpec('Solicitudes', [('search_keywords', ASCENDING)], {'name': 'search_keywords'}),
+    # The sortable list orders (see sorting.py), led by the filters each one serves and
+    # ending in _id, the tie-breaker every page sorts on
+    IndexSpec('Solicitudes', [('created_at', DESCENDING), ('_id', DESCENDING)], {'name': 'created_at_id'}),
+    IndexSpec('Solicitudes', [('status', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+              {'name': 'status_created_at_id'}),
+    IndexSpec('Solicitudes', [('priority', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+              {'name': 'priority_created_at_id'}),
+    IndexSpec('Solicitudes', [('department', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+              {'name': 'department_created_at_id'}),
+    # Also the change feed's fallback poller (see changes.py)
+    IndexSpec('Solicitudes', [('updated_at', DESCENDING), ('_id', DESCENDING)], {'name': 'updated_at_id'}),
+    IndexSpec('Solicitudes', [('status', ASCENDING), ('updated_at', DESCENDING), ('_id', DESCENDING)],
+              {'name': 'status_updated_at_id'}),
+    IndexSpec('Solicitudes', [('requestedEndDate', ASCENDING), ('_id', ASCENDING)],
+              {'name': 'requested_end_date_id'}),
+    IndexSpec('Solicitudes', [('status', ASCENDING), ('requestedEndDate', ASCENDING), ('_id', ASCENDING)],
+              {'name': 'status_requested_end_date_id'}),
+    IndexSpec('Clientes', [('updated_at', ASCENDING), ('_id', ASCENDING)], {'name': 'updated_at_id'}),
+    # /api/requirements/analytics series (see analytics.py)
+    IndexSpec('RequirementAnalytics', [('_id.granularity', ASCENDING), ('_id.dimension', ASCENDING),
+                                       ('_id.bucket', ASCENDING)], {'name': 'series'}),
+    # Drop idle rate limit buckets once they would be full again (see admission.py)
+    IndexSpec('RateLimits', [('expires_at', ASCENDING)], {'name': 'expires_at_ttl', 'expireAfterSeconds': 0}),
+]
+
+# Superseded by the registry; ensure_indexes drops them once their collection's indexes are built
+RETIRED_INDEXES = [
+    ('Solicitudes', 'created_at'),
+    ('Solicitudes', 'status_created_at'),
+    ('Solicitudes', 'priority_created_at'),
+    ('Solicitudes', 'department_created_at'),
+    ('Solicitudes', 'updated_at'),
+    ('Clientes', 'updated_at'),
+]
+
+QUERIES = [
+    QuerySpec('get_user_by_username', 'Usuarios', {'username': ''}, None),
+    QuerySpec('requirement client upsert', 'Clientes', {'email_key': ''}, None),
+    QuerySpec('search clientes', 'Clientes', {'search_keywords': {'$in': ['nombre:a', 'email:a', 'ciudad:a']}}, None),
+    QuerySpec('search requirements', 'Solicitudes', {'search_keywords': 'projectTitle:a'}, None),
+    QuerySpec('list requirements', 'Solicitudes', {}, [('created_at', DESCENDING), ('_id', DESCENDING)]),
+    QuerySpec('list requirements by status', 'Solicitudes', {'status': ''},
+              [('created_at', DESCENDING), ('_id', DESCENDING)]),
+    QuerySpec('list requirements by priority', 'Solicitudes', {'priority': ''},
+              [('created_at', DESCENDING), ('_id', DESCENDING)]),
+    QuerySpec('list requirements by department', 'Solicitudes', {'department': ''},
+              [('created_at', DESCENDING), ('_id', DESCENDING)]),
+    QuerySpec('list requirements by updated_at', 'Solicitudes', {'status': ''},
+              [('updated_at', DESCENDING), ('_id', DESCENDING)]),
+    QuerySpec('list requirements by requestedEndDate', 'Solicitudes', {'status': ''},
+              [('requestedEndDate', ASCENDING), ('_id', ASCENDING)]),
+    QuerySpec('analytics series', 'RequirementAnalytics',
+              {'_id.granularity': 'week', '_id.dimension': 'department', '_id.bucket': {'$gte': datetime(2024, 1, 1)}},
+              [('_id.bucket', ASCENDING)]),
+    QuerySpec('change poll requirements', 'Solicitudes', {'updated_at': {'$gt': datetime(2024, 1, 1)}},
+              [('updated_at', ASCENDING), ('_id', ASCENDING)]),
+    QuerySpec('change poll clientes', 'Clientes', {'updated_at': {'$gt': datetime(2024, 1, 1)}},
+              [('updated_at', ASCENDING), ('_id', ASCENDING)]),
+]
+
+
+def ensure_indexes(db, indexes=INDEXES, retired=RETIRED_INDEXES):
+    """Create every registered index, then drop the retired ones it replaces"""
+    created, failed = [], set()
+    for spec in indexes:
+        try:
+            name = db[spec.collection].create_index(spec.keys, **spec.options)
+            created.append(f"{spec.collection}.{name}")
+        except OperationFailure as e:
+            # e.g. duplicate usernames blocking the unique index; keep going
+            failed.add(spec.collection)
+            logger.error(f"Error creating index {spec.options.get('name')} on {spec.collection}: {str(e)}")
+    logger.info(f"Ensured {len(created)} of {len(indexes)} indexes")
+    drop_retired_indexes(db, [(collection, name) for collection, name in retired if collection not in failed])
+    return created
+
+
+def drop_retired_indexes(db, retired):
+    """Drop each (collection, name) index that still exists"""
+    for collection, name in retired:
+        try:
+            if name in db[collection].index_information():
+                db[collection].drop_index(name)
+                logger.info(f"Dropped retired index {name} on {collection}")
+        except OperationFailure as e:
+            logger.error(f"Error dropping index {name} on {collection}: {str(e)}")
+
+
+def _plan_stages(plan):
+    """Collect every stage name in an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.append(plan['stage'])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+def scan_report(db, queries=QUERIES):
+    """Explain each registered query and flag the ones that still scan the collection"""
+    report = []
+    for spec in queries:
+        cursor = db[spec.collection].find(spec.filter)
+        if spec.sort:
+            cursor = cursor.sort(spec.sort)
+        winning_plan = cursor.explain().get('queryPlanner', {}).get('winningPlan', {})
+        stages = _plan_stages(winning_plan)
+        report.append({
+            'query': spec.name,
+            'collection': spec.collection,
+            'stages': stages,
+            'collection_scan': 'COLLSCAN' in stages,
+            'in_memory_sort': 'SORT' in stages
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage KodEstudio MongoDB indexes")
+    parser.add_argument('command', choices=['ensure', 'report'])
+    args = parser.parse_args()
+
+    from database import DatabaseManager
+    db = DatabaseManager().db
+
+    if args.command == 'ensure':
+        for name in ensure_indexes(db):
+            print(name)
+    else:
+        print(json.dumps(scan_report(db), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""JSON encoding for API responses.
+
+ObjectId, Decimal128 and datetime values are handled by the encoder itself,
+so documents can be returned exactly as the driver decoded them instead of
+being rewritten field by field first. orjson is used when it is installed
+(``pip install orjson``); otherwise the standard library does the same job
+more slowly.
+
+Datetimes are written as ISO 8601. The database stores naive UTC values, so
+naive datetimes are marked ``+00:00``.
+"""
+import json
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+
+def default(value):
+    """Encode the BSON and Python types the JSON libraries don't know"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        # orjson encodes datetimes natively; this is the stdlib fallback
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj):
+    """Serialize obj to UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, default=default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask/Quart JSON provider backed by dumps_bytes"""
+
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Callers asking for indent, sort_keys... get the stdlib encoder
+            kwargs.setdefault('default', default)
+            return json.dumps(obj, **kwargs)
+        return dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
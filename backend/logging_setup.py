@@ -0,0 +1,144 @@
+"""Structured, non-blocking logging for the API processes.
+
+Request threads only put records on an in-memory queue; a QueueListener
+thread formats them and writes to stderr. Settings come from Config:
+
+* ``LOG_LEVEL``: root level, e.g. ``INFO``.
+* ``LOG_LEVELS``: per-module overrides, e.g. ``database=WARNING,pymongo=ERROR``.
+* ``LOG_FORMAT``: ``json`` (one object per line) or ``text``.
+* ``LOG_DEBUG_SAMPLE_RATE``: fraction of DEBUG records kept, so debug logging
+  can be left on in production without a line per request.
+
+Log with %-style arguments (``logger.debug("query: %s", query)``) so nothing
+is formatted when the level is disabled, and pass structured fields through
+``extra``; they become keys of the JSON object.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+
+from config import Config
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+_listener = None
+_lock = threading.Lock()
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record with the ``extra`` fields inlined"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a random ``rate`` fraction of records at or below ``level``"""
+
+    def __init__(self, rate, level=logging.DEBUG):
+        super().__init__()
+        self.rate = rate
+        self.level = level
+
+    def filter(self, record):
+        return record.levelno > self.level or random.random() < self.rate
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock prepare() runs the full formatter on the calling thread. Here
+    only the message is merged with its args (so they can't change before the
+    listener reads them); JSON encoding and timestamps happen on the listener.
+    """
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_levels(spec):
+    """'database=WARNING,pymongo=ERROR' -> {'database': 'WARNING', 'pymongo': 'ERROR'}"""
+    levels = {}
+    for item in (spec or '').split(','):
+        if not item.strip():
+            continue
+        name, _, level = item.partition('=')
+        if not level:
+            raise ValueError(f"Invalid log level override: {item!r}")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(config=Config):
+    """Route all logging through a background writer; safe to call more than once"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+
+        output = logging.StreamHandler()
+        if config.LOG_FORMAT == 'json':
+            output.setFormatter(JSONFormatter())
+        else:
+            output.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+        handler = _QueueHandler(queue.SimpleQueue())
+        handler.addFilter(SamplingFilter(config.LOG_DEBUG_SAMPLE_RATE))
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(config.LOG_LEVEL.upper())
+        for name, level in parse_levels(config.LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        # Flush whatever is still queued when the process exits
+        atexit.register(_stop_listener)
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def _restart_listener_in_child():
+    """Forked workers (gunicorn preload_app) don't inherit the writer thread"""
+    global _listener
+    if _listener is None:
+        return
+    handler = next(h for h in logging.getLogger().handlers if isinstance(h, _QueueHandler))
+    handler.queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+os.register_at_fork(after_in_child=_restart_listener_in_child)
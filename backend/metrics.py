@@ -0,0 +1,249 @@
+"""In-process request, database and connection-pool metrics in Prometheus text format.
+
+Recording is a lock and a few integer increments per observation; the text
+is only rendered when /metrics is scraped. Each worker process keeps its own
+registry, so with several gunicorn workers a scrape sees the worker that
+served it; scrape workers individually or run one per container.
+
+Sources:
+
+* ``http_*``: per-route counters and latency, recorded by the app hooks.
+* ``http_requests_shed_total``: 429/503 answers from admission control.
+* ``auth_*``: the token_required user lookup.
+* ``db_call_*``: every public DatabaseManager method (see ``instrument``).
+* ``mongo_command_*``: PyMongo command monitoring, by collection and command.
+* ``mongo_pool_*``: time spent waiting for a pooled connection.
+* ``change_feed_*``: changes published by the change feed (see changes.py).
+"""
+import bisect
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            lines.append(f'{self.name}{_labels(self.labelnames, labels)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (last is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {total}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+def render():
+    """The whole registry in Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP requests by route and status',
+                        ('method', 'route', 'status'))
+HTTP_DURATION = Histogram('http_request_duration_seconds', 'Time to produce the response headers',
+                          ('method', 'route'))
+REQUESTS_SHED = Counter('http_requests_shed_total', 'Requests turned away by admission control',
+                        ('route', 'reason'))
+AUTH_DURATION = Histogram('auth_duration_seconds', 'token_required JWT decode and user lookup')
+DB_CALL_DURATION = Histogram('db_call_duration_seconds', 'DatabaseManager method latency', ('method',))
+DB_CALL_ERRORS = Counter('db_call_errors_total', 'DatabaseManager calls that raised', ('method',))
+MONGO_COMMAND_DURATION = Histogram('mongo_command_duration_seconds', 'MongoDB command round trips',
+                                   ('collection', 'command'))
+MONGO_COMMAND_FAILURES = Counter('mongo_command_failures_total', 'MongoDB commands that failed',
+                                 ('collection', 'command'))
+MONGO_POOL_WAIT = Histogram('mongo_pool_wait_seconds', 'Time waiting to check out a pooled connection')
+MONGO_POOL_CHECKOUT_FAILURES = Counter('mongo_pool_checkout_failures_total',
+                                       'Connection checkouts that failed', ('reason',))
+CHANGE_EVENTS = Counter('change_feed_events_total', 'Changes published on the change bus',
+                        ('collection', 'operation'))
+
+
+def observe_request(method, route, status, seconds):
+    HTTP_REQUESTS.inc(method, route, status)
+    HTTP_DURATION.observe(seconds, method, route)
+
+
+def instrument(cls):
+    """Time every public method of cls into db_call_duration_seconds.
+
+    Generator-returning methods are timed until the generator is created,
+    not until it is exhausted.
+    """
+    for name, attribute in list(vars(cls).items()):
+        if name.startswith('_') or not callable(attribute) or isinstance(attribute, (staticmethod, classmethod)):
+            continue
+        setattr(cls, name, _timed(attribute, name))
+    return cls
+
+
+def _timed(method, label):
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            except Exception:
+                DB_CALL_ERRORS.inc(label)
+                raise
+            finally:
+                DB_CALL_DURATION.observe(time.perf_counter() - started, label)
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except Exception:
+            DB_CALL_ERRORS.inc(label)
+            raise
+        finally:
+            DB_CALL_DURATION.observe(time.perf_counter() - started, label)
+    return wrapper
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Times each command by the collection it targets"""
+
+    def __init__(self):
+        # (connection, request_id) -> collection; entries live for one round trip
+        self._pending = {}
+
+    def started(self, event):
+        command = event.command
+        target = command.get('collection') if event.command_name == 'getMore' else command.get(event.command_name)
+        self._pending[(event.connection_id, event.request_id)] = target if isinstance(target, str) else ''
+
+    def succeeded(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), '')
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, collection, event.command_name)
+
+    def failed(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), '')
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, collection, event.command_name)
+        MONGO_COMMAND_FAILURES.inc(collection, event.command_name)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Records how long checkouts wait for a free connection"""
+
+    def __init__(self):
+        # Drivers before 4.7 don't report the duration; time it per thread
+        self._local = threading.local()
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        duration = getattr(event, 'duration', None)
+        if duration is None:
+            duration = time.perf_counter() - getattr(self._local, 'started', time.perf_counter())
+        MONGO_POOL_WAIT.observe(duration)
+
+    def connection_check_out_failed(self, event):
+        MONGO_POOL_CHECKOUT_FAILURES.inc(event.reason)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+
+def mongo_event_listeners():
+    """Listeners to pass as MongoClient(event_listeners=...)"""
+    return [CommandMetrics(), PoolMetrics()]
@@ -0,0 +1,70 @@
+"""Backfill ``cliente_id`` on requirements created before client references.
+
+Run ``python migrate_clientes.py backfill`` once after deploying; it is safe
+to re-run and to run while the API is serving. Each requirement without a
+reference is linked to the client with its normalized requestorEmail, or to
+a new client built from its requestor fields when there is none; run
+``dedupe_clientes.py merge`` first so existing clients carry the key.
+``--dry-run`` only reports how many requirements would be linked.
+"""
+import argparse
+import json
+import logging
+from pymongo import UpdateOne
+
+from database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+REQUESTOR_PROJECTION = {'requestorName': 1, 'requestorEmail': 1, 'requestorPhone': 1, 'department': 1}
+
+
+def _batches(cursor, batch_size):
+    batch = []
+    for document in cursor:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def backfill(db_manager, batch_size=1000, dry_run=False):
+    """Link unreferenced requirements to clients in batches; returns the counts"""
+    requirements = db_manager.collection
+    clientes_before = db_manager.clientes_collection.count_documents({})
+    counts = {'linked': 0, 'created_clientes': 0}
+
+    pending = requirements.find({'cliente_id': {'$exists': False}}, REQUESTOR_PROJECTION)
+    for batch in _batches(pending.sort('_id', 1).batch_size(batch_size), batch_size):
+        counts['linked'] += len(batch)
+        if dry_run:
+            continue
+        # The same upsert new submissions use
+        cliente_ids = db_manager._upsert_clientes([DatabaseManager._cliente_from_requirement(requirement)
+                                                   for requirement in batch])
+        # Leave requirements linked concurrently by the API alone
+        operations = [UpdateOne({'_id': requirement['_id'], 'cliente_id': {'$exists': False}},
+                                {'$set': {'cliente_id': cliente_id}})
+                      for requirement, cliente_id in zip(batch, cliente_ids)]
+        requirements.bulk_write(operations, ordered=False)
+        logger.info("Backfilled %d requirements", counts['linked'], extra={'linked': counts['linked']})
+
+    if not dry_run:
+        counts['created_clientes'] = db_manager.clientes_collection.count_documents({}) - clientes_before
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate KodEstudio requirements to client references")
+    parser.add_argument('command', choices=['backfill'])
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    print(json.dumps(backfill(DatabaseManager(), args.batch_size, args.dry_run)))
+
+
+if __name__ == '__main__':
+    main()
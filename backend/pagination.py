@@ -0,0 +1,66 @@
+import base64
+import binascii
+from bson import json_util
+
+
+def encode_cursor(sort_field, direction, document):
+    """Build an opaque cursor pointing just after the given document"""
+    payload = {
+        'f': sort_field,
+        'd': direction,
+        'v': document.get(sort_field),
+        'id': document['_id']
+    }
+    raw = json_util.dumps(payload).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a cursor produced by encode_cursor, raising ValueError if malformed"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError, binascii.Error, UnicodeError):
+        raise ValueError("Invalid pagination cursor")
+
+    if not isinstance(payload, dict) or not {'f', 'd', 'v', 'id'} <= payload.keys():
+        raise ValueError("Invalid pagination cursor")
+    return payload
+
+
+def keyset_query(query, sort_field, direction, cursor_data):
+    """Restrict query to the documents that sort after the cursor position.
+
+    The sort is always (sort_field, direction), (_id, direction), so the
+    (value, _id) pair in the cursor identifies a unique position and every
+    page is a bounded index range scan instead of a growing skip. Documents
+    whose sort_field is null or missing sort before every other value, as
+    MongoDB orders them.
+    """
+    if cursor_data['f'] != sort_field or cursor_data['d'] != direction:
+        raise ValueError("Pagination cursor does not match the requested sort")
+
+    op = '$gt' if direction == 1 else '$lt'
+    last_value, last_id = cursor_data['v'], cursor_data['id']
+    # Cursors come from the client: a document or array here would be read as query operators
+    if isinstance(last_value, (dict, list)) or isinstance(last_id, (dict, list)):
+        raise ValueError("Invalid pagination cursor")
+
+    if sort_field == '_id':
+        after = {'_id': {op: last_id}}
+    elif last_value is None:
+        # Null and missing values sort first, and {$gt: null} matches nothing
+        ties = {sort_field: None, '_id': {op: last_id}}
+        after = {"$or": [{sort_field: {'$ne': None}}, ties]} if direction == 1 else ties
+    else:
+        after = {"$or": [
+            {sort_field: {op: last_value}},
+            {sort_field: last_value, '_id': {op: last_id}}
+        ]}
+        if direction == -1:
+            # {$lt: value} skips the null and missing values that sort after it
+            after["$or"].append({sort_field: None})
+
+    if not query:
+        return after
+    return {"$and": [query, after]}
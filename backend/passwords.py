@@ -0,0 +1,129 @@
+"""Salted, adaptive password hashing on a bounded executor.
+
+Hashes use werkzeug's ``method$salt$hash`` format with the cost taken from
+``PASSWORD_HASH_METHOD`` (e.g. ``scrypt:32768:8:1`` or
+``pbkdf2:sha256:1000000``). Verifying a password stored with another method
+or cost, or a legacy plaintext value, succeeds as before and returns a fresh
+hash for the caller to store, so records upgrade as users log in.
+
+Hashing is deliberately slow, so it runs on a small per-process thread pool
+instead of the request thread's own CPU budget: at most
+``PASSWORD_HASH_WORKERS`` hashes run at once (hashlib releases the GIL), and
+at most ``PASSWORD_HASH_MAX_PENDING`` may be queued or running. A caller that
+cannot get a slot within ``PASSWORD_HASH_WAIT_TIMEOUT`` seconds gets
+HashingBusy, which the routes answer with 503, instead of piling up threads
+behind a login burst.
+"""
+import asyncio
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from config import Config
+
+HASH_METHODS = ('scrypt', 'pbkdf2')
+
+
+class HashingBusy(Exception):
+    """Every hashing slot is taken; retry shortly"""
+
+
+def is_hashed(stored_password):
+    """True for werkzeug hashes, False for legacy plaintext values"""
+    # A plaintext password can be just a method name, so require all of method$salt$hash
+    parts = stored_password.split('$', 2)
+    return len(parts) == 3 and parts[0].split(':', 1)[0] in HASH_METHODS
+
+
+class PasswordHasher:
+    def __init__(self, method, workers, max_pending, wait_timeout):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.wait_timeout = wait_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._prefix = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config=Config):
+        return cls(config.PASSWORD_HASH_METHOD, config.PASSWORD_HASH_WORKERS,
+                   config.PASSWORD_HASH_MAX_PENDING, config.PASSWORD_HASH_WAIT_TIMEOUT)
+
+    def hash(self, password):
+        """Hash password with the configured method and a random salt"""
+        return self._run(self._hash, password)
+
+    def verify(self, stored_password, password):
+        """(matches, new_hash); new_hash is set when a match should be re-stored"""
+        return self._run(self._verify, stored_password, password)
+
+    async def ahash(self, password):
+        return await self._arun(self._hash, password)
+
+    async def averify(self, stored_password, password):
+        return await self._arun(self._verify, stored_password, password)
+
+    def needs_rehash(self, stored_password):
+        """True unless stored_password already uses the configured method and cost"""
+        if not is_hashed(stored_password):
+            return True
+        if self._prefix is None:
+            # werkzeug fills in default parameters, so compare what it writes
+            self._prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return stored_password.split('$', 1)[0] != self._prefix
+
+    def _hash(self, password):
+        return generate_password_hash(password, self.method)
+
+    def _verify(self, stored_password, password):
+        if not stored_password or not password:
+            return False, None
+        if is_hashed(stored_password):
+            matches = check_password_hash(stored_password, password)
+        else:
+            matches = hmac.compare_digest(stored_password.encode('utf-8'), password.encode('utf-8'))
+        if matches and self.needs_rehash(stored_password):
+            return True, self._hash(password)
+        return matches, None
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            raise HashingBusy()
+        return self._submit(fn, *args).result()
+
+    async def _arun(self, fn, *args):
+        # Never block the event loop waiting for a slot
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        return await asyncio.wrap_future(self._submit(fn, *args))
+
+    def _submit(self, fn, *args):
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='password-hash')
+            return self._executor
+
+    def _reset_after_fork(self):
+        # Pool threads don't survive fork; the child builds its own on first use
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+
+
+password_hasher = PasswordHasher.from_config()
+
+os.register_at_fork(after_in_child=password_hasher._reset_after_fork)
@@ -0,0 +1,34 @@
+"""Client-selectable field projections pushed down into MongoDB.
+
+``fields`` is ``'summary'`` (the columns the list tables render), ``'all'``
+(the whole document minus the derived search arrays) or a comma-separated
+list of field names, e.g. ``fields=projectTitle,status``.
+"""
+from search import SEARCH_PROJECTION
+
+SUMMARY = 'summary'
+ALL = 'all'
+
+
+def build_projection(fields, summary, allowed, required=()):
+    """Translate a ``fields`` value into a find/$project projection.
+
+    ``required`` names fields the caller needs regardless of the selection,
+    such as the sort field a keyset cursor is built from.
+    """
+    if fields is None or fields == SUMMARY:
+        names = list(summary)
+    elif fields == ALL:
+        return dict(SEARCH_PROJECTION)
+    else:
+        names = [name.strip() for name in fields.split(',') if name.strip()]
+        if not names:
+            raise ValueError("fields must not be empty")
+        unknown = [name for name in names if name not in allowed]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    projection = {name: 1 for name in names}
+    for name in required:
+        projection[name] = 1
+    return projection
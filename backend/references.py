@@ -0,0 +1,90 @@
+"""Requirement -> client references resolved at read time.
+
+Each requirement stores the ``cliente_id`` of its requestor. The requestor
+fields kept on the requirement are the values submitted with it; reads
+replace them with the client's current data, fetched for a whole page with
+one ``$in`` query and kept in a small TTL cache. A client edit is then a
+single write to Clientes instead of a rewrite of every requirement that
+mentions the client. Requirements whose client is gone, or that predate
+the reference (see migrate_clientes.py), keep their own values.
+"""
+from cache import TTLCache
+
+# Requirement field -> client field owned by the client
+REQUESTOR_FIELDS = {
+    'requestorName': 'nombre',
+    'requestorPhone': 'celular',
+    'requestorEmail': 'email'
+}
+
+CLIENTE_REFERENCE_PROJECTION = {field: 1 for field in REQUESTOR_FIELDS.values()}
+
+
+def cliente_tag(cliente_id):
+    """The response cache tag of the entries that embed a client's fields"""
+    return ('cliente', str(cliente_id))
+
+
+def requirement_tags(requirement):
+    """Response cache tags of a resolved requirement: the client it embeds"""
+    cliente_id = requirement.get('cliente_id')
+    return (cliente_tag(cliente_id),) if cliente_id is not None else ()
+
+
+def normalize_email(email):
+    """The key clients are deduplicated on: trimmed, lower-cased email, or None"""
+    if not isinstance(email, str) or not email.strip():
+        return None
+    return email.strip().lower()
+
+
+class ClienteResolver:
+    """Batched client lookups for requirement pages with an in-process cache"""
+
+    def __init__(self, maxsize=4096, ttl=60):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def plan(self, documents):
+        """({cliente_id: cliente} served from the cache, [cliente_id] still to fetch)"""
+        found, missing = {}, set()
+        for document in documents:
+            cliente_id = document.get('cliente_id')
+            if cliente_id is None or cliente_id in found or cliente_id in missing:
+                continue
+            cliente = self._cache.get(cliente_id)
+            if cliente is None:
+                missing.add(cliente_id)
+            else:
+                found[cliente_id] = cliente
+        return found, list(missing)
+
+    def store(self, clientes):
+        """Cache fetched clients and return them keyed by _id"""
+        fetched = {}
+        for cliente in clientes:
+            fetched[cliente['_id']] = cliente
+            self._cache.set(cliente['_id'], cliente)
+        return fetched
+
+    @staticmethod
+    def apply(documents, clientes):
+        """Overwrite the requestor fields each document was fetched with"""
+        for document in documents:
+            cliente = clientes.get(document.get('cliente_id'))
+            if cliente is None:
+                continue
+            for field, source in REQUESTOR_FIELDS.items():
+                if field in document:
+                    document[field] = cliente.get(source)
+        return documents
+
+    def invalidate(self, cliente_id):
+        self._cache.delete(cliente_id)
+
+    def clear(self):
+        self._cache.clear()
+
+
+def requestor_changes(update_data):
+    """The client fields a requirement edit sets through its requestor fields"""
+    return {source: update_data[field] for field, source in REQUESTOR_FIELDS.items() if field in update_data}
@@ -1,19 +1,21 @@
 from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
-from database import insert_user, get_user_by_email
+from database import DatabaseManager
 
 auth_bp = Blueprint('auth', __name__)
 
+# Shared instance; constructing it here opens no extra connections
+db_manager = DatabaseManager()
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
     
     # Verifica si el usuario ya existe
-    if get_user_by_email(data['email']):
+    if db_manager.get_user_by_email(data['email']):
         return jsonify({"error": "Email ya registrado"}), 400
     
     # Hashea la contraseña
-    hashed_password = generate_password_hash(data['password'])
+    hashed_password = db_manager.hash_password(data['password'])
     
     # Prepara los datos del usuario
     user_data = {
@@ -24,16 +26,16 @@ def register():
     }
     
     # Inserta el usuario en la base de datos
-    user_id = insert_user(user_data)
+    user_id = db_manager.insert_user(user_data)
     
     return jsonify({"message": "Usuario registrado exitosamente", "user_id": user_id}), 201
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
     data = request.get_json()
-    user = get_user_by_email(data['email'])
+    user = db_manager.get_user_by_email(data['email'])
     
-    if user and check_password_hash(user['password'], data['password']):
+    if user and db_manager.check_user_password(user, data['password']):
         # Aquí normalmente crearías una sesión o un token JWT
         return jsonify({"message": "Inicio de sesión exitoso"}), 200
     else:
@@ -0,0 +1,139 @@
+"""Decoding and validation of client and requirement request bodies.
+
+Each schema is compiled once, at import, into a lookup of field -> (accepted
+types, maximum length) plus the sets of required, non-blank and ignored
+fields, so checking a body is one pass over its keys. A body is rejected
+with a ValueError when it has unknown fields, values of the wrong type
+(nested objects and lists included), strings over their field's limit or
+missing required fields. Server-managed fields that the frontend sends back
+when editing (``_id``, ``created_at``...) are dropped, not stored.
+
+Bodies larger than ``MAX_JSON_BODY_BYTES`` raise PayloadTooLarge; the routes
+check Content-Length before reading the body and stop reading a body that
+turns out longer. Decoding uses orjson when it is installed.
+"""
+import json
+from config import Config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Strings the frontend sends from single-line inputs
+SHORT_TEXT_LENGTH = 200
+EMAIL_LENGTH = 254
+PHONE_LENGTH = 32
+BUDGET_LENGTH = 32
+# Multi-line descriptions; see Config.MAX_TEXT_LENGTH
+LONG_TEXT_LENGTH = Config.MAX_TEXT_LENGTH
+
+TEXT = (str,)
+# bool is excluded on purpose: types are compared exactly, not with isinstance
+NUMBER_OR_TEXT = (str, int, float)
+
+REQUIREMENT_SCHEMA_FIELDS = {
+    'date': (TEXT, SHORT_TEXT_LENGTH),
+    'projectTitle': (TEXT, SHORT_TEXT_LENGTH),
+    'requestorName': (TEXT, SHORT_TEXT_LENGTH),
+    'requestorPhone': (TEXT, PHONE_LENGTH),
+    'requestorEmail': (TEXT, EMAIL_LENGTH),
+    'department': (TEXT, SHORT_TEXT_LENGTH),
+    'sponsorName': (TEXT, SHORT_TEXT_LENGTH),
+    'sponsorPhone': (TEXT, PHONE_LENGTH),
+    'sponsorEmail': (TEXT, EMAIL_LENGTH),
+    'description': (TEXT, LONG_TEXT_LENGTH),
+    'dependencies': (TEXT, LONG_TEXT_LENGTH),
+    'requestedEndDate': (TEXT, SHORT_TEXT_LENGTH),
+    'estimatedBudget': (NUMBER_OR_TEXT, BUDGET_LENGTH),
+    'status': (TEXT, SHORT_TEXT_LENGTH),
+    'priority': (TEXT, SHORT_TEXT_LENGTH),
+    'projectType': (TEXT, SHORT_TEXT_LENGTH),
+    'technicalRequirements': (TEXT, LONG_TEXT_LENGTH),
+    'businessJustification': (TEXT, LONG_TEXT_LENGTH),
+    'riskAssessment': (TEXT, LONG_TEXT_LENGTH)
+}
+CLIENTE_SCHEMA_FIELDS = {
+    'nombre': (TEXT, SHORT_TEXT_LENGTH),
+    'email': (TEXT, EMAIL_LENGTH),
+    'celular': (TEXT, PHONE_LENGTH),
+    'ciudad': (TEXT, SHORT_TEXT_LENGTH)
+}
+
+
+class PayloadTooLarge(Exception):
+    """The request body is over the size limit; answered with 413"""
+
+    def __init__(self, limit):
+        super().__init__(f"Request body is larger than {limit} bytes")
+        self.limit = limit
+
+
+class Schema:
+    """A compiled set of field rules for one kind of request body"""
+
+    def __init__(self, fields, required=(), nonblank=(), ignored=(), nullable=False):
+        # Edits send back the nulls reads return for fields a client lacks
+        extra = (type(None),) if nullable else ()
+        self._fields = {name: (frozenset(types + extra), max_length)
+                        for name, (types, max_length) in fields.items()}
+        self._required = frozenset(required)
+        self._nonblank = tuple(nonblank)
+        self._ignored = frozenset(ignored)
+
+    def validate(self, data):
+        """The accepted fields of data; raises ValueError"""
+        if type(data) is not dict:
+            raise ValueError("Request body must be a JSON object")
+        fields = self._fields
+        accepted, unknown = {}, []
+        for name, value in data.items():
+            rule = fields.get(name)
+            if rule is None:
+                if name not in self._ignored:
+                    unknown.append(name)
+                continue
+            types, max_length = rule
+            if type(value) not in types:
+                raise ValueError(f"{name} must be {_type_names(types)}")
+            if type(value) is str and len(value) > max_length:
+                raise ValueError(f"{name} must be at most {max_length} characters")
+            accepted[name] = value
+        if unknown:
+            raise ValueError(f"Invalid fields provided: {', '.join(map(str, unknown))}")
+
+        missing = self._required.difference(accepted)
+        blank = [name for name in self._nonblank if name in accepted and not accepted[name]]
+        if missing or blank:
+            raise ValueError(f"Missing required fields: {', '.join(sorted(missing) + blank)}")
+        return accepted
+
+    def decode(self, body, limit=None):
+        """Parse and validate a JSON request body in bytes; raises PayloadTooLarge or ValueError"""
+        limit = limit or Config.MAX_JSON_BODY_BYTES
+        if len(body) > limit:
+            raise PayloadTooLarge(limit)
+        try:
+            data = orjson.loads(body) if orjson is not None else json.loads(body)
+        except ValueError:
+            raise ValueError("Request body is not valid JSON")
+        return self.validate(data)
+
+
+def _type_names(types):
+    if int in types:
+        return "a string or a number"
+    return "a string"
+
+
+# Fields the API sets itself; ignored when a client sends them back
+REQUIREMENT_SERVER_FIELDS = ('_id', 'cliente_id', 'created_at', 'updated_at')
+CLIENTE_SERVER_FIELDS = ('_id', 'created_at', 'updated_at')
+
+REQUIREMENT_SCHEMA = Schema(REQUIREMENT_SCHEMA_FIELDS, required=REQUIREMENT_SCHEMA_FIELDS,
+                            ignored=REQUIREMENT_SERVER_FIELDS)
+REQUIREMENT_UPDATE_SCHEMA = Schema(REQUIREMENT_SCHEMA_FIELDS, ignored=REQUIREMENT_SERVER_FIELDS, nullable=True)
+CLIENTE_SCHEMA = Schema(CLIENTE_SCHEMA_FIELDS, required=('nombre', 'email'), nonblank=('nombre', 'email'),
+                        ignored=CLIENTE_SERVER_FIELDS)
+CLIENTE_UPDATE_SCHEMA = Schema(CLIENTE_SCHEMA_FIELDS, nonblank=('nombre', 'email'), ignored=CLIENTE_SERVER_FIELDS,
+                               nullable=True)
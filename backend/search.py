@@ -0,0 +1,156 @@
+"""Accent-folded, prefix-matching keyword search backed by a multikey index.
+
+Every searchable document carries two derived arrays:
+
+* ``search_words``: ``field:word`` for each folded word, used for ranking.
+* ``search_keywords``: ``field:prefix`` for each prefix of those words, used
+  for matching through the ``search_keywords`` index. Long free-text fields
+  (``WHOLE_WORD_FIELDS``) only contribute their whole words here, so a term
+  matches them by the full word instead of by prefix.
+
+Run ``python search.py reindex`` once to backfill documents written before
+these fields existed, or after changing which fields are searched or how.
+"""
+import argparse
+import re
+import unicodedata
+from pymongo import UpdateOne
+
+from pagination import keyset_query
+
+CLIENTE_SEARCH_FIELDS = {'nombre': 3, 'email': 2, 'ciudad': 1}
+REQUIREMENT_SEARCH_FIELDS = {'projectTitle': 3, 'requestorName': 2, 'department': 2, 'description': 1}
+
+# Derived fields kept out of API responses (email_key is the Clientes dedup key)
+SEARCH_PROJECTION = {'search_words': 0, 'search_keywords': 0, 'email_key': 0}
+
+# Prefix-expanding every word of a free-text field would make search_keywords huge
+WHOLE_WORD_FIELDS = frozenset({'description'})
+
+MAX_PREFIX = 15
+MAX_TERMS = 8
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def fold(text):
+    """Lowercase text and strip accents, so 'Peña' and 'pena' compare equal"""
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text):
+    """Split text into folded words"""
+    return _WORD_RE.findall(fold(text))
+
+
+def _keyword(field, word):
+    """The search_keywords entry a word matches through: its capped prefix, or itself for whole-word fields"""
+    return f"{field}:{word}" if field in WHOLE_WORD_FIELDS else f"{field}:{word[:MAX_PREFIX]}"
+
+
+def search_fields(document, weights):
+    """Compute the derived search arrays for a document"""
+    words, keywords = set(), set()
+    for field in weights:
+        value = document.get(field)
+        if not value:
+            continue
+        for word in tokenize(value):
+            words.add(f"{field}:{word}")
+            if field in WHOLE_WORD_FIELDS:
+                keywords.add(_keyword(field, word))
+                continue
+            for end in range(1, min(len(word), MAX_PREFIX) + 1):
+                keywords.add(f"{field}:{word[:end]}")
+    return {'search_words': sorted(words), 'search_keywords': sorted(keywords)}
+
+
+def untouched_search_fields(update_data, weights):
+    """None when update_data changes no searchable field, else the searchable fields it leaves alone"""
+    if not any(field in update_data for field in weights):
+        return None
+    return [field for field in weights if field not in update_data]
+
+
+def search_terms(search_term):
+    """Tokenize a user search term, raising ValueError if nothing is searchable"""
+    terms = list(dict.fromkeys(tokenize(search_term)))[:MAX_TERMS]
+    if not terms:
+        raise ValueError("Search term must contain letters or digits")
+    return terms
+
+
+def keyword_clauses(search_term, fields):
+    """Build one index-backed clause per term requiring a word with that prefix, or that word in whole-word fields"""
+    clauses = []
+    for term in search_terms(search_term):
+        keys = [_keyword(field, term) for field in fields]
+        clauses.append({'search_keywords': keys[0] if len(keys) == 1 else {'$in': keys}})
+    return clauses
+
+
+def ranked_pipeline(search_term, weights, limit=None, cursor_data=None, projection=None):
+    """Aggregation pipeline returning matches ordered by weighted relevance.
+
+    A term scores its field weight once for a prefix hit and once more for a
+    whole-word hit, so 'ana' ranks a client named Ana above one named Anabel.
+    Results are ordered by (_score, _id) descending and keep their ``_score``
+    so callers can build a keyset cursor from the last one. ``projection``
+    replaces the default final ``$project``; an inclusion projection must
+    list ``_score`` to keep it.
+    """
+    terms = search_terms(search_term)
+    score = []
+    for field, weight in weights.items():
+        prefixes = [_keyword(field, term) for term in terms]
+        words = [f"{field}:{term}" for term in terms]
+        hits = {'$add': [
+            {'$size': {'$setIntersection': ['$search_keywords', prefixes]}},
+            {'$size': {'$setIntersection': ['$search_words', words]}}
+        ]}
+        score.append({'$multiply': [weight, hits]})
+
+    pipeline = [
+        {'$match': {'$and': keyword_clauses(search_term, list(weights))}},
+        {'$addFields': {'_score': {'$add': score}}}
+    ]
+    if cursor_data:
+        pipeline.append({'$match': keyset_query({}, '_score', -1, cursor_data)})
+    pipeline.append({'$sort': {'_score': -1, '_id': -1}})
+    if limit:
+        pipeline.append({'$limit': limit})
+    pipeline.append({'$project': projection or SEARCH_PROJECTION})
+    return pipeline
+
+
+def reindex(collection, weights, query=None, batch_size=1000):
+    """Recompute the search arrays for every document matching query"""
+    projection = {field: 1 for field in weights}
+    operations, updated = [], 0
+    for document in collection.find(query or {}, projection):
+        operations.append(UpdateOne({'_id': document['_id']}, {'$set': search_fields(document, weights)}))
+        if len(operations) >= batch_size:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    if operations:
+        updated += collection.bulk_write(operations, ordered=False).modified_count
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain KodEstudio search fields")
+    parser.add_argument('command', choices=['reindex'])
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    from database import DatabaseManager
+    db_manager = DatabaseManager()
+    print('Clientes:', reindex(db_manager.clientes_collection, CLIENTE_SEARCH_FIELDS,
+                               batch_size=args.batch_size))
+    print('Solicitudes:', reindex(db_manager.collection, REQUIREMENT_SEARCH_FIELDS,
+                                  batch_size=args.batch_size))
+
+
+if __name__ == '__main__':
+    main()
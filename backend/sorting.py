@@ -0,0 +1,85 @@
+"""Index-aware sort planning for /api/requirements.
+
+Only the fields in ``REQUIREMENT_SORT_FIELDS`` can be sorted on, and every
+sort is followed by ``_id`` in the same direction so pages are stable (and
+keyset cursors exact). The planner looks in the index registry for an index
+that returns documents already in that order: one whose keys are the sort
+field and ``_id``, in matching directions, led only by fields the query
+filters for equality. Of those it picks the one that covers the most
+filters, e.g. ``status_created_at_id`` for ``?status=Pending`` sorted by
+``created_at``.
+
+When filters are given but no such index leads with any of them, walking
+the sort index would read documents the filter discards until a page is
+full. The query then runs on the filter's own index and sorts in memory
+instead, with ``allowDiskUse`` so a large result spills to disk rather than
+failing; with ``SORT_UNINDEXED=reject`` it is refused with a ValueError.
+"""
+from collections import namedtuple
+
+from indexes import INDEXES
+
+REQUIREMENT_SORT_FIELDS = ('created_at', 'updated_at', 'requestedEndDate')
+DEFAULT_SORT = ('created_at', -1)
+UNINDEXED_MODES = ('disk', 'reject')
+
+# index is None when the sort happens in memory
+SortPlan = namedtuple('SortPlan', ['sort', 'index', 'residual_filters', 'allow_disk_use'])
+
+
+def _equality_fields(query):
+    """Fields the query matches against a single value"""
+    return {field for field, value in (query or {}).items()
+            if not field.startswith('$') and not isinstance(value, dict)}
+
+
+def _serving_prefix(keys, field, direction):
+    """The fields before (field, _id) if the index can return that order, else None"""
+    if len(keys) < 2 or [name for name, _ in keys[-2:]] != [field, '_id']:
+        return None
+    # Read forwards or backwards, both keys must run the same way as the sort
+    (_, field_direction), (_, id_direction) = keys[-2:]
+    if field_direction != id_direction or field_direction not in (1, -1):
+        return None
+    return [name for name, _ in keys[:-2]]
+
+
+def plan_sort(collection, query, sort_by=None, unindexed='disk', indexes=INDEXES,
+              sortable=REQUIREMENT_SORT_FIELDS):
+    """Choose how to sort query on collection; raises ValueError for unsupported sorts"""
+    if sort_by and len(sort_by) > 1:
+        raise ValueError("Sort by one field at a time")
+    field, direction = next(iter(sort_by.items())) if sort_by else DEFAULT_SORT
+    if field not in sortable:
+        raise ValueError(f"sort_field must be one of: {', '.join(sortable)}")
+    if direction not in (1, -1):
+        raise ValueError("sort_direction must be 1 or -1")
+    sort = [(field, direction), ('_id', direction)]
+
+    filtered = _equality_fields(query)
+    best = None
+    for spec in indexes:
+        if spec.collection != collection:
+            continue
+        prefix = _serving_prefix(spec.keys, field, direction)
+        if prefix is None or not set(prefix) <= filtered:
+            continue
+        if best is None or len(prefix) > len(best[1]):
+            best = (spec.options['name'], prefix)
+
+    if best is not None and (best[1] or not query):
+        name, prefix = best
+        return SortPlan(sort, name, sorted(set(query or {}) - set(prefix)), False)
+    if unindexed == 'reject':
+        raise ValueError(f"Sorting by {field} is not supported with these filters")
+    return SortPlan(sort, None, sorted(query or {}), True)
+
+
+def plan_to_dict(plan):
+    """The plan as reported in debug responses"""
+    return {
+        'sort': [list(key) for key in plan.sort],
+        'index': plan.index,
+        'residual_filters': plan.residual_filters,
+        'allow_disk_use': plan.allow_disk_use
+    }
@@ -0,0 +1,135 @@
+import copy
+import threading
+import time
+from datetime import datetime, timedelta
+
+STATS_FIELDS = {
+    'status': 'status_counts',
+    'priority': 'priority_counts',
+    'department': 'department_counts'
+}
+
+# Writes stamped just before a rebuild may have committed after its $facet ran
+COMMIT_SLACK = timedelta(seconds=5)
+
+# One round trip for the total and every per-field breakdown
+STATS_PIPELINE = [
+    {"$facet": dict(
+        {'total': [{"$count": 'count'}]},
+        **{field: [{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}] for field in STATS_FIELDS}
+    )}
+]
+
+
+def stats_from_facet(facet):
+    """Convert the $facet output into the shape returned by the stats endpoint"""
+    total = facet['total'][0]['count'] if facet['total'] else 0
+    stats = {'total_requirements': total}
+    for field, key in STATS_FIELDS.items():
+        stats[key] = {item['_id']: item['count'] for item in facet[field]}
+    return stats
+
+
+class StatsSnapshot:
+    """Cached requirement statistics adjusted in place as requirements change.
+
+    The snapshot is rebuilt from the database once it is older than ``ttl``
+    seconds, which also bounds drift from writes made by other processes.
+    Rebuilds run outside the lock so writes never wait on one, and a rebuild
+    that overlapped apply() or invalidate() is not kept: the write may or may
+    not be in its counts, and applying it again would count it twice.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._stats = None
+        self._loaded_at = 0
+        self._built_at = None
+        self._lock = threading.Lock()
+        # One rebuild at a time; apply() never takes it
+        self._load_lock = threading.Lock()
+        # Bumped by every apply() and invalidate() so an overlapping rebuild is dropped
+        self._generation = 0
+
+    def get(self, loader):
+        """Return a copy of the stats, rebuilding them with loader() when stale"""
+        stats = self.peek()
+        if stats is not None:
+            return stats
+        with self._load_lock:
+            stats = self.peek()
+            if stats is None:
+                generation, started = self._begin_load()
+                stats = loader()
+                self._finish_load(stats, generation, started)
+            return stats
+
+    async def aget(self, loader):
+        """get() for coroutine loaders; concurrent rebuilds may each run"""
+        stats = self.peek()
+        if stats is None:
+            generation, started = self._begin_load()
+            stats = await loader()
+            self._finish_load(stats, generation, started)
+        return stats
+
+    def peek(self):
+        """Return a copy of the snapshot if it is still fresh, else None"""
+        with self._lock:
+            return copy.deepcopy(self._stats) if self._is_fresh() else None
+
+    def _begin_load(self):
+        with self._lock:
+            return self._generation, datetime.utcnow()
+
+    def _finish_load(self, stats, generation, started):
+        with self._lock:
+            if generation == self._generation:
+                # Dated from the start of the load: later writes may be missing from it
+                self._store(copy.deepcopy(stats), started)
+
+    def _is_fresh(self):
+        return self._stats is not None and time.monotonic() - self._loaded_at <= self.ttl
+
+    def _store(self, stats, built_at):
+        self._stats = stats
+        self._loaded_at = time.monotonic()
+        self._built_at = built_at
+
+    def outdated_by(self, change):
+        """Whether a change fed from another writer (see changes.py) may have moved the counts"""
+        if change.fields is not None:
+            return bool(set(change.fields) & set(STATS_FIELDS))
+        if change.updated_at is not None:
+            # Polled changes: anything written before the snapshot was built is already counted
+            with self._lock:
+                return self._built_at is None or change.updated_at > self._built_at - COMMIT_SLACK
+        return True
+
+    def apply(self, removed=None, added=None):
+        """Move one requirement out of the counts of ``removed`` and into ``added``"""
+        with self._lock:
+            self._generation += 1
+            if self._stats is None:
+                return
+            if removed is not None:
+                self._stats['total_requirements'] -= 1
+                for field, key in STATS_FIELDS.items():
+                    self._adjust(self._stats[key], removed.get(field), -1)
+            if added is not None:
+                self._stats['total_requirements'] += 1
+                for field, key in STATS_FIELDS.items():
+                    self._adjust(self._stats[key], added.get(field), 1)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._stats = None
+
+    @staticmethod
+    def _adjust(counts, value, delta):
+        count = counts.get(value, 0) + delta
+        if count > 0:
+            counts[value] = count
+        else:
+            counts.pop(value, None)
@@ -0,0 +1,68 @@
+import pytest
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+from admission import AdmissionControl, AsyncAdmissionControl, Limit, MemoryStore, client_address, parse_limits
+
+
+def request_from(remote_addr, forwarded_for=None):
+    headers = {'X-Forwarded-For': forwarded_for} if forwarded_for else {}
+    return Request(EnvironBuilder(headers=headers, environ_base={'REMOTE_ADDR': remote_addr}).get_environ())
+
+
+def address(remote_addr, forwarded_for, trusted_proxies):
+    request = request_from(remote_addr, forwarded_for)
+    return client_address(request.access_route, request.remote_addr, trusted_proxies)
+
+
+def test_client_address_behind_one_proxy():
+    assert address('10.0.0.1', '1.1.1.1', 1) == '1.1.1.1'
+
+
+def test_client_address_ignores_spoofed_entries():
+    assert address('10.0.0.1', 'evil, 1.1.1.1', 1) == '1.1.1.1'
+    assert address('10.0.0.2', 'evil, 1.1.1.1, 10.0.0.1', 2) == '1.1.1.1'
+
+
+def test_client_address_without_trusted_proxies_uses_the_peer():
+    assert address('10.0.0.1', 'evil', 0) == '10.0.0.1'
+    assert address('2.2.2.2', None, 0) == '2.2.2.2'
+
+
+def test_client_address_with_fewer_hops_than_proxies_uses_the_peer():
+    assert address('2.2.2.2', None, 1) == '2.2.2.2'
+    assert address('10.0.0.2', '1.1.1.1', 2) == '10.0.0.2'
+
+
+def test_parse_limits():
+    limits = parse_limits('/api/login=10/60, /api/reviews=120/60,,/api/x=5')
+    assert limits == {
+        '/api/login': Limit(rate=10 / 60, burst=10),
+        '/api/reviews': Limit(rate=2.0, burst=120),
+        '/api/x': Limit(rate=5.0, burst=5)
+    }
+    assert parse_limits('') == {}
+
+
+@pytest.mark.parametrize('spec', ['/api/login=ten/60', '=10/60', '/api/login=0/60', '/api/login=10/0'])
+def test_parse_limits_rejects_invalid_items(spec):
+    with pytest.raises(ValueError):
+        parse_limits(spec)
+
+
+def test_memory_store_refuses_past_the_burst():
+    store = MemoryStore()
+    limit = Limit(rate=1 / 60, burst=2)
+    assert store.take('a', limit).allowed
+    assert store.take('a', limit).allowed
+    refused = store.take('a', limit)
+    assert not refused.allowed and refused.retry_after > 0
+    # Buckets are per key
+    assert store.take('b', limit).allowed
+
+
+def test_async_admission_takes_its_own_public_cap():
+    config = {'RATE_LIMITS': '', 'MAX_CONCURRENT_REQUESTS': 100, 'MAX_CONCURRENT_PUBLIC_REQUESTS': 2,
+              'ASYNC_MAX_CONCURRENT_PUBLIC_REQUESTS': 50, 'ADMISSION_TIMEOUT': 0.25}
+    assert AdmissionControl.from_config(config, MemoryStore()).public._slots._value == 2
+    assert AsyncAdmissionControl.from_config(config, MemoryStore()).public._slots._value == 50
@@ -0,0 +1,25 @@
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from bulk import export_lines
+
+
+def test_ndjson_export_writes_one_json_document_per_line():
+    document = {'_id': ObjectId(), 'nombre': 'Peña', 'created_at': datetime(2024, 5, 1, 12, 30)}
+    lines = list(export_lines([document], 'ndjson', ['_id', 'nombre']))
+    assert len(lines) == 1 and lines[0].endswith(b'\n')
+    assert json.loads(lines[0]) == {'_id': str(document['_id']), 'nombre': 'Peña',
+                                    'created_at': '2024-05-01T12:30:00+00:00'}
+
+
+def test_csv_export_writes_the_header_then_the_requested_fields():
+    lines = list(export_lines([{'_id': 1, 'nombre': 'Ana, B', 'extra': 'x'}], 'csv', ['_id', 'nombre', 'email']))
+    assert lines == [b'_id,nombre,email\r\n', b'1,"Ana, B",\r\n']
+
+
+def test_export_rejects_an_unknown_format_before_streaming():
+    with pytest.raises(ValueError):
+        export_lines([], 'xml', ['_id'])
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import mongomock
+from bson import ObjectId
+
+from changes import POLL_BATCH_SIZE, Change, ChangePoller, OwnWrites
+
+
+def test_own_writes_claims_one_event_per_expected_write():
+    own = OwnWrites()
+    document_id = ObjectId()
+    own.expect('Solicitudes', document_id)
+    own.expect('Solicitudes', document_id)
+    change = Change('Solicitudes', 'update', document_id)
+    assert own.claim(change)
+    assert own.claim(change)
+    assert not own.claim(change)
+
+
+def test_own_writes_ignores_other_documents_and_collections():
+    own = OwnWrites()
+    document_id = ObjectId()
+    own.expect('Solicitudes', document_id)
+    assert not own.claim(Change('Solicitudes', 'update', ObjectId()))
+    assert not own.claim(Change('Clientes', 'update', document_id))
+    assert own.claim(Change('Solicitudes', 'delete', document_id))
+
+
+def test_poller_reports_inserts_updates_and_their_timestamps():
+    poller = ChangePoller()
+    since = poller.query('Solicitudes')[0]['updated_at']['$gt']
+    later = since + timedelta(seconds=1)
+    documents = [
+        {'_id': 1, 'created_at': since - timedelta(days=1), 'updated_at': later},
+        {'_id': 2, 'created_at': later, 'updated_at': later}
+    ]
+    changes = poller.advance('Solicitudes', documents)
+    assert [(change.operation, change.updated_at) for change in changes] == [('update', later), ('insert', later)]
+    assert poller.query('Solicitudes')[0] == {'$or': [
+        {'updated_at': {'$gt': later}},
+        {'updated_at': later, '_id': {'$gt': 2}}
+    ]}
+
+
+def test_poller_reviews_are_inserts_without_timestamps():
+    poller = ChangePoller()
+    review_id = ObjectId.from_datetime(datetime.utcnow() + timedelta(seconds=1))
+    [change] = poller.advance('Calificaciones', [{'_id': review_id}])
+    assert change.operation == 'insert' and change.updated_at is None
+
+
+def test_poller_resumes_inside_a_run_of_equal_timestamps():
+    collection = mongomock.MongoClient().db.Solicitudes
+    poller = ChangePoller()
+    stamp = poller.query('Solicitudes')[0]['updated_at']['$gt'] + timedelta(seconds=1)
+    # A bulk import stamps every row with the same millisecond
+    collection.insert_many([{'updated_at': stamp} for _ in range(POLL_BATCH_SIZE * 2 + 10)])
+
+    polled = []
+    while True:
+        query, projection, sort = poller.query('Solicitudes')
+        documents = list(collection.find(query, projection).sort(sort).limit(POLL_BATCH_SIZE))
+        if not documents:
+            break
+        polled.extend(change.document_id for change in poller.advance('Solicitudes', documents))
+
+    assert sorted(polled) == sorted(document['_id'] for document in collection.find())
@@ -0,0 +1,54 @@
+from bson import ObjectId
+
+from cache import TTLCache
+from http_cache import ResponseCache
+from references import cliente_tag, requirement_tags
+
+
+def test_ttl_cache_expires_and_evicts(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('cache.time.monotonic', lambda: now[0])
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    # 'b' is now the least recently used
+    cache.set('c', 3)
+    assert cache.get('b') is None and cache.get('c') == 3
+    now[0] += 11
+    assert cache.get('a', 'gone') == 'gone'
+
+
+def test_ttl_cache_delete_where():
+    cache = TTLCache()
+    for key in range(5):
+        cache.set(key, key)
+    assert cache.delete_where(lambda value: value % 2) == 2
+    assert [cache.get(key) for key in range(5)] == [0, None, 2, None, 4]
+
+
+def test_response_cache_loads_once_and_keeps_validators():
+    cache, calls = ResponseCache(), []
+
+    def loader():
+        calls.append(1)
+        return {'a': 1}
+
+    first = cache.get('k', loader)
+    assert cache.get('k', loader) is first
+    assert calls == [1] and first.body == b'{"a":1}\n' and first.etag
+    assert cache.get('missing', lambda: None) is None
+
+
+def test_invalidate_tag_drops_only_the_entries_built_from_that_client():
+    cache = ResponseCache()
+    cliente_id, other_id = ObjectId(), ObjectId()
+    cache.get('r1', lambda: {'cliente_id': cliente_id}, tags=requirement_tags)
+    cache.get('r2', lambda: {'cliente_id': other_id}, tags=requirement_tags)
+    cache.get('r3', lambda: {'cliente_id': None}, tags=requirement_tags)
+
+    cache.invalidate_tag(cliente_tag(cliente_id))
+    reloaded = []
+    for key in ('r1', 'r2', 'r3'):
+        cache.get(key, lambda: reloaded.append(key) or {})
+    assert reloaded == ['r1']
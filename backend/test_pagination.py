@@ -0,0 +1,70 @@
+import base64
+from datetime import datetime
+
+import mongomock
+import pytest
+from bson import ObjectId, json_util
+
+from pagination import decode_cursor, encode_cursor, keyset_query
+
+
+def forged(payload):
+    return base64.urlsafe_b64encode(json_util.dumps(payload).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def test_cursor_round_trip_keeps_bson_types():
+    document = {'_id': ObjectId(), 'created_at': datetime(2024, 5, 1, 12, 30)}
+    cursor = decode_cursor(encode_cursor('created_at', -1, document))
+    assert cursor == {'f': 'created_at', 'd': -1, 'v': document['created_at'], 'id': document['_id']}
+
+
+@pytest.mark.parametrize('token', ['not base64!', forged([1, 2]), forged({'f': 'created_at', 'd': -1})])
+def test_decode_cursor_rejects_malformed_tokens(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+
+def test_keyset_query_continues_after_the_cursor():
+    last_id = ObjectId()
+    cursor = {'f': 'projectTitle', 'd': 1, 'v': 'Portal', 'id': last_id}
+    assert keyset_query({'department': 'IT'}, 'projectTitle', 1, cursor) == {'$and': [
+        {'department': 'IT'},
+        {'$or': [{'projectTitle': {'$gt': 'Portal'}}, {'projectTitle': 'Portal', '_id': {'$gt': last_id}}]}
+    ]}
+    assert keyset_query({}, '_id', -1, dict(cursor, f='_id', d=-1)) == {'_id': {'$lt': last_id}}
+
+
+def test_keyset_query_rejects_a_cursor_for_another_sort():
+    with pytest.raises(ValueError):
+        keyset_query({}, 'created_at', -1, {'f': 'created_at', 'd': 1, 'v': None, 'id': ObjectId()})
+
+
+@pytest.mark.parametrize('value, document_id', [
+    ({'$ne': None}, ObjectId()),
+    (['a', 'b'], ObjectId()),
+    ('Portal', {'$exists': True})
+])
+def test_keyset_query_rejects_operator_values(value, document_id):
+    cursor = decode_cursor(forged({'f': 'projectTitle', 'd': 1, 'v': value, 'id': document_id}))
+    with pytest.raises(ValueError):
+        keyset_query({}, 'projectTitle', 1, cursor)
+
+
+@pytest.mark.parametrize('direction', [1, -1])
+def test_keyset_pages_cover_null_and_missing_values(direction):
+    collection = mongomock.MongoClient().db.Solicitudes
+    dates = [None, '2024-03-01', None, '2024-01-15', '2024-03-01', None, '2024-02-10']
+    collection.insert_many([{'_id': ObjectId(), 'requestedEndDate': value} for value in dates])
+    collection.insert_many([{'_id': ObjectId()} for _ in range(2)])
+    sort = [('requestedEndDate', direction), ('_id', direction)]
+
+    seen, cursor = [], None
+    while True:
+        query = keyset_query({}, 'requestedEndDate', direction, cursor) if cursor else {}
+        page = list(collection.find(query).sort(sort).limit(2))
+        if not page:
+            break
+        seen.extend(page)
+        cursor = decode_cursor(encode_cursor('requestedEndDate', direction, page[-1]))
+
+    assert [document['_id'] for document in seen] == [document['_id'] for document in collection.find().sort(sort)]
@@ -0,0 +1,28 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from passwords import PasswordHasher, is_hashed
+
+FAST_METHOD = 'pbkdf2:sha256:1000'
+
+
+@pytest.mark.parametrize('stored, hashed', [
+    (generate_password_hash('secret', 'pbkdf2:sha256:1000'), True),
+    (generate_password_hash('secret', 'scrypt:1024:8:1'), True),
+    ('secret', False),
+    ('pbkdf2', False),
+    ('scrypt$only-two', False),
+    ('md5$salt$hash', False)
+])
+def test_is_hashed(stored, hashed):
+    assert is_hashed(stored) is hashed
+
+
+def test_verify_upgrades_plaintext_and_other_costs():
+    hasher = PasswordHasher(FAST_METHOD, workers=1, max_pending=2, wait_timeout=1)
+    matches, new_hash = hasher.verify('secret', 'secret')
+    assert matches and is_hashed(new_hash) and not hasher.needs_rehash(new_hash)
+    assert hasher.verify(new_hash, 'secret') == (True, None)
+    assert hasher.verify(new_hash, 'wrong') == (False, None)
+    matches, new_hash = hasher.verify(generate_password_hash('secret', 'pbkdf2:sha256:2000'), 'secret')
+    assert matches and new_hash.startswith('pbkdf2:sha256:1000$')
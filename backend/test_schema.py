@@ -0,0 +1,36 @@
+import pytest
+
+from schema import CLIENTE_SCHEMA, CLIENTE_UPDATE_SCHEMA, SHORT_TEXT_LENGTH, PayloadTooLarge
+
+
+def test_validate_drops_server_fields():
+    data = {'_id': 'x', 'created_at': 'y', 'nombre': 'Ana', 'email': 'ana@example.com', 'ciudad': 'Lima'}
+    assert CLIENTE_SCHEMA.validate(data) == {'nombre': 'Ana', 'email': 'ana@example.com', 'ciudad': 'Lima'}
+
+
+@pytest.mark.parametrize('data, message', [
+    (['nombre'], 'must be a JSON object'),
+    ({'nombre': 'Ana', 'email': 'a@b.c', 'rol': 'admin'}, 'Invalid fields provided: rol'),
+    ({'nombre': {'$ne': ''}, 'email': 'a@b.c'}, 'nombre must be a string'),
+    ({'nombre': True, 'email': 'a@b.c'}, 'nombre must be a string'),
+    ({'nombre': 'x' * (SHORT_TEXT_LENGTH + 1), 'email': 'a@b.c'}, 'at most'),
+    ({'nombre': 'Ana'}, 'Missing required fields: email'),
+    ({'nombre': '', 'email': 'a@b.c'}, 'Missing required fields: nombre')
+])
+def test_validate_rejects_invalid_bodies(data, message):
+    with pytest.raises(ValueError, match=message):
+        CLIENTE_SCHEMA.validate(data)
+
+
+def test_update_schema_accepts_partial_bodies_and_nulls():
+    assert CLIENTE_UPDATE_SCHEMA.validate({'ciudad': None}) == {'ciudad': None}
+    with pytest.raises(ValueError):
+        CLIENTE_UPDATE_SCHEMA.validate({'email': ''})
+
+
+def test_decode_checks_size_and_syntax():
+    assert CLIENTE_SCHEMA.decode(b'{"nombre": "Ana", "email": "a@b.c"}') == {'nombre': 'Ana', 'email': 'a@b.c'}
+    with pytest.raises(ValueError, match='not valid JSON'):
+        CLIENTE_SCHEMA.decode(b'{"nombre": ')
+    with pytest.raises(PayloadTooLarge):
+        CLIENTE_SCHEMA.decode(b' ' * 11, limit=10)
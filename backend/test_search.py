@@ -0,0 +1,30 @@
+from search import (
+    CLIENTE_SEARCH_FIELDS, REQUIREMENT_SEARCH_FIELDS, keyword_clauses, search_fields, untouched_search_fields
+)
+
+
+def test_untouched_search_fields_skips_unsearchable_updates():
+    assert untouched_search_fields({'telefono': '2', 'updated_at': None}, CLIENTE_SEARCH_FIELDS) is None
+
+
+def test_untouched_search_fields_lists_the_fields_to_read_back():
+    assert untouched_search_fields({'ciudad': 'Cusco'}, CLIENTE_SEARCH_FIELDS) == ['nombre', 'email']
+    assert untouched_search_fields({'nombre': 'A', 'email': 'a@b.c', 'ciudad': 'X'}, CLIENTE_SEARCH_FIELDS) == []
+
+
+def test_search_fields_words_and_prefixes():
+    fields = search_fields({'nombre': 'Ana', 'ciudad': 'Lima'}, CLIENTE_SEARCH_FIELDS)
+    assert fields['search_words'] == ['ciudad:lima', 'nombre:ana']
+    assert {'nombre:a', 'nombre:an', 'nombre:ana', 'ciudad:l', 'ciudad:lima'} <= set(fields['search_keywords'])
+
+
+def test_whole_word_fields_only_index_whole_words():
+    fields = search_fields({'projectTitle': 'Portal', 'description': 'Migrate billing'}, REQUIREMENT_SEARCH_FIELDS)
+    description = [key for key in fields['search_keywords'] if key.startswith('description:')]
+    assert description == ['description:billing', 'description:migrate']
+    assert 'projectTitle:por' in fields['search_keywords']
+
+
+def test_keyword_clauses_match_whole_word_fields_by_the_full_term():
+    clauses = keyword_clauses('Migración', ['projectTitle', 'description'])
+    assert clauses == [{'search_keywords': {'$in': ['projectTitle:migracion', 'description:migracion']}}]
@@ -0,0 +1,44 @@
+import pytest
+
+from sorting import SortPlan, plan_sort, plan_to_dict
+
+
+def test_default_sort_walks_the_created_at_index():
+    assert plan_sort('Solicitudes', {}) == SortPlan([('created_at', -1), ('_id', -1)], 'created_at_id', [], False)
+
+
+def test_index_read_backwards_serves_the_opposite_direction():
+    plan = plan_sort('Solicitudes', {}, {'created_at': 1})
+    assert plan.index == 'created_at_id' and plan.sort == [('created_at', 1), ('_id', 1)]
+
+
+def test_equality_filter_picks_the_index_led_by_it():
+    plan = plan_sort('Solicitudes', {'status': 'Pending', 'projectType': 'Web'}, {'updated_at': -1})
+    assert plan == SortPlan([('updated_at', -1), ('_id', -1)], 'status_updated_at_id', ['projectType'], False)
+
+
+def test_filters_no_index_leads_with_sort_in_memory():
+    plan = plan_sort('Solicitudes', {'projectType': 'Web'}, {'requestedEndDate': 1})
+    assert plan == SortPlan([('requestedEndDate', 1), ('_id', 1)], None, ['projectType'], True)
+    with pytest.raises(ValueError):
+        plan_sort('Solicitudes', {'projectType': 'Web'}, {'requestedEndDate': 1}, unindexed='reject')
+
+
+def test_range_filters_do_not_count_as_index_prefixes():
+    plan = plan_sort('Solicitudes', {'status': {'$in': ['A', 'B']}}, {'created_at': -1})
+    assert plan.index is None and plan.allow_disk_use
+
+
+@pytest.mark.parametrize('sort_by', [{'projectTitle': 1}, {'created_at': 2}, {'created_at': 1, 'updated_at': 1}])
+def test_unsupported_sorts_are_rejected(sort_by):
+    with pytest.raises(ValueError):
+        plan_sort('Solicitudes', {}, sort_by)
+
+
+def test_plan_to_dict():
+    assert plan_to_dict(plan_sort('Solicitudes', {'status': 'Done'})) == {
+        'sort': [['created_at', -1], ['_id', -1]],
+        'index': 'status_created_at_id',
+        'residual_filters': [],
+        'allow_disk_use': False
+    }
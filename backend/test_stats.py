@@ -0,0 +1,79 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+from changes import Change
+from stats import COMMIT_SLACK, StatsSnapshot, stats_from_facet
+
+FACET = {
+    'total': [{'count': 3}],
+    'status': [{'_id': 'Pending', 'count': 2}, {'_id': 'Aprobado', 'count': 1}],
+    'priority': [{'_id': 'High', 'count': 3}],
+    'department': [{'_id': 'IT', 'count': 3}]
+}
+
+
+def loaded_snapshot():
+    snapshot = StatsSnapshot(ttl=60)
+    snapshot.get(lambda: stats_from_facet(FACET))
+    return snapshot
+
+
+def test_apply_moves_a_requirement_between_counts():
+    snapshot = loaded_snapshot()
+    snapshot.apply(removed={'status': 'Pending', 'priority': 'High', 'department': 'IT'},
+                   added={'status': 'Aprobado', 'priority': 'High', 'department': 'IT'})
+    stats = snapshot.peek()
+    assert stats['total_requirements'] == 3
+    assert stats['status_counts'] == {'Pending': 1, 'Aprobado': 2}
+
+    snapshot.apply(removed={'status': 'Pending', 'priority': 'High', 'department': 'IT'})
+    assert snapshot.peek()['status_counts'] == {'Aprobado': 2}
+
+
+def test_streamed_updates_outdate_the_snapshot_only_through_stats_fields():
+    snapshot = loaded_snapshot()
+    assert snapshot.outdated_by(Change('Solicitudes', 'update', 1, ['status', 'updated_at']))
+    assert not snapshot.outdated_by(Change('Solicitudes', 'update', 1, ['description', 'updated_at']))
+    # Streamed inserts and deletes carry no fields
+    assert snapshot.outdated_by(Change('Solicitudes', 'delete', 1))
+
+
+def test_polled_changes_outdate_the_snapshot_only_when_written_after_it():
+    snapshot = loaded_snapshot()
+    now = datetime.utcnow()
+    assert not snapshot.outdated_by(Change('Solicitudes', 'update', 1, updated_at=now - 2 * COMMIT_SLACK))
+    assert snapshot.outdated_by(Change('Solicitudes', 'update', 1, updated_at=now))
+    assert snapshot.outdated_by(Change('Solicitudes', 'insert', 1, updated_at=now + timedelta(seconds=1)))
+
+
+def test_a_rebuild_overlapping_a_write_is_not_kept():
+    snapshot = StatsSnapshot(ttl=60)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        if len(loads) == 1:
+            # A write lands while the aggregation runs; apply() must not wait for it
+            writer = threading.Thread(target=snapshot.apply, kwargs={'added': {'status': 'Pending'}})
+            writer.start()
+            writer.join(timeout=1)
+            assert not writer.is_alive()
+        return stats_from_facet(FACET)
+
+    assert snapshot.get(loader)['total_requirements'] == 3
+    # The write may or may not be counted in that load, so it is rebuilt rather than adjusted
+    assert snapshot.peek() is None
+    snapshot.get(loader)
+    assert len(loads) == 2 and snapshot.peek()['status_counts'] == {'Pending': 2, 'Aprobado': 1}
+
+
+def test_async_rebuild_is_stored_when_nothing_overlaps():
+    snapshot = StatsSnapshot(ttl=60)
+
+    async def loader():
+        return stats_from_facet(FACET)
+
+    assert asyncio.run(snapshot.aget(loader))['total_requirements'] == 3
+    snapshot.apply(added={'status': 'Pending'})
+    assert snapshot.peek()['total_requirements'] == 4